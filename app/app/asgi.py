@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+# Imported once the app registry is ready. Only the server-sent change
+# notifications, which need long-lived connections WSGI can't hold, are
+# served over ASGI: Django 3.2 runs every sync view and middleware of ASGI
+# requests on one shared thread, so the API is served by app.wsgi.
+from recipe import stream  # noqa: E402
+
+application = stream.application
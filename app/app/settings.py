@@ -12,6 +12,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import importlib.util
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework.authtoken',
     'rest_framework',
     'drf_spectacular',
@@ -48,13 +50,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.AdmissionMiddleware',
+    'core.middleware.MemoryWatermarkMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -77,6 +85,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+TEST_RUNNER = 'core.tests.runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -134,6 +144,9 @@ MEDIA_URL = 'static/media/'
 MEDIA_ROOT = 'vol/web/media'
 STATIC_ROOT = 'vol/web/static'
 
+# Writes .gz/.br copies of text assets next to them on collectstatic.
+STATICFILES_STORAGE = 'core.storage.CompressedStaticFilesStorage'
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -143,5 +156,153 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
-}
\ No newline at end of file
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Seconds the /readyz/ report is reused before probing the database again.
+HEALTH_CHECK_CACHE_SECONDS = float(
+    os.environ.get('HEALTH_CHECK_CACHE_SECONDS', 2)
+)
+
+# Pre-rendered OpenAPI documents, written by `manage.py generate_schema`.
+SCHEMA_DIR = os.environ.get('SCHEMA_DIR', str(BASE_DIR / 'schema'))
+SCHEMA_CACHE_SECONDS = 60 * 60 * 24
+
+# Response compression (core.middleware.CompressionMiddleware).
+COMPRESS_MIN_SIZE = 1024
+# No text/html: compressing pages that carry a CSRF token next to
+# reflected input exposes the token to BREACH. Responses that used the
+# CSRF token are left alone whatever their type.
+COMPRESS_CONTENT_TYPES = [
+    'application/json',
+    'application/vnd.oai.openapi',
+    'application/vnd.oai.openapi+json',
+    'application/javascript',
+    'image/svg+xml',
+    'text/css',
+    'text/javascript',
+    'text/plain',
+]
+# Memory used to keep compressed bodies of responses with a strong ETag.
+COMPRESS_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# Request timing (core.middleware.RequestTimingMiddleware). The
+# Server-Timing header exposes query counts and timings, so outside DEBUG it
+# is only sent to staff.
+SERVER_TIMING = DEBUG
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+# On-demand request profiling for staff (core.middleware.ProfilingMiddleware).
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '1') == '1'
+# Share of opted-in requests that are actually profiled.
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 1))
+PROFILING_MAX_PER_MINUTE = int(os.environ.get('PROFILING_MAX_PER_MINUTE', 6))
+PROFILING_SAMPLE_INTERVAL = 0.001
+PROFILING_KEEP = 200
+
+# Prometheus metrics at /metrics (core.metrics). Set PROMETHEUS_MULTIPROC_DIR
+# in the environment when running more than one worker process.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Without a token only these networks may scrape, unless DEBUG is on.
+METRICS_ALLOWED_NETWORKS = os.environ.get(
+    'METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128'
+).split(',')
+
+# tracemalloc diagnostics (core.memory). Tracing slows allocations down, so
+# it is off unless MEMORY_TRACING is set or started from /debug/memory/.
+MEMORY_TRACING = os.environ.get('MEMORY_TRACING', '0') == '1'
+MEMORY_TRACING_FRAMES = int(os.environ.get('MEMORY_TRACING_FRAMES', 1))
+# Requests whose peak traced memory exceeds this are logged.
+MEMORY_WATERMARK_KIB = int(os.environ.get('MEMORY_WATERMARK_KIB', 16 * 1024))
+# View names (e.g. 'RecipeViewSet.list') to record peaks for; empty for all.
+MEMORY_WATERMARK_VIEWS = []
+
+# Tag/ingredient autocomplete (recipe.autocomplete).
+AUTOCOMPLETE_CACHE_SECONDS = 30
+AUTOCOMPLETE_CACHE_MAX_ENTRIES = 10000
+AUTOCOMPLETE_FUZZY_MIN_LENGTH = 3
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# "Cook with what I have" ingredient indexes (recipe.cookable): how many
+# users' indexes each process keeps in memory.
+COOKABLE_CACHE_USERS = int(os.environ.get('COOKABLE_CACHE_USERS', 64))
+COOKABLE_MAX_LIMIT = 100
+
+# Similar recipes (recipe.similarity).
+SIMILAR_MAX_LIMIT = 50
+
+# Most recipes one shopping list (recipe.shopping) may merge.
+SHOPPING_LIST_MAX_RECIPES = 100
+
+# Admission control (core.admission); limits are per worker process.
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') == '1'
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 32))
+# Share of ADMISSION_MAX_CONCURRENT each class may fill.
+ADMISSION_SHARES = {'light': 0.9, 'heavy': 0.5}
+ADMISSION_MAX_CONCURRENT_PER_CLIENT = 4
+ADMISSION_HEAVY_RATE = float(os.environ.get('ADMISSION_HEAVY_RATE', 5))
+ADMISSION_HEAVY_BURST = int(os.environ.get('ADMISSION_HEAVY_BURST', 20))
+ADMISSION_MAX_CLIENTS = 10000
+ADMISSION_RETRY_AFTER = 1
+# core.metrics.view_name -> class; everything else is 'light'.
+ADMISSION_CLASSES = {
+    'healthz': 'critical',
+    'readyz': 'critical',
+    'metrics_view': 'critical',
+    'CreateTokenView': 'critical',
+    'RecipeViewSet.list': 'heavy',
+    'RecipeViewSet.cookable': 'heavy',
+    'RecipeViewSet.similar': 'heavy',
+    'TagViewSet.list': 'heavy',
+    'IngredientViewSet.list': 'heavy',
+    'ShoppingListView': 'heavy',
+    'ChangesView': 'heavy',
+}
+
+# Admin changelists estimate totals above this many rows (core.estimates).
+ESTIMATED_COUNT_EXACT_BELOW = 10000
+
+# Change log (recipe.changes): most log entries read per request, and how
+# long tombstones are kept by `manage.py compact_changes`.
+CHANGES_MAX_LIMIT = 1000
+CHANGES_TOMBSTONE_DAYS = int(os.environ.get('CHANGES_TOMBSTONE_DAYS', 30))
+CHANGES_NOTIFY_CHANNEL = 'recipe_changes'
+
+# Server-sent change notifications (recipe.stream), served by app.asgi.
+CHANGES_STREAM_PATH = '/api/recipe/changes/stream/'
+# Seconds a stream ticket (for EventSource, instead of the API token in
+# the URL) can be used to open a stream.
+CHANGES_STREAM_TICKET_MAX_AGE = 60
+# Seconds between keep-alive comments on idle streams.
+CHANGES_STREAM_HEARTBEAT = 15
+# Seconds between attempts to reconnect the listener to the database.
+CHANGES_STREAM_RECONNECT = 5
+# Open streams per process, and per user within a process.
+CHANGES_STREAM_MAX_CONNECTIONS = int(
+    os.environ.get('CHANGES_STREAM_MAX_CONNECTIONS', 10000)
+)
+CHANGES_STREAM_MAX_PER_USER = 10
+
+# Most ids one `?ids=` multi-get on the list endpoints may ask for.
+MULTI_GET_MAX_IDS = 200
+
+# MessagePack / CBOR content negotiation (core.renderers, core.parsers),
+# when their libraries are installed. JSON stays the default.
+for _module, _name in [('msgpack', 'MessagePack'), ('cbor2', 'CBOR')]:
+    if importlib.util.find_spec(_module) is not None:
+        REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+            f'core.renderers.{_name}Renderer'
+        )
+        REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append(
+            f'core.parsers.{_name}Parser'
+        )
\ No newline at end of file
@@ -13,7 +13,6 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from drf_spectacular.views import ( # type: ignore
-    SpectacularAPIView,
     SpectacularSwaggerView,
 )
 
@@ -22,10 +21,16 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core import views as core_views
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
+    path('healthz/', core_views.healthz, name='healthz'),
+    path('readyz/', core_views.readyz, name='readyz'),
+    path('metrics', core_views.metrics_view, name='metrics'),
+    path('debug/memory/', core_views.memory_view, name='debug-memory'),
+    path('api/schema/', core_views.api_schema, name='api-schema'),
     path(
         'api/docs/',
         SpectacularSwaggerView.as_view(url_name='api-schema'),
@@ -0,0 +1,12 @@
+"""
+Benchmark scripts, run from the `app` directory as
+`python -m benchmarks.<name>`.
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# Measure the endpoints, not load shedding: one token fires every request.
+os.environ.setdefault('ADMISSION_ENABLED', '0')
+django.setup()
@@ -0,0 +1,62 @@
+"""
+Compare MessagePack and CBOR against JSON (FastJSONRenderer /
+FastJSONParser, and DRF's stdlib classes) on recipe list payloads: render
+time, parse time and body size. Payloads are built both like serializer
+output (OrderedDicts) and like the lean list path (plain dicts).
+
+    python -m benchmarks.binary_formats [--sizes 1000 10000] [--repeat 5]
+"""
+import argparse
+import io
+import json
+
+from benchmarks.json_renderers import recipe_list
+from benchmarks.utils import best_of
+
+from rest_framework.parsers import JSONParser  # type: ignore
+from rest_framework.renderers import JSONRenderer  # type: ignore
+
+from core.parsers import CBORParser, FastJSONParser, MessagePackParser
+from core.renderers import CBORRenderer, FastJSONRenderer, MessagePackRenderer
+
+FORMATS = {
+    'json (stdlib)': (JSONRenderer, JSONParser),
+    'json': (FastJSONRenderer, FastJSONParser),
+    'msgpack': (MessagePackRenderer, MessagePackParser),
+    'cbor': (CBORRenderer, CBORParser),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f'{"recipes":<10}{"payload":<12}{"format":<16}{"render ms":>12}'
+        f'{"parse ms":>12}{"KB":>10}'
+    )
+    for size in args.sizes:
+        serializer = recipe_list(size)
+        payloads = {
+            'serializer': serializer,
+            'lean': json.loads(JSONRenderer().render(serializer)),
+        }
+        for payload, data in payloads.items():
+            for name, (renderer_class, parser_class) in FORMATS.items():
+                renderer = renderer_class()
+                body = renderer.render(data)
+                render = best_of(lambda: renderer.render(data), args.repeat)
+                parse = best_of(
+                    lambda: parser_class().parse(io.BytesIO(body)),
+                    args.repeat
+                )
+                print(
+                    f'{size:<10}{payload:<12}{name:<16}{render:>12.2f}'
+                    f'{parse:>12.2f}{len(body) / 1024:>10.0f}'
+                )
+
+
+if __name__ == '__main__':
+    main()
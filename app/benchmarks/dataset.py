@@ -0,0 +1,42 @@
+"""
+Seeded benchmark datasets.
+
+The data is written by the `seed_data` management command (COPY on
+PostgreSQL, constraints rebuilt once, stats and signatures rebuilt at the
+end) with a Zipf exponent of 0, so every user gets the same number of
+recipes and picks tags and ingredients uniformly.
+"""
+import io
+
+from django.core.management import call_command
+
+from rest_framework.authtoken.models import Token  # type: ignore
+
+from core.management.commands import seed_data
+
+PASSWORD = 'benchpass123'
+
+
+def seed(users=1, recipes=1000, tags=20, ingredients=50,
+         tags_per_recipe=3, ingredients_per_recipe=6, seed=0):
+    """Create `users` users, each with `recipes` recipes linked to up to
+    `tags_per_recipe` of their `tags` and `ingredients_per_recipe` of their
+    `ingredients`. Returns an auth token per user (`token.user`)."""
+    command = seed_data.Command(stdout=io.StringIO())
+    call_command(
+        command,
+        users=users,
+        recipes=users * recipes,
+        tags_per_user=tags,
+        ingredients_per_user=ingredients,
+        max_tags_per_recipe=tags_per_recipe,
+        max_ingredients_per_recipe=ingredients_per_recipe,
+        zipf=0,
+        seed=seed,
+        password=PASSWORD,
+    )
+
+    return Token.objects.bulk_create(
+        Token(key=Token.generate_key(), user_id=user_id)
+        for user_id in command.user_ids
+    )
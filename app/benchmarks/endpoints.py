@@ -0,0 +1,415 @@
+"""
+End-to-end benchmark of every endpoint in `recipe/urls.py` and
+`user/urls.py`, driven in-process against a seeded throwaway database.
+
+    python -m benchmarks.endpoints --users 4 --recipes 1000 \\
+        --concurrency 1 4 --requests 200 --output run.json
+    python -m benchmarks.endpoints ... --compare baseline.json
+
+For each endpoint and concurrency level the JSON report has p50/p95/p99
+latency, throughput, SQL queries per request and the peak Python heap of
+a single request. Responses with status 400 and above, server errors
+included, are counted in `errors` rather than stopping the run. With
+`--compare`, p95 latency growth over `--threshold` or any increase in
+queries per request or errors counts as a regression and the exit status
+is 1.
+"""
+import argparse
+import itertools
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from benchmarks import dataset
+from benchmarks.utils import test_database
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import urls as recipe_urls
+from user import urls as user_urls
+
+
+class Context:
+    """Per-user state the endpoint scenarios draw ids from."""
+
+    def __init__(self, token):
+        self.token = token
+        self.user = token.user
+        self.recipe_ids = list(
+            Recipe.objects.filter(user=self.user).values_list('id', flat=True)
+        )
+        self.tag_ids = list(
+            Tag.objects.filter(user=self.user).values_list('id', flat=True)
+        )
+        self.ingredient_ids = list(
+            Ingredient.objects.filter(user=self.user)
+            .values_list('id', flat=True)
+        )
+
+
+_counter = itertools.count()
+
+
+def _pick(ids):
+    return ids[next(_counter) % len(ids)]
+
+
+def _recipe_payload():
+    n = next(_counter)
+    return {
+        'title': f'bench recipe {n}',
+        'time_minutes': 30,
+        'price': '5.50',
+        'tags': [{'name': 'bench'}],
+        'ingredients': [{'name': 'salt'}, {'name': 'pepper'}],
+    }
+
+
+def _new_recipe(ctx):
+    return Recipe.objects.create(
+        user=ctx.user, title='to delete', time_minutes=1,
+        price=Decimal('1.00'),
+    ).id
+
+
+# name -> prepare(ctx) returning (method, path, payload). prepare runs
+# outside the timed section, so fixtures for destructive calls live there.
+SCENARIOS = {
+    'user:create': lambda ctx: ('post', reverse('user:create'), {
+        'email': f'new{next(_counter)}@example.com',
+        'password': 'benchpass123',
+        'name': 'new user',
+    }),
+    'user:token': lambda ctx: ('post', reverse('user:token'), {
+        'email': ctx.user.email,
+        'password': dataset.PASSWORD,
+    }),
+    'user:me': lambda ctx: ('get', reverse('user:me'), None),
+    'user:me:patch': lambda ctx: (
+        'patch', reverse('user:me'), {'name': 'renamed'}
+    ),
+    'recipe:recipe-list': lambda ctx: (
+        'get', reverse('recipe:recipe-list'), None
+    ),
+    'recipe:recipe-list:sideload': lambda ctx: (
+        'get', reverse('recipe:recipe-list') + '?sideload=1', None
+    ),
+    'recipe:recipe-list:ids': lambda ctx: (
+        'get',
+        reverse('recipe:recipe-list') + '?ids=' + ','.join(
+            str(_pick(ctx.recipe_ids)) for _ in range(50)
+        ),
+        None
+    ),
+    'recipe:recipe-list:create': lambda ctx: (
+        'post', reverse('recipe:recipe-list'), _recipe_payload()
+    ),
+    'recipe:recipe-detail': lambda ctx: (
+        'get', reverse('recipe:recipe-detail', args=[_pick(ctx.recipe_ids)]),
+        None
+    ),
+    'recipe:recipe-detail:patch': lambda ctx: (
+        'patch',
+        reverse('recipe:recipe-detail', args=[_pick(ctx.recipe_ids)]),
+        {'time_minutes': 42},
+    ),
+    'recipe:recipe-detail:delete': lambda ctx: (
+        'delete', reverse('recipe:recipe-detail', args=[_new_recipe(ctx)]),
+        None
+    ),
+    'recipe:recipe-cookable': lambda ctx: (
+        'get',
+        reverse('recipe:recipe-cookable') + '?ingredients=' + ','.join(
+            str(pk) for pk in ctx.ingredient_ids[::3]
+        ),
+        None
+    ),
+    'recipe:recipe-similar': lambda ctx: (
+        'get', reverse('recipe:recipe-similar', args=[_pick(ctx.recipe_ids)]),
+        None
+    ),
+    'recipe:stats': lambda ctx: ('get', reverse('recipe:stats'), None),
+    'recipe:changes': lambda ctx: (
+        'get', reverse('recipe:changes') + '?since=0&limit=100', None
+    ),
+    'recipe:stream-ticket': lambda ctx: (
+        'post', reverse('recipe:stream-ticket'), None
+    ),
+    'recipe:shopping-list': lambda ctx: (
+        'get',
+        reverse('recipe:shopping-list') + '?recipes=' + ','.join(
+            str(_pick(ctx.recipe_ids)) for _ in range(7)
+        ),
+        None
+    ),
+    'recipe:tag-list': lambda ctx: ('get', reverse('recipe:tag-list'), None),
+    'recipe:tag-autocomplete': lambda ctx: (
+        'get',
+        reverse('recipe:tag-autocomplete') + f'?q=tag {_pick(range(10))}',
+        None
+    ),
+    'recipe:tag-detail:patch': lambda ctx: (
+        'patch', reverse('recipe:tag-detail', args=[_pick(ctx.tag_ids)]),
+        {'name': f'tag {next(_counter)}'},
+    ),
+    'recipe:tag-detail:delete': lambda ctx: (
+        'delete',
+        reverse(
+            'recipe:tag-detail',
+            args=[Tag.objects.create(user=ctx.user, name='gone').id]
+        ),
+        None,
+    ),
+    'recipe:ingredient-list': lambda ctx: (
+        'get', reverse('recipe:ingredient-list'), None
+    ),
+    'recipe:ingredient-autocomplete': lambda ctx: (
+        'get',
+        reverse('recipe:ingredient-autocomplete') + '?q=dient',
+        None
+    ),
+    'recipe:ingredient-detail:patch': lambda ctx: (
+        'patch',
+        reverse(
+            'recipe:ingredient-detail', args=[_pick(ctx.ingredient_ids)]
+        ),
+        {'name': f'ingredient {next(_counter)}'},
+    ),
+    'recipe:ingredient-detail:delete': lambda ctx: (
+        'delete',
+        reverse(
+            'recipe:ingredient-detail',
+            args=[Ingredient.objects.create(user=ctx.user, name='gone').id]
+        ),
+        None,
+    ),
+}
+
+
+def uncovered_endpoints():
+    """URL names in recipe/urls.py and user/urls.py without a scenario."""
+    covered = {':'.join(name.split(':')[:2]) for name in SCENARIOS}
+    names = {
+        f'recipe:{pattern.name}'
+        for pattern in recipe_urls.router.urls + recipe_urls.urlpatterns
+        if getattr(pattern, 'name', None) not in (None, 'api-root')
+    } | {f'user:{pattern.name}' for pattern in user_urls.urlpatterns}
+
+    return sorted(names - covered)
+
+
+def request(client, ctx, prepare):
+    """Issue one request; returns (elapsed seconds, queries, ok)."""
+    method, path, payload = prepare(ctx)
+    kwargs = {'HTTP_AUTHORIZATION': f'Token {ctx.token.key}'}
+    if payload is not None:
+        kwargs['data'] = json.dumps(payload)
+        kwargs['content_type'] = 'application/json'
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = getattr(client, method)(path, **kwargs)
+        elapsed = time.perf_counter() - start
+
+    return elapsed, len(queries), response.status_code < 400
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def make_client():
+    # A view raising (a deadlock, say) is a 500 to count, not the end of
+    # the run.
+    return Client(raise_request_exception=False)
+
+
+def peak_memory(ctx, prepare):
+    """Peak Python heap allocated while serving one request, in KiB."""
+    client = make_client()
+    request(client, ctx, prepare)  # warm up imports and caches
+    tracemalloc.start()
+    try:
+        request(client, ctx, prepare)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def run(name, contexts, concurrency, requests):
+    prepare = SCENARIOS[name]
+
+    def worker(offset):
+        client = make_client()
+        results = []
+        try:
+            for i in range(offset, requests, concurrency):
+                results.append(
+                    request(client, contexts[i % len(contexts)], prepare)
+                )
+        finally:
+            if concurrency > 1:
+                connection.close()
+        return results
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = worker(0)
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(itertools.chain.from_iterable(
+                pool.map(worker, range(concurrency))
+            ))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in results)
+    return {
+        'endpoint': name,
+        'concurrency': concurrency,
+        'requests': len(results),
+        'errors': sum(1 for _, _, ok in results if not ok),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'throughput_rps': round(len(results) / wall, 1),
+        'queries_per_request': round(
+            sum(q for _, q, _ in results) / len(results), 2
+        ),
+        'peak_memory_kib': peak_memory(contexts[0], prepare),
+    }
+
+
+def compare(report, baseline, threshold):
+    """Return human readable regressions of `report` against `baseline`."""
+    previous = {
+        (r['endpoint'], r['concurrency']): r for r in baseline['results']
+    }
+    regressions = []
+    for result in report['results']:
+        old = previous.get((result['endpoint'], result['concurrency']))
+        if old is None:
+            continue
+        label = f"{result['endpoint']} x{result['concurrency']}"
+        if result['p95_ms'] > old['p95_ms'] * (1 + threshold):
+            regressions.append(
+                f"{label}: p95 {old['p95_ms']} -> {result['p95_ms']} ms"
+            )
+        if result['queries_per_request'] > old['queries_per_request']:
+            regressions.append(
+                f"{label}: queries {old['queries_per_request']} -> "
+                f"{result['queries_per_request']}"
+            )
+        if result['errors'] > old.get('errors', 0):
+            regressions.append(
+                f"{label}: errors {old.get('errors', 0)} -> "
+                f"{result['errors']}"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--recipes', type=int, default=500,
+                        help='recipes per user')
+    parser.add_argument('--tags', type=int, default=20,
+                        help='tags per user')
+    parser.add_argument('--ingredients', type=int, default=50,
+                        help='ingredients per user')
+    parser.add_argument('--tags-per-recipe', type=int, default=3)
+    parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--requests', type=int, default=100,
+                        help='requests per endpoint and concurrency level')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(SCENARIOS),
+                        default=sorted(SCENARIOS))
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='baseline JSON report')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative p95 growth (default 0.2)')
+    args = parser.parse_args(argv)
+
+    dataset_args = {
+        'users': args.users,
+        'recipes': args.recipes,
+        'tags': args.tags,
+        'ingredients': args.ingredients,
+        'tags_per_recipe': args.tags_per_recipe,
+        'ingredients_per_recipe': args.ingredients_per_recipe,
+        'seed': args.seed,
+    }
+
+    for name in uncovered_endpoints():
+        print(f'WARNING no scenario for {name}', file=sys.stderr)
+
+    with test_database():
+        start = time.perf_counter()
+        tokens = dataset.seed(**dataset_args)
+        seed_seconds = time.perf_counter() - start
+        contexts = [Context(token) for token in tokens]
+
+        results = []
+        for name in args.endpoints:
+            for concurrency in args.concurrency:
+                result = run(name, contexts, concurrency, args.requests)
+                results.append(result)
+                print(
+                    f"{name:<34} x{concurrency:<3} "
+                    f"p50 {result['p50_ms']:>8.2f}  "
+                    f"p95 {result['p95_ms']:>8.2f}  "
+                    f"p99 {result['p99_ms']:>8.2f} ms  "
+                    f"{result['throughput_rps']:>8.1f} rps  "
+                    f"{result['queries_per_request']:>5} q  "
+                    f"{result['errors']} errors",
+                    file=sys.stderr
+                )
+
+    report = {
+        'meta': {
+            'dataset': dataset_args,
+            'seed_seconds': round(seed_seconds, 2),
+            'requests': args.requests,
+            'python': platform.python_version(),
+            'max_rss_kib': resource.getrusage(
+                resource.RUSAGE_SELF
+            ).ru_maxrss,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
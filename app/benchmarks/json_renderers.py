@@ -0,0 +1,80 @@
+"""
+Compare FastJSONRenderer / FastJSONParser against DRF's stdlib JSON
+classes on recipe list payloads.
+
+    python -m benchmarks.json_renderers [--sizes 1000 10000] [--repeat 5]
+"""
+import argparse
+import io
+from collections import OrderedDict
+from decimal import Decimal
+
+from benchmarks.utils import best_of
+
+from rest_framework.parsers import JSONParser  # type: ignore
+from rest_framework.renderers import JSONRenderer  # type: ignore
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+def recipe_list(size, decimals=False):
+    """Payload shaped like `RecipeSerializer(many=True).data`."""
+    recipes = []
+    for i in range(size):
+        price = (Decimal(i % 9999) / 100).quantize(Decimal('0.01'))
+        recipes.append(OrderedDict([
+            ('id', i),
+            ('title', f'recipe {i}'),
+            ('time_minutes', i % 120),
+            ('price', price if decimals else str(price)),
+            ('link', f'https://example.com/recipes/{i}.pdf'),
+            ('tags', [
+                OrderedDict([('id', t), ('name', f'tag {t}')])
+                for t in range(i % 4)
+            ]),
+            ('ingredients', [
+                OrderedDict([('id', n), ('name', f'ingredient {n}')])
+                for n in range(i % 8)
+            ]),
+        ]))
+    return recipes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"case":<28}{"stdlib ms":>12}{"fast ms":>12}{"speedup":>10}')
+    for size in args.sizes:
+        for decimals in (False, True):
+            data = recipe_list(size, decimals)
+            label = f'render {size}' + (' (Decimal)' if decimals else '')
+            stdlib = best_of(
+                lambda: JSONRenderer().render(data), args.repeat
+            )
+            fast = best_of(
+                lambda: FastJSONRenderer().render(data), args.repeat
+            )
+            print(
+                f'{label:<28}{stdlib:>12.2f}{fast:>12.2f}'
+                f'{stdlib / fast:>9.1f}x'
+            )
+
+        body = JSONRenderer().render(recipe_list(size))
+        stdlib = best_of(
+            lambda: JSONParser().parse(io.BytesIO(body)), args.repeat
+        )
+        fast = best_of(
+            lambda: FastJSONParser().parse(io.BytesIO(body)), args.repeat
+        )
+        label = f'parse {size}'
+        print(
+            f'{label:<28}{stdlib:>12.2f}{fast:>12.2f}{stdlib / fast:>9.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare the lean recipe list path, plain and side-loaded, against
+`RecipeSerializer`.
+
+    python -m benchmarks.recipe_list [--sizes 1000 10000] [--repeat 5]
+
+Needs a reachable database; the data lives in a throwaway test database.
+"""
+import argparse
+
+from benchmarks import dataset
+from benchmarks.utils import best_of, test_database
+
+from core.models import Recipe
+from core.renderers import FastJSONRenderer
+from recipe import listing
+from recipe.serializers import RecipeSerializer
+
+
+def sideloaded(queryset, fields):
+    items, included = listing.sideloaded_items(queryset, fields)
+    return {'results': [item for _, item in items], 'included': included}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    renderer = FastJSONRenderer()
+    fields = RecipeSerializer().fields
+
+    with test_database():
+        print(
+            f'{"recipes":<10}{"case":<22}{"ms":>10}{"speedup":>10}{"KB":>10}'
+        )
+        for size in args.sizes:
+            token, = dataset.seed(recipes=size, seed=size)
+            user = token.user
+            queryset = Recipe.objects.filter(user=user).order_by('-id')
+
+            cases = {
+                'serializer': lambda: renderer.render(
+                    RecipeSerializer(queryset.all(), many=True).data
+                ),
+                'serializer+prefetch': lambda: renderer.render(
+                    RecipeSerializer(
+                        queryset.prefetch_related('tags', 'ingredients'),
+                        many=True
+                    ).data
+                ),
+                'lean': lambda: renderer.render(
+                    listing.recipe_list(queryset.all(), fields)
+                ),
+                'lean+sideload': lambda: renderer.render(
+                    sideloaded(queryset.all(), fields)
+                ),
+            }
+            timings = {
+                name: best_of(func, args.repeat)
+                for name, func in cases.items()
+            }
+            for name, ms in timings.items():
+                speedup = timings['serializer'] / ms
+                kb = len(cases[name]()) / 1024
+                print(
+                    f'{size:<10}{name:<22}{ms:>10.1f}{speedup:>9.1f}x'
+                    f'{kb:>10.0f}'
+                )
+
+
+if __name__ == '__main__':
+    main()
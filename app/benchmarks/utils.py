@@ -0,0 +1,31 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+import contextlib
+import timeit
+
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+
+def best_of(func, repeat):
+    """Best wall time of `repeat` runs of `func`, in ms."""
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+@contextlib.contextmanager
+def test_database(keepdb=False):
+    """Run the block against a throwaway test database."""
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(
+            old_name, verbosity=0, keepdb=keepdb
+        )
+        teardown_test_environment()
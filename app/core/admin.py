@@ -1,7 +1,18 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import ManyToManyRawIdWidget
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.contrib.auth.base_user import BaseUserManager
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
-from core import models
+from core import estimates, models, profiling
+
+AFTER_VAR = 'after'
+
 
 class UserAdmin(BaseUserAdmin):
     """Define the admin pages for users."""
@@ -39,7 +50,212 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class ProfileAdmin(admin.ModelAdmin):
+    """Browse and download request profiles; they are only ever created
+    by core.middleware.ProfilingMiddleware."""
+    list_display = [
+        'created', 'method', 'path', 'status_code', 'duration_ms',
+        'queries', 'kind', 'user', 'download_link',
+    ]
+    list_filter = ['kind', 'method', 'status_code']
+    list_select_related = ['user']
+    search_fields = ['path']
+    date_hierarchy = 'created'
+    fields = [
+        'created', 'user', 'method', 'path', 'status_code', 'duration_ms',
+        'queries', 'kind', 'download_link', 'summary_text',
+    ]
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        # The raw profile is only read by the download view.
+        return super().get_queryset(request).defer('data')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download),
+                name='core_profile_download',
+            ),
+        ] + super().get_urls()
+
+    def download(self, request, pk):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(models.Profile, pk=pk)
+        extension = profiling.PROFILERS[profile.kind].extension
+        response = HttpResponse(
+            bytes(profile.data), content_type='application/octet-stream'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="profile-{profile.id}.{extension}"'
+        )
+        return response
+
+    @admin.display(description=_('Download'))
+    def download_link(self, obj):
+        url = reverse('admin:core_profile_download', args=[obj.id])
+        return format_html('<a href="{}">{}</a>', url, obj.kind)
+
+    @admin.display(description=_('Summary'))
+    def summary_text(self, obj):
+        return format_html('<pre>{}</pre>', obj.summary)
+
+
+class KeysetChangeList(ChangeList):
+    """Changelist paged by primary key, newest first: `?after=<pk>` shows
+    the page following that row, so deep pages cost the same as the
+    first instead of an ever larger OFFSET. The total is an estimate,
+    see core.estimates."""
+
+    def __init__(self, request, *args, **kwargs):
+        try:
+            self.after = int(request.GET[AFTER_VAR])
+        except (KeyError, ValueError):
+            self.after = None
+        super().__init__(request, *args, **kwargs)
+        # Filter, search and first page links start from the top again.
+        self.params.pop(AFTER_VAR, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        queryset = self.queryset.order_by('-pk')
+        if self.after is not None:
+            queryset = queryset.filter(pk__lt=self.after)
+        rows = list(queryset[:self.list_per_page + 1])
+
+        self.result_list = rows[:self.list_per_page]
+        self.result_count = estimates.estimated_count(self.queryset)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = len(rows) > self.list_per_page or \
+            self.after is not None
+        self.next_after = self.result_list[-1].pk \
+            if len(rows) > self.list_per_page else None
+        self.paginator = None
+
+    def next_page_url(self):
+        if self.next_after is None:
+            return None
+        return self.get_query_string({AFTER_VAR: self.next_after})
+
+    def first_page_url(self):
+        return self.get_query_string()
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Admin for tables too big for the defaults: keyset paged
+    changelists, estimated counts, no
+    column sorting and a search that only runs indexed lookups.
+
+    A search term that is a number finds that primary key, one with an
+    @ the rows of the user with that email, anything else rows whose
+    `prefix_search_field` starts with it (case-insensitive, served by an
+    UPPER(...) text_pattern_ops index).
+    """
+    change_list_template = 'admin/keyset_change_list.html'
+    paginator = estimates.EstimatedCountPaginator
+    show_full_result_count = False
+    sortable_by = ()
+    ordering = ['-id']
+    raw_id_fields = ['user']
+    list_select_related = ['user']
+    prefix_search_field = None
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        if '@' in term:
+            email = BaseUserManager.normalize_email(term)
+            return queryset.filter(user__email=email), False
+        return queryset.filter(
+            **{f'{self.prefix_search_field}__istartswith': term}
+        ), False
+
+    @admin.display(description=_('User'))
+    def user_filter_link(self, obj):
+        """The owner, linking to the changelist filtered by them."""
+        return format_html(
+            '<a href="?user__id__exact={}">{}</a>', obj.user_id, obj.user
+        )
+
+
+class OwnedRawIdWidget(ManyToManyRawIdWidget):
+    """Raw id widget whose lookup popup lists only `owner_id`'s rows."""
+    owner_id = None
+
+    def url_parameters(self):
+        params = super().url_parameters()
+        if self.owner_id is not None:
+            params['user__id__exact'] = self.owner_id
+        return params
+
+
+class RecipeAdminForm(forms.ModelForm):
+    """Only lets a recipe link the tags and ingredients of its owner."""
+    owned_fields = ['tags', 'ingredients']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.owned_fields:
+            self.fields[name].widget.owner_id = self.instance.user_id
+
+    def clean(self):
+        cleaned_data = super().clean()
+        user = cleaned_data.get('user')
+        if user is None:
+            return cleaned_data
+        for name in self.owned_fields:
+            linked = cleaned_data.get(name)
+            if linked is not None and linked.exclude(user=user).exists():
+                self.add_error(name, _("Must belong to the recipe's user."))
+        return cleaned_data
+
+
+class RecipeAdmin(ScalableAdmin):
+    list_display = ['title', 'user_filter_link', 'time_minutes', 'price']
+    search_fields = ['^title']
+    prefix_search_field = 'title'
+    form = RecipeAdminForm
+    raw_id_fields = ['user', 'tags', 'ingredients']
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name in RecipeAdminForm.owned_fields:
+            kwargs['widget'] = OwnedRawIdWidget(
+                db_field.remote_field, self.admin_site
+            )
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+
+class UsageCountedAdmin(ScalableAdmin):
+    """Usage counts follow the recipe links, see recipe.stats."""
+    list_display = ['name', 'user_filter_link', 'usage_count']
+    readonly_fields = ['usage_count']
+    search_fields = ['^name']
+    prefix_search_field = 'name'
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Tag, UsageCountedAdmin)
+admin.site.register(models.Ingredient, UsageCountedAdmin)
+admin.site.register(models.Profile, ProfileAdmin)
@@ -0,0 +1,174 @@
+"""
+Admission control: shed load early instead of queueing it.
+
+Every request is put in a priority class by the view serving it
+(ADMISSION_CLASSES, keyed like core.metrics.view_name; LIGHT otherwise):
+
+- CRITICAL (health checks, metrics, logins) is always admitted.
+- LIGHT may fill up to ADMISSION_SHARES['light'] of the process's
+  ADMISSION_MAX_CONCURRENT slots, HEAVY only up to
+  ADMISSION_SHARES['heavy'], so heavy requests are turned away first as
+  load builds and light ones keep working. Over its share a request gets
+  503.
+- Each client may have ADMISSION_MAX_CONCURRENT_PER_CLIENT LIGHT or HEAVY
+  requests in flight; beyond that it gets 429.
+- HEAVY requests also spend a token from the client's bucket, refilled at
+  ADMISSION_HEAVY_RATE per second up to ADMISSION_HEAVY_BURST; an empty
+  bucket means 429.
+
+Rejections carry `Retry-After`. Clients are the authenticated user (the
+token lookup is shared with the view's authentication, see
+core.authentication), or else the remote address, which a proxy in front
+must set to the real client's. Unauthenticated credentials count as
+anonymous, so made-up tokens can't buy fresh buckets. At most
+ADMISSION_MAX_CLIENTS buckets are kept, and buckets idle long enough to
+have refilled are dropped, which loses nothing. Limits are per process;
+with several workers, the effective limits are that many times higher.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+
+from rest_framework import exceptions  # type: ignore
+
+from core.authentication import TokenAuthentication
+
+CRITICAL = 'critical'
+LIGHT = 'light'
+HEAVY = 'heavy'
+
+MESSAGES = {
+    'overloaded': 'Server busy, try again later.',
+    'concurrency': 'Too many requests in progress.',
+    'rate': 'Request was throttled.',
+}
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Spend a token; returns 0, or the seconds until one is due."""
+        now = time.monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Rejected(Exception):
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class Limiter:
+    """Per-process admission state. Settings are read on every call."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.by_client = defaultdict(int)
+        self.buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def admit(self, client, priority):
+        """Take a slot for `client` (None if unknown) or raise Rejected.
+        The slot must be given back with `release(client, priority)`."""
+        if priority == CRITICAL:
+            with self._lock:
+                self.in_flight += 1
+            return
+
+        retry_after = settings.ADMISSION_RETRY_AFTER
+        with self._lock:
+            limit = settings.ADMISSION_MAX_CONCURRENT * \
+                settings.ADMISSION_SHARES[priority]
+            if self.in_flight >= limit:
+                raise Rejected(503, 'overloaded', retry_after)
+            if client is not None and self.by_client.get(client, 0) >= \
+                    settings.ADMISSION_MAX_CONCURRENT_PER_CLIENT:
+                raise Rejected(429, 'concurrency', retry_after)
+            if priority == HEAVY and client is not None:
+                wait = self._bucket(client).take()
+                if wait:
+                    raise Rejected(429, 'rate', wait)
+
+            self.in_flight += 1
+            if client is not None:
+                self.by_client[client] += 1
+
+    def release(self, client, priority):
+        with self._lock:
+            self.in_flight -= 1
+            if priority != CRITICAL and client is not None:
+                self.by_client[client] -= 1
+                if not self.by_client[client]:
+                    del self.by_client[client]
+
+    def _bucket(self, client):
+        bucket = self.buckets.get(client)
+        if bucket is None:
+            self._expire()
+            bucket = self.buckets[client] = TokenBucket(
+                settings.ADMISSION_HEAVY_RATE, settings.ADMISSION_HEAVY_BURST
+            )
+            while len(self.buckets) > settings.ADMISSION_MAX_CLIENTS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client)
+        return bucket
+
+    def _expire(self):
+        """Drop the least recently used buckets that have refilled since,
+        as a new bucket would be the same."""
+        full_after = settings.ADMISSION_HEAVY_BURST / \
+            settings.ADMISSION_HEAVY_RATE
+        now = time.monotonic()
+        while self.buckets:
+            oldest = next(iter(self.buckets.values()))
+            if now - oldest.updated < full_after:
+                break
+            self.buckets.popitem(last=False)
+
+    def reset(self):
+        with self._lock:
+            self.in_flight = 0
+            self.by_client.clear()
+            self.buckets.clear()
+
+
+limiter = Limiter()
+
+
+def priority(view_name):
+    return settings.ADMISSION_CLASSES.get(view_name, LIGHT)
+
+
+def client_key(request):
+    """`user:<id>` for a valid API token or session, else `addr:<remote
+    address>`; None if there is neither."""
+    try:
+        result = TokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        result = None
+    user = result[0] if result else None
+    if user is None and \
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME):
+        user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    address = request.META.get('REMOTE_ADDR')
+    return f'addr:{address}' if address else None
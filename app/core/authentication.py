@@ -0,0 +1,20 @@
+from rest_framework import authentication  # type: ignore
+
+from core import timing
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+    """DRF token authentication that reports its time to the request's
+    `auth` Server-Timing phase. A request is looked up once: the user
+    found before the view runs (by core.admission) is reused by DRF."""
+
+    def authenticate(self, request):
+        # DRF's Request reads attributes through to the HttpRequest.
+        result = getattr(request, '_token_authenticated', None)
+        if result is not None:
+            return result
+        with timing.phase('auth'):
+            result = super().authenticate(request)
+        if result is not None:
+            request._token_authenticated = result
+        return result
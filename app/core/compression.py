@@ -0,0 +1,128 @@
+"""
+gzip / brotli helpers shared by the compression middleware, the schema
+view and the static files storage.
+
+Brotli is preferred and gzip serves clients that don't accept it.
+"""
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+
+import brotli
+
+# Supported encodings, most preferred first.
+ENCODINGS = ['br', 'gzip']
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Dynamic responses are compressed on the request path, so favour speed;
+# precompressed variants are made once and can afford the best ratio.
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+STATIC_LEVELS = {'br': 11, 'gzip': 9}
+
+
+def accepted_encoding(header):
+    """Pick the best supported encoding from an Accept-Encoding header, or
+    None if the client accepts none of them."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+
+    for encoding in ENCODINGS:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+
+    return None
+
+
+def compress(data, encoding, static=False):
+    levels = STATIC_LEVELS if static else DYNAMIC_LEVELS
+    if encoding == 'br':
+        return brotli.compress(data, quality=levels['br'])
+    return gzip.compress(data, compresslevel=levels['gzip'], mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of bytes incrementally, yielding output as soon
+    as the compressor produces it."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=DYNAMIC_LEVELS['br'])
+        process, flush, finish = (
+            compressor.process, compressor.flush, compressor.finish
+        )
+    else:
+        compressor = zlib.compressobj(
+            DYNAMIC_LEVELS['gzip'], zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+        process = compressor.compress
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+        finish = compressor.flush
+
+    for chunk in chunks:
+        data = process(chunk)
+        # Flush per chunk so streamed output isn't held back until the end.
+        data += flush()
+        if data:
+            yield data
+
+    yield finish()
+
+
+def write_variants(path, data=None):
+    """Write precompressed copies of `path` next to it (`.gz`, `.br`)."""
+    if data is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+
+    written = []
+    for encoding in ENCODINGS:
+        variant = path + SUFFIXES[encoding]
+        with open(variant, 'wb') as f:
+            f.write(compress(data, encoding, static=True))
+        written.append(variant)
+
+    return written
+
+
+class VariantCache:
+    """Size bounded LRU of compressed bodies keyed by (ETag, encoding)."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self.size -= len(self._data.pop(key))
+            self._data[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
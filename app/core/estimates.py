@@ -0,0 +1,61 @@
+"""
+Row count estimates for pages that only need a rough total.
+
+`COUNT(*)` reads every matching row, which on large tables costs more
+than the page itself. Unfiltered tables are estimated from
+pg_class.reltuples (kept current by autovacuum/ANALYZE), filtered
+querysets from the planner's row estimate. Estimates below
+ESTIMATED_COUNT_EXACT_BELOW are replaced by an exact count, which is cheap
+at that size and keeps small tables (and tests) exact.
+"""
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def table_estimate(model, using='default'):
+    """pg_class.reltuples of the model's table; None if never analyzed."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def plan_estimate(queryset):
+    """The planner's estimate of the rows `queryset` returns."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimated_count(queryset):
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+
+    if queryset.query.where:
+        estimate = plan_estimate(queryset)
+    else:
+        estimate = table_estimate(queryset.model, queryset.db)
+    if estimate is None or estimate < settings.ESTIMATED_COUNT_EXACT_BELOW:
+        return queryset.count()
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose `count` is `estimated_count()`."""
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
@@ -0,0 +1,91 @@
+"""
+Readiness probes shared by the wait_for_db command and the health views.
+"""
+import logging
+import random
+import time
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+logger = logging.getLogger('core.health')
+
+# Once a process has seen every migration applied it stays that way until
+# the code changes, so the (import heavy) migration graph is built at most
+# until the first successful check.
+_migrated_aliases = set()
+
+
+def backoff_delays(base=0.1, cap=5.0, factor=2.0):
+    """Yield sleep intervals using capped exponential backoff with full
+    jitter, so a fleet of containers doesn't retry in lock step."""
+    attempt = 0
+    while True:
+        ceiling = min(cap, base * (factor ** attempt))
+        yield random.uniform(0, ceiling)
+        attempt += 1
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    """Run a cheap `SELECT 1` round trip against the database."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def pending_migrations(alias=DEFAULT_DB_ALIAS):
+    """Return the names of migrations not yet applied to the database."""
+    if alias in _migrated_aliases:
+        return []
+
+    executor = MigrationExecutor(connections[alias])
+    targets = executor.loader.graph.leaf_nodes()
+    plan = executor.migration_plan(targets)
+    pending = [f'{m.app_label}.{m.name}' for m, backwards in plan]
+
+    if not pending:
+        _migrated_aliases.add(alias)
+
+    return pending
+
+
+def run_checks(alias=DEFAULT_DB_ALIAS, migrations=True):
+    """Run the readiness checks and return a report with timings in ms.
+    The report is served unauthenticated, so failures are only described
+    in the log."""
+    report = {'ready': True, 'checks': {}}
+
+    start = time.perf_counter()
+    try:
+        check_database(alias)
+        report['checks']['database'] = {'ok': True}
+    except Exception:
+        logger.exception('readiness check: database unavailable')
+        report['ready'] = False
+        report['checks']['database'] = {
+            'ok': False, 'error': 'database unavailable'
+        }
+    report['checks']['database']['ms'] = _elapsed_ms(start)
+
+    if migrations and report['ready']:
+        start = time.perf_counter()
+        try:
+            pending = pending_migrations(alias)
+            report['checks']['migrations'] = {
+                'ok': not pending,
+                'pending': pending,
+            }
+            report['ready'] = not pending
+        except Exception:
+            logger.exception('readiness check: migration check failed')
+            report['ready'] = False
+            report['checks']['migrations'] = {
+                'ok': False, 'error': 'migration check failed'
+            }
+        report['checks']['migrations']['ms'] = _elapsed_ms(start)
+
+    return report
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 3)
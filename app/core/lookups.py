@@ -0,0 +1,24 @@
+"""
+`field__any=[1, 2, 3]`, compiling to `field = ANY(%s)` with the values as
+a single array parameter. Unlike `__in`, which has a placeholder per value,
+the statement text is the same for any number of values.
+"""
+from django.db.models import Field, Lookup
+
+
+@Field.register_lookup
+class Any(Lookup):
+    lookup_name = 'any'
+    prepare_rhs = False
+
+    def get_db_prep_lookup(self, value, connection):
+        field = self.lhs.output_field
+        return '%s', [[
+            field.get_db_prep_value(item, connection, prepared=False)
+            for item in value
+        ]]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} = ANY({rhs})', lhs_params + rhs_params
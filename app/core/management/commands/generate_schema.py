@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the OpenAPI schema served at /api/schema/.'
+
+    def handle(self, *args, **options):
+        for path in schema.write_schema():
+            self.stdout.write(f'wrote {path}')
+
+        self.stdout.write(self.style.SUCCESS('schema generated'))
@@ -0,0 +1,92 @@
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.test import APIClient  # type: ignore
+
+from core import memory
+
+
+class Command(BaseCommand):
+    help = (
+        'Request GET endpoints in-process under tracemalloc and report each '
+        "one's peak memory per request, the allocation sites that grew over "
+        'the repeated requests and the top allocation sites overall.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', required=True,
+                            dest='urls', help='path to request, repeatable')
+        parser.add_argument('--user', required=True,
+                            help='email of the user to request as')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--limit', type=int, default=15,
+                            help='allocation sites to list')
+        parser.add_argument('--frames', type=int, default=1,
+                            help='traceback depth tracemalloc records')
+        parser.add_argument('--host', default='localhost',
+                            help='Host header, must be in ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"no user {options['user']}")
+        if not 1 <= options['frames'] <= memory.MAX_FRAMES:
+            raise CommandError(
+                f'--frames must be from 1 to {memory.MAX_FRAMES}'
+            )
+        # Authenticated in-process, so no API token is left behind.
+        client = APIClient(HTTP_HOST=options['host'])
+        client.force_authenticate(user)
+
+        was_tracing = tracemalloc.is_tracing()
+        memory.start(options['frames'])
+        try:
+            self.run(client, options)
+        finally:
+            if not was_tracing:
+                memory.stop()
+
+    def run(self, client, options):
+        # Warm up imports and caches before the baseline.
+        for url in options['urls']:
+            self.get(client, url)
+        memory.diff()
+
+        self.stdout.write('peak traced memory per request (KiB):')
+        for url in options['urls']:
+            peaks = []
+            for _ in range(options['repeat']):
+                start = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                self.get(client, url)
+                peaks.append(
+                    (tracemalloc.get_traced_memory()[1] - start) / 1024
+                )
+            self.stdout.write(
+                f'  {url}: max {max(peaks):.1f}, '
+                f'mean {sum(peaks) / len(peaks):.1f}'
+            )
+
+        self.stdout.write(
+            f"growth over {options['repeat']} requests per URL:"
+        )
+        for stat in memory.diff(options['limit']):
+            self.stdout.write(
+                f"  {stat['size_diff_kib']:+10.1f} KiB "
+                f"{stat['count_diff']:+7d}  {stat['site']}"
+            )
+
+        self.stdout.write('top allocation sites:')
+        for stat in memory.top(options['limit']):
+            self.stdout.write(
+                f"  {stat['size_kib']:10.1f} KiB {stat['count']:7d}  "
+                f"{stat['site']}"
+            )
+
+    def get(self, client, url):
+        response = client.get(url)
+        if response.status_code >= 400:
+            raise CommandError(f'GET {url} returned {response.status_code}')
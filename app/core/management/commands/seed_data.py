@@ -0,0 +1,385 @@
+import contextlib
+import io
+import itertools
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+
+from core.models import Recipe, RecipeSignature, Tag, Ingredient
+from recipe import similarity, stats
+
+ADJECTIVES = [
+    'spicy', 'smoky', 'crispy', 'creamy', 'zesty', 'roasted', 'grilled',
+    'braised', 'tangy', 'sweet', 'savory', 'herby', 'garlicky', 'quick',
+]
+DISHES = [
+    'noodles', 'curry', 'soup', 'salad', 'tacos', 'risotto', 'stew',
+    'pancakes', 'dumplings', 'pilaf', 'stir fry', 'flatbread', 'chili',
+]
+
+
+def zipf_weights(n, s):
+    """Zipf(s) weights for ranks 1..n."""
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def zipf_split(total, n, s):
+    """Split `total` into `n` Zipf(s) distributed integer counts that add up
+    to exactly `total`, largest first."""
+    weights = zipf_weights(n, s)
+    norm = sum(weights)
+    counts = [int(total * w / norm) for w in weights]
+    for i in range(total - sum(counts)):
+        counts[i % n] += 1
+    return counts
+
+
+class Writer:
+    """Insert rows of strings with COPY on PostgreSQL and bulk_create
+    elsewhere."""
+
+    def __init__(self, alias, batch_size):
+        self.connection = connections[alias]
+        self.alias = alias
+        self.batch_size = batch_size
+        self.copy = self.connection.vendor == 'postgresql'
+
+    def write(self, model, field_names, rows):
+        fields = [model._meta.get_field(name) for name in field_names]
+        rows = iter(rows)
+        count = 0
+        for batch in iter(
+            lambda: list(itertools.islice(rows, self.batch_size)), []
+        ):
+            if self.copy:
+                self._copy(model, fields, batch)
+            else:
+                attnames = [field.attname for field in fields]
+                model.objects.using(self.alias).bulk_create(
+                    model(**dict(zip(attnames, row))) for row in batch
+                )
+            count += len(batch)
+        return count
+
+    def _copy(self, model, fields, batch):
+        buf = io.StringIO('\n'.join(['\t'.join(row) for row in batch]))
+        columns = ', '.join(
+            self.connection.ops.quote_name(field.column) for field in fields
+        )
+        table = self.connection.ops.quote_name(model._meta.db_table)
+        with self.connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f'COPY {table} ({columns}) FROM STDIN', buf
+            )
+
+    def next_id(self, model):
+        current = model.objects.using(self.alias).aggregate(m=Max('id'))['m']
+        return (current or 0) + 1
+
+    def reset_sequences(self, models):
+        sql = self.connection.ops.sequence_reset_sql(no_style(), models)
+        with self.connection.cursor() as cursor:
+            for statement in sql:
+                cursor.execute(statement)
+
+    @contextlib.contextmanager
+    def without_constraints(self, models):
+        """On PostgreSQL, drop foreign keys, unique constraints and
+        secondary indexes of `models` for the duration of the block and
+        rebuild them afterwards: one validating pass per constraint is far
+        cheaper than per-row index updates and deferred trigger checks."""
+        if not self.copy:
+            yield
+            return
+
+        tables = [model._meta.db_table for model in models]
+        with self.connection.cursor() as cursor:
+            # Tables with pending deferred checks can't be altered.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute(
+                """
+                SELECT conrelid::regclass::text, conname,
+                       pg_get_constraintdef(oid)
+                FROM pg_constraint
+                WHERE conrelid = ANY(%s::regclass[]) AND contype IN ('f', 'u')
+                """,
+                [tables]
+            )
+            constraints = cursor.fetchall()
+            cursor.execute(
+                """
+                SELECT i.indexname, i.indexdef
+                FROM pg_indexes i
+                WHERE i.schemaname = current_schema()
+                  AND i.tablename = ANY(%s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM pg_constraint c
+                      WHERE c.conname = i.indexname
+                  )
+                """,
+                [tables]
+            )
+            indexes = cursor.fetchall()
+
+            quote = self.connection.ops.quote_name
+            for table, name, definition in constraints:
+                cursor.execute(
+                    f'ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(name)}'
+                )
+            for name, definition in indexes:
+                cursor.execute(f'DROP INDEX {quote(name)}')
+
+        yield
+
+        with self.connection.cursor() as cursor:
+            for name, definition in indexes:
+                cursor.execute(definition)
+            for table, name, definition in constraints:
+                cursor.execute(
+                    f'ALTER TABLE {quote(table)} '
+                    f'ADD CONSTRAINT {quote(name)} {definition}'
+                )
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users, recipes, tags and ingredients for load '
+        'testing. Recipe counts per user and tag/ingredient reuse follow '
+        'a Zipf distribution; the same --seed gives the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=10000,
+                            help='total recipes across all users')
+        parser.add_argument('--tags-per-user', type=int, default=30)
+        parser.add_argument('--ingredients-per-user', type=int, default=80)
+        parser.add_argument('--max-tags-per-recipe', type=int, default=4)
+        parser.add_argument('--max-ingredients-per-recipe', type=int,
+                            default=10)
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Zipf exponent for skewed distributions')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='password123',
+                            help='password shared by every generated user')
+        parser.add_argument('--batch-size', type=int, default=100000)
+        parser.add_argument('--skip-signatures', action='store_true',
+                            help='leave similar recipe signatures to '
+                                 'rebuild_recipe_signatures')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1')
+
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        writer = Writer(options['database'], options['batch_size'])
+        bulk_models = [
+            Recipe,
+            Recipe.tags.through,
+            Recipe.ingredients.through,
+        ]
+        start = time.monotonic()
+
+        with transaction.atomic(using=options['database']):
+            user_ids = self.user_ids = self.write_users(writer)
+            tag_ids = self.write_named(
+                writer, Tag, user_ids, options['tags_per_user'], 'tag'
+            )
+            ingredient_ids = self.write_named(
+                writer, Ingredient, user_ids,
+                options['ingredients_per_user'], 'ingredient'
+            )
+            with writer.without_constraints(bulk_models):
+                self.write_recipes(writer, user_ids, tag_ids, ingredient_ids)
+                step = time.monotonic()
+            self.stdout.write(
+                f'rebuilt constraints in {time.monotonic() - step:.1f}s'
+            )
+            writer.reset_sequences(
+                [get_user_model(), Tag, Ingredient] + bulk_models
+            )
+            # COPY and bulk_create bypass the signals maintaining stats.
+            step = time.monotonic()
+            stats.rebuild(user_ids)
+            stats.recount_usage()
+            self.stdout.write(
+                f'rebuilt recipe stats in {time.monotonic() - step:.1f}s'
+            )
+            if not options['skip_signatures']:
+                step = time.monotonic()
+                with writer.without_constraints([RecipeSignature]):
+                    self.write_signatures(writer, user_ids)
+                self.stdout.write(
+                    f'rebuilt recipe signatures in '
+                    f'{time.monotonic() - step:.1f}s'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'seeded in {time.monotonic() - start:.1f}s'
+        ))
+
+    def write_signatures(self, writer, user_ids, chunk_size=2000):
+        """Write the similarity signatures of the new recipes, like
+        similarity.rebuild() but with COPY."""
+        recipe_ids = list(
+            Recipe.objects.using(writer.alias)
+            .filter(user_id__in=user_ids).order_by('id')
+            .values_list('id', flat=True)
+        )
+
+        def array(values):
+            return '{' + ','.join(map(str, values)) + '}'
+
+        def rows():
+            for start in range(0, len(recipe_ids), chunk_size):
+                chunk = recipe_ids[start:start + chunk_size]
+                for pk, values, buckets in similarity.compute(chunk):
+                    yield str(pk), array(values), array(buckets)
+
+        return writer.write(
+            RecipeSignature, ['recipe', 'signature', 'buckets'], rows()
+        )
+
+    def report(self, label, count, start):
+        elapsed = time.monotonic() - start
+        rate = count / elapsed if elapsed else count
+        self.stdout.write(f'{label}: {count} rows ({rate:,.0f}/s)')
+
+    def write_users(self, writer):
+        User = get_user_model()
+        # Hashing is deliberately slow, so every user shares one hash.
+        password = make_password(self.options['password'])
+        first_id = writer.next_id(User)
+        n = self.options['users']
+        seed = self.options['seed']
+        start = time.monotonic()
+
+        writer.write(
+            User,
+            ['id', 'email', 'name', 'password', 'is_active', 'is_staff',
+             'is_superuser'],
+            (
+                (str(first_id + i), f'seed{seed}.{i}@example.com',
+                 f'seed user {i}', password, 't', 'f', 'f')
+                for i in range(n)
+            )
+        )
+        self.report('users', n, start)
+
+        return list(range(first_id, first_id + n))
+
+    def write_named(self, writer, model, user_ids, per_user, label):
+        """Write `per_user` rows for every user; returns each user's ids as
+        strings, most popular first."""
+        next_id = writer.next_id(model)
+        start = time.monotonic()
+
+        ids = [
+            [str(next_id + u * per_user + i) for i in range(per_user)]
+            for u in range(len(user_ids))
+        ]
+        count = writer.write(
+            model,
+            ['id', 'user', 'name', 'usage_count'],
+            (
+                (pk, str(user_id), f'{label} {i}', '0')
+                for user_id, pks in zip(user_ids, ids)
+                for i, pk in enumerate(pks)
+            )
+        )
+        self.report(model._meta.verbose_name_plural, count, start)
+
+        return ids
+
+    def write_recipes(self, writer, user_ids, tag_ids, ingredient_ids):
+        options = self.options
+        random_ = self.rng.random
+        choices = self.rng.choices
+        counts = zipf_split(options['recipes'], len(user_ids), options['zipf'])
+        titles = [f'{a} {d}' for a in ADJECTIVES for d in DISHES]
+        descriptions = [f'how to make {title}' for title in titles]
+        relations = [
+            (
+                'tags', tag_ids, options['max_tags_per_recipe'] + 1,
+                list(itertools.accumulate(
+                    zipf_weights(options['tags_per_user'], options['zipf'])
+                )),
+            ),
+            (
+                'ingredients', ingredient_ids,
+                options['max_ingredients_per_recipe'] + 1,
+                list(itertools.accumulate(zipf_weights(
+                    options['ingredients_per_user'], options['zipf']
+                ))),
+            ),
+        ]
+        links = {name: [] for name, *_ in relations}
+        first_id = writer.next_id(Recipe)
+        start = time.monotonic()
+
+        def recipes():
+            pk = first_id
+            for u, (user_id, count) in enumerate(zip(user_ids, counts)):
+                user_id = str(user_id)
+                for _ in range(count):
+                    pk_str = str(pk)
+                    t = int(random_() * len(titles))
+                    cents = 50 + int(random_() * 99950)
+                    yield (
+                        pk_str, user_id, titles[t], descriptions[t],
+                        str(1 + int(random_() * 240)),
+                        f'{cents // 100}.{cents % 100:02d}',
+                        f'https://example.com/recipes/{pk}',
+                    )
+                    for name, ids, max_k, cum_weights in relations:
+                        k = int(random_() * max_k)
+                        if k and ids[u]:
+                            targets = ids[u]
+                            links[name].extend(
+                                (pk_str, targets[i]) for i in set(choices(
+                                    range(len(targets)),
+                                    cum_weights=cum_weights, k=k
+                                ))
+                            )
+                    pk += 1
+
+        def batches():
+            # Links reference recipes still in the current COPY batch, so
+            # they are only flushed between batches.
+            rows = recipes()
+            while True:
+                batch = list(itertools.islice(rows, writer.batch_size))
+                if not batch:
+                    return
+                yield batch
+                self.flush_links(writer, links)
+
+        count = 0
+        for batch in batches():
+            count += writer.write(
+                Recipe,
+                ['id', 'user', 'title', 'description', 'time_minutes',
+                 'price', 'link'],
+                batch
+            )
+        self.report('recipes', count, start)
+
+    def flush_links(self, writer, links):
+        for relation, rows in links.items():
+            if not rows:
+                continue
+            field = Recipe._meta.get_field(relation)
+            writer.write(
+                field.remote_field.through,
+                ['recipe', field.m2m_reverse_field_name()],
+                rows
+            )
+            rows.clear()
@@ -1,21 +1,65 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from psycopg2 import OperationalError as psycopg2Error
 from django.db.utils import OperationalError
 import time
 
+from core import health
+
 
 class Command(BaseCommand):
+    help = 'Block until the database accepts connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--base-delay', type=float, default=0.1)
+        parser.add_argument('--max-delay', type=float, default=5.0)
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=None,
+            help='Give up after this many seconds.'
+        )
+        parser.add_argument(
+            '--check-migrations',
+            action='store_true',
+            help='Also wait until there are no unapplied migrations.'
+        )
+
+    def probe(self, alias):
+        health.check_database(alias)
+
     def handle(self, *args, **options):
         self.stdout.write('waiting for db...')
-        db_up = False
+        alias = options['database']
+        delays = health.backoff_delays(
+            base=options['base_delay'],
+            cap=options['max_delay']
+        )
+        deadline = None
+        if options['timeout'] is not None:
+            deadline = time.monotonic() + options['timeout']
 
-        while db_up is False:
+        while True:
             try:
-                self.check(databases=['default'])
-                db_up = True
+                self.probe(alias)
+                break
             except (psycopg2Error, OperationalError):
-                self.stdout.write('database unavailable, waiting 1 sec')
-                time.sleep(1)
+                delay = next(delays)
+                if deadline is not None and \
+                        time.monotonic() + delay > deadline:
+                    raise CommandError('database unavailable, giving up')
+                self.stdout.write(
+                    f'database unavailable, waiting {delay:.2f} sec'
+                )
+                time.sleep(delay)
 
         self.stdout.write(self.style.SUCCESS('database available'))
+
+        if options['check_migrations']:
+            pending = health.pending_migrations(alias)
+            if pending:
+                raise CommandError(
+                    'unapplied migrations: ' + ', '.join(pending)
+                )
+            self.stdout.write(self.style.SUCCESS('migrations applied'))
@@ -0,0 +1,150 @@
+"""
+tracemalloc based memory diagnostics.
+
+Tracing is off by default because it slows every allocation down. Turn it
+on with MEMORY_TRACING (or PYTHONTRACEMALLOC=<frames>), or at runtime
+through the staff endpoint. While tracing:
+
+* `top()` and `diff()` report the source lines holding the most memory
+  and what grew since the previous `diff()`.
+* MemoryWatermarkMiddleware records each request's peak traced memory
+  per view and logs requests above MEMORY_WATERMARK_KIB.
+
+tracemalloc is process wide, so with several requests in flight on
+threads a request's peak includes its neighbours' allocations.
+"""
+import linecache
+import logging
+import os
+import resource
+import threading
+import tracemalloc
+
+logger = logging.getLogger('core.memory')
+
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+# tracemalloc.start() accepts traceback depths from 1 up to this.
+MAX_FRAMES = 65535
+
+_lock = threading.Lock()
+_baseline = None
+# view -> {'requests', 'max_kib', 'total_kib'}
+_peaks = {}
+
+
+def start(frames=1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop():
+    global _baseline
+    tracemalloc.stop()
+    with _lock:
+        _baseline = None
+        _peaks.clear()
+
+
+def snapshot():
+    return tracemalloc.take_snapshot().filter_traces(_FILTERS)
+
+
+def _site(traceback):
+    frame = traceback[0]
+    return f'{frame.filename}:{frame.lineno}'
+
+
+def top(limit=20, snap=None):
+    """The `limit` source lines holding the most traced memory."""
+    snap = snap or snapshot()
+    return [
+        {
+            'site': _site(stat.traceback),
+            'size_kib': round(stat.size / 1024, 1),
+            'count': stat.count,
+        }
+        for stat in snap.statistics('lineno')[:limit]
+    ]
+
+
+def diff(limit=20):
+    """The `limit` source lines whose traced memory changed most since the
+    previous call, biggest growth first. The first call only records the
+    baseline and returns an empty list."""
+    global _baseline
+    snap = snapshot()
+    with _lock:
+        previous, _baseline = _baseline, snap
+    if previous is None:
+        return []
+
+    stats = snap.compare_to(previous, 'lineno')
+    return [
+        {
+            'site': _site(stat.traceback),
+            'size_kib': round(stat.size / 1024, 1),
+            'size_diff_kib': round(stat.size_diff / 1024, 1),
+            'count': stat.count,
+            'count_diff': stat.count_diff,
+        }
+        for stat in stats[:limit]
+        if stat.size_diff
+    ]
+
+
+def rss_kib():
+    """Current resident set size, or None where /proc isn't available."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+def record_peak(view, kib):
+    with _lock:
+        stats = _peaks.setdefault(
+            view, {'requests': 0, 'max_kib': 0.0, 'total_kib': 0.0}
+        )
+        stats['requests'] += 1
+        stats['max_kib'] = max(stats['max_kib'], kib)
+        stats['total_kib'] += kib
+
+
+def peaks():
+    """Per view request count, max and mean peak traced memory in KiB."""
+    with _lock:
+        return {
+            view: {
+                'requests': stats['requests'],
+                'max_kib': round(stats['max_kib'], 1),
+                'mean_kib': round(stats['total_kib'] / stats['requests'], 1),
+            }
+            for view, stats in sorted(_peaks.items())
+        }
+
+
+def report(limit=20, include_diff=False):
+    current, peak = tracemalloc.get_traced_memory()
+    data = {
+        'tracing': tracemalloc.is_tracing(),
+        'pid': os.getpid(),
+        'rss_kib': rss_kib(),
+        'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'traced_kib': round(current / 1024, 1),
+        'traced_peak_kib': round(peak / 1024, 1),
+        'requests': peaks(),
+    }
+    if data['tracing']:
+        data['top'] = top(limit)
+        if include_diff:
+            data['diff'] = diff(limit)
+    return data
@@ -0,0 +1,120 @@
+"""
+Prometheus metrics, served at /metrics.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to a
+directory all workers share and empty it before they start. Every process
+then records into its own memory-mapped files there and /metrics merges
+them, so any worker can answer a scrape with totals for all of them.
+Servers that recycle workers should call `mark_process_dead(pid)` when a
+worker exits so its in-flight gauge is dropped.
+"""
+import os
+
+from prometheus_client import (  # type: ignore
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+UNMATCHED = '<unmatched>'
+# Any other request method is counted as OTHER_METHOD so clients cannot
+# create label values at will.
+METHODS = {'DELETE', 'GET', 'HEAD', 'OPTIONS', 'PATCH', 'POST', 'PUT'}
+OTHER_METHOD = 'OTHER'
+
+REQUESTS = Counter(
+    'http_requests_total',
+    'Requests served, by view and response status.',
+    ['view', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time from the request reaching Django to the response leaving it.',
+    ['view', 'method'],
+    buckets=(
+        .005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 10.0,
+    ),
+)
+IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'Requests currently being served.',
+    multiprocess_mode='livesum',
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL queries issued per request.',
+    ['view'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_TIME = Histogram(
+    'http_request_db_seconds',
+    'Time spent in SQL queries per request.',
+    ['view'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5),
+)
+REQUEST_MEMORY = Histogram(
+    'http_request_peak_traced_bytes',
+    'Peak tracemalloc traced memory per request, while tracing is on.',
+    ['view'],
+    buckets=(
+        64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2,
+        64 * 1024 ** 2, 256 * 1024 ** 2,
+    ),
+)
+ADMISSION_REJECTIONS = Counter(
+    'http_requests_rejected_total',
+    'Requests turned away by admission control, by view and reason.',
+    ['view', 'reason'],
+)
+CHANGE_STREAMS = Gauge(
+    'change_streams_open',
+    'Open server-sent change notification streams (recipe.stream).',
+    multiprocess_mode='livesum',
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total',
+    'In-process cache lookups, by cache and outcome (hit or miss).',
+    ['cache', 'result'],
+)
+
+
+def view_name(view_func, method):
+    """`RecipeViewSet.list` for viewset actions, the class name for other
+    DRF views and the function name for plain Django views."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', UNMATCHED)
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(method.lower())
+        if action:
+            return f'{cls.__name__}.{action}'
+    return cls.__name__
+
+
+def method_label(method):
+    return method if method in METHODS else OTHER_METHOD
+
+
+def cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def mark_process_dead(pid):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+
+def render():
+    """The exposition text and its content type."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
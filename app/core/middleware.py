@@ -0,0 +1,318 @@
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from core import (
+    admission, compression, memory, metrics, profiling, timing
+)
+from core.models import Profile
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with brotli or gzip.
+
+    Only content types in COMPRESS_CONTENT_TYPES are touched, and
+    non-streaming bodies must be at least COMPRESS_MIN_SIZE bytes.
+    Responses rendered with the CSRF token are never compressed (BREACH).
+    Streaming responses are compressed chunk by chunk. Bodies that carry
+    a strong ETag are compressed once and then served from an in-memory
+    cache of variants for as long as the URL's ETag stays the same.
+    """
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.variants = compression.VariantCache(
+            settings.COMPRESS_CACHE_MAX_BYTES
+        )
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or \
+                request.META.get('CSRF_COOKIE_USED'):
+            return response
+
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if content_type.strip() not in settings.COMPRESS_CONTENT_TYPES:
+            return response
+
+        if not response.streaming and \
+                len(response.content) < settings.COMPRESS_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = compression.accepted_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        else:
+            compressed = self.compress(request, response, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+
+        return response
+
+    def compress(self, request, response, encoding):
+        etag = response.get('ETag')
+        if not etag or etag.startswith('W/'):
+            return compression.compress(response.content, encoding)
+
+        key = (request.path, etag, encoding)
+        compressed = self.variants.get(key)
+        metrics.cache_lookup('compression', compressed is not None)
+        if compressed is None:
+            compressed = compression.compress(response.content, encoding)
+            self.variants.set(key, compressed)
+
+        return compressed
+
+
+class RequestTimingMiddleware:
+    """Time authentication, view, DB and rendering for every request.
+
+    The breakdown is sent as a `Server-Timing` header to staff users, or
+    to everyone when SERVER_TIMING is on. Requests slower than
+    SLOW_REQUEST_MS are logged with their breakdown, and queries slower
+    than SLOW_QUERY_MS are logged with their normalized SQL and call
+    site. Should be first in MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = timing.RequestTimer()
+        with timer.activate():
+            response = self.get_response(request)
+
+        if settings.SERVER_TIMING or self._staff(request):
+            response['Server-Timing'] = timer.server_timing()
+
+        total = timer.durations()['total']
+        if total >= settings.SLOW_REQUEST_MS:
+            timing.logger.warning(
+                'slow request %s %s %.1fms (%s queries): %s',
+                request.method, request.path, total, timer.queries,
+                timer.server_timing()
+            )
+
+        return response
+
+    @staticmethod
+    def _staff(request):
+        # DRF copies the user it authenticated back onto the request.
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_active and user.is_staff
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = timing.current()
+        if timer is not None:
+            timer.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timer = timing.current()
+        if timer is not None:
+            timer.view_end = time.perf_counter()
+            response.add_post_render_callback(self._rendered(timer))
+        return response
+
+    @staticmethod
+    def _rendered(timer):
+        def callback(response):
+            timer.render_end = time.perf_counter()
+        return callback
+
+
+class MetricsMiddleware:
+    """Record Prometheus request metrics (see core.metrics), labelled by
+    the view that served the request. Goes right after
+    RequestTimingMiddleware, whose timer supplies the DB figures.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics_view = metrics.UNMATCHED
+        start = time.perf_counter()
+        metrics.IN_FLIGHT.inc()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.IN_FLIGHT.dec()
+        elapsed = time.perf_counter() - start
+
+        view = request.metrics_view
+        method = metrics.method_label(request.method)
+        metrics.REQUESTS.labels(view, method, str(response.status_code)).inc()
+        metrics.LATENCY.labels(view, method).observe(elapsed)
+        timer = timing.current()
+        if timer is not None:
+            metrics.DB_QUERIES.labels(view).observe(timer.queries)
+            metrics.DB_TIME.labels(view).observe(timer.phases.get('db', 0.0))
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = metrics.view_name(view_func, request.method)
+
+
+class AdmissionMiddleware:
+    """Turn requests away with 429/503 and `Retry-After` before their view
+    runs when the process or the client is over its limits, see
+    core.admission. Goes right after MetricsMiddleware so rejections are
+    counted under the view they were meant for.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.admission = None
+        try:
+            return self.get_response(request)
+        finally:
+            if request.admission is not None:
+                admission.limiter.release(*request.admission)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.ADMISSION_ENABLED:
+            return None
+
+        view = metrics.view_name(view_func, request.method)
+        priority = admission.priority(view)
+        client = admission.client_key(request)
+        try:
+            admission.limiter.admit(client, priority)
+        except admission.Rejected as rejected:
+            metrics.ADMISSION_REJECTIONS.labels(view, rejected.reason).inc()
+            response = JsonResponse(
+                {'detail': admission.MESSAGES[rejected.reason]},
+                status=rejected.status
+            )
+            response['Retry-After'] = str(rejected.retry_after)
+            return response
+
+        request.admission = (client, priority)
+        return None
+
+
+class MemoryWatermarkMiddleware:
+    """Measure each request's peak traced memory while tracemalloc is on
+    (see core.memory); a no-op otherwise.
+
+    Peaks are kept per view for the staff memory endpoint and exported as
+    a Prometheus histogram, for every view or only MEMORY_WATERMARK_VIEWS
+    when that is set. Requests peaking above MEMORY_WATERMARK_KIB are
+    logged.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.MEMORY_TRACING:
+            memory.start(settings.MEMORY_TRACING_FRAMES)
+
+    def __call__(self, request):
+        if not tracemalloc.is_tracing():
+            return self.get_response(request)
+
+        request.memory_view = metrics.UNMATCHED
+        start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        response = self.get_response(request)
+        if not tracemalloc.is_tracing():
+            return response
+        peak_kib = max(0, tracemalloc.get_traced_memory()[1] - start) / 1024
+
+        view = request.memory_view
+        views = settings.MEMORY_WATERMARK_VIEWS
+        if not views or view in views:
+            memory.record_peak(view, peak_kib)
+            metrics.REQUEST_MEMORY.labels(view).observe(peak_kib * 1024)
+        if peak_kib >= settings.MEMORY_WATERMARK_KIB:
+            memory.logger.warning(
+                'request %s %s (%s) peaked at %.0f KiB traced memory',
+                request.method, request.path, view, peak_kib
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'memory_view'):
+            request.memory_view = metrics.view_name(
+                view_func, request.method
+            )
+
+
+class ProfilingMiddleware:
+    """Profile single requests on demand for staff users.
+
+    See core.profiling for how a request opts in. Profiles are stored as
+    core.models.Profile rows, the newest PROFILING_KEEP are kept, and the
+    response carries an `X-Profile-Id` header pointing at the row. At most
+    PROFILING_MAX_PER_MINUTE requests are profiled per process.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limiter = profiling.RateLimiter(
+            settings.PROFILING_MAX_PER_MINUTE, 60
+        )
+
+    def __call__(self, request):
+        kind = None
+        if settings.PROFILING_ENABLED:
+            kind = profiling.requested_kind(request)
+        if kind is None or not profiling.sampled():
+            return self.get_response(request)
+
+        user = profiling.staff_user(request)
+        if user is None or not self.limiter.allow():
+            return self.get_response(request)
+
+        timer = timing.current()
+        queries = timer.queries if timer is not None else 0
+        profiler = profiling.PROFILERS[kind]()
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        duration = time.perf_counter() - start
+
+        profile = Profile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            queries=(timer.queries - queries) if timer is not None else 0,
+            kind=kind,
+            summary=profiler.summary(),
+            data=profiler.dump(),
+        )
+        stale = Profile.objects.values_list('id', flat=True)[
+            settings.PROFILING_KEEP:
+        ]
+        Profile.objects.filter(id__in=list(stale)).delete()
+
+        response['X-Profile-Id'] = str(profile.id)
+        return response
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:03
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_usage(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    for relation, model_name in (('tags', 'Tag'), ('ingredients', 'Ingredient')):
+        model = apps.get_model('core', model_name)
+        field = Recipe._meta.get_field(relation)
+        through = field.remote_field.through
+        target = f'{field.m2m_reverse_field_name()}_id'
+        links = through.objects.filter(**{target: OuterRef('pk')}) \
+            .order_by().values(target).annotate(n=Count('id')).values('n')
+        model.objects.update(usage_count=Coalesce(
+            Subquery(links, output_field=IntegerField()), 0
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-usage_count', 'name'], name='ingredient_user_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-usage_count', 'name'], name='tag_user_popular_idx'),
+        ),
+        migrations.RunPython(count_usage, migrations.RunPython.noop),
+    ]
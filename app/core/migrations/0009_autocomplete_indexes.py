@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:07
+
+from django.db import DatabaseError, migrations, transaction
+
+TABLES = ['core_tag', 'core_ingredient']
+
+
+def create_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        # Serves `name__istartswith`, which compares UPPER(name::text).
+        for table in TABLES:
+            cursor.execute(
+                f'CREATE INDEX {table}_name_prefix_idx ON {table} '
+                f'(user_id, UPPER(name::text) text_pattern_ops)'
+            )
+
+        # Fuzzy matching falls back to substring search without pg_trgm.
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            return
+        for table in TABLES:
+            cursor.execute(
+                f'CREATE INDEX {table}_name_trgm_idx ON {table} '
+                f'USING gin (name gin_trgm_ops)'
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f'DROP INDEX IF EXISTS {table}_name_prefix_idx')
+            cursor.execute(f'DROP INDEX IF EXISTS {table}_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_usage_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
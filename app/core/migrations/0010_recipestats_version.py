@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:09
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_autocomplete_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipestats',
+            name='version',
+            field=models.UUIDField(default=uuid.uuid4),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:26
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipestats_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='core.recipe')),
+                ('signature', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None)),
+                ('buckets', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), size=None)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipesignature',
+            index=django.contrib.postgres.indexes.GinIndex(fastupdate=False, fields=['buckets'], name='recipesignature_bucket_idx'),
+        ),
+    ]
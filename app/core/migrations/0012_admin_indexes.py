@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+# Prefix search in the admin, which isn't scoped to one user like the
+# (user_id, UPPER(name)) autocomplete indexes.
+PREFIX_INDEXES = {
+    'core_recipe_title_prefix_idx': ('core_recipe', 'title'),
+    'core_tag_name_upper_idx': ('core_tag', 'name'),
+    'core_ingredient_name_upper_idx': ('core_ingredient', 'name'),
+}
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for name, (table, column) in PREFIX_INDEXES.items():
+            cursor.execute(
+                f'CREATE INDEX {name} ON {table} '
+                f'(UPPER({column}::text) text_pattern_ops)'
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for name in PREFIX_INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipesignature'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', '-id'], name='recipe_user_recent_idx'
+            ),
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
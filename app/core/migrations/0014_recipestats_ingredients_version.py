@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_changes'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='recipestats',
+            old_name='version',
+            new_name='ingredients_version',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipestats_ingredients_version'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='recipestats',
+            name='ingredient_counts',
+        ),
+        migrations.RemoveField(
+            model_name='recipestats',
+            name='tag_counts',
+        ),
+    ]
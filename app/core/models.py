@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -6,7 +8,7 @@ from django.contrib.auth.models import (
 )
 from django.conf import settings
 
-import uuid, os
+import functools, uuid, os
 
 def recipe_image_file_path(instance, filename):
     ext = os.path.splitext(filename)[1]
@@ -14,7 +16,17 @@ def recipe_image_file_path(instance, filename):
 
     return os.path.join('uploads', 'recipe', filename)
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    def delete(self):
+        # Without a pass over everything each user owns, see
+        # recipe.deletion.
+        from recipe import deletion
+        return deletion.delete_users(
+            list(self.values_list('id', flat = True)),
+            super().delete
+        )
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, password = None, **extra_fields):
         if not email:
             raise ValueError
@@ -42,7 +54,33 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     objects = UserManager()
 
-class Recipe(models.Model):
+    def delete(self, *args, **kwargs):
+        from recipe import deletion
+        return deletion.delete_users(
+            [self.pk],
+            functools.partial(super().delete, *args, **kwargs)
+        )
+
+class ChangeLogged(models.Model):
+    """Models whose writes recipe.changes logs. save() runs in a
+    transaction, so the post_save receivers writing the log commit or roll
+    back together with the row."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using = kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+class RecipeQuerySet(models.QuerySet):
+    def delete(self):
+        # One aggregate pass instead of the per-recipe signal receivers,
+        # see recipe.deletion.
+        from recipe import deletion
+        return deletion.delete_recipes(self, super().delete)
+
+class Recipe(ChangeLogged):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete = models.CASCADE
@@ -56,25 +94,191 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null = True, upload_to = recipe_image_file_path)
 
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # A user's recipes newest first, as listed by the API and paged
+            # by keyset in the admin.
+            models.Index(
+                fields = ['user', '-id'],
+                name = 'recipe_user_recent_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
-class Tag(models.Model):
+class Tag(ChangeLogged):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete = models.CASCADE
     )
     name = models.CharField(max_length=55)
+    # Number of recipes linked to this tag, see recipe.stats.
+    usage_count = models.PositiveIntegerField(default = 0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields = ['user', '-usage_count', 'name'],
+                name = 'tag_user_popular_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
-class Ingredient(models.Model):
+class Ingredient(ChangeLogged):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete = models.CASCADE
     )
     name = models.CharField(max_length=60)
+    # Number of recipes linked to this ingredient, see recipe.stats.
+    usage_count = models.PositiveIntegerField(default = 0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields = ['user', '-usage_count', 'name'],
+                name = 'ingredient_user_popular_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+class Profile(models.Model):
+    """A profiled request, see core.profiling."""
+    created = models.DateTimeField(auto_now_add = True, db_index = True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null = True,
+        on_delete = models.SET_NULL
+    )
+    method = models.CharField(max_length = 10)
+    path = models.CharField(max_length = 2048)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    queries = models.PositiveIntegerField(default = 0)
+    kind = models.CharField(max_length = 20)
+    summary = models.TextField(blank = True)
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ['-created']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f}ms)'
+
+class RecipeStats(models.Model):
+    """Running totals over a user's recipes, kept up to date by
+    recipe.stats so the stats endpoint never scans the recipes."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key = True,
+        on_delete = models.CASCADE,
+        related_name = 'recipe_stats'
+    )
+    recipe_count = models.PositiveIntegerField(default = 0)
+    price_total = models.DecimalField(
+        max_digits = 14,
+        decimal_places = 2,
+        default = 0
+    )
+    time_minutes_total = models.BigIntegerField(default = 0)
+    # Recipe counts per recipe.stats.TIME_BUCKETS bucket.
+    time_minutes_histogram = models.JSONField(default = list)
+    # Replaced whenever one of the user's recipe/ingredient links changes,
+    # so in-process caches derived from them (recipe.cookable) can tell
+    # whether they are stale with one primary key lookup.
+    ingredients_version = models.UUIDField(default = uuid.uuid4)
+
+    def __str__(self):
+        return f'stats of user {self.user_id}'
+
+class RecipeSignature(models.Model):
+    """MinHash signature of a recipe's tag and ingredient set and its LSH
+    band buckets, kept up to date by recipe.similarity."""
+    recipe = models.OneToOneField(
+        'Recipe',
+        primary_key = True,
+        on_delete = models.CASCADE,
+        related_name = 'signature'
+    )
+    signature = ArrayField(models.BigIntegerField())
+    # One hash per band; recipes sharing any bucket are candidates.
+    buckets = ArrayField(models.BigIntegerField())
+
+    class Meta:
+        indexes = [
+            # Without fastupdate, lookups don't scan a pending list of
+            # recently written rows.
+            GinIndex(
+                fields = ['buckets'],
+                name = 'recipesignature_bucket_idx',
+                fastupdate = False
+            ),
+        ]
+
+    def __str__(self):
+        return f'signature of recipe {self.recipe_id}'
+
+class Change(models.Model):
+    """One write to a user's recipes, tags or ingredients (a recipe's links
+    count as a write to the recipe), logged by recipe.changes in the
+    writing transaction. `seq` numbers a user's changes in commit order."""
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+
+    # No database constraint: deleting a user deletes their recipes, whose
+    # changes are logged while the user row is about to go.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete = models.CASCADE,
+        db_constraint = False,
+        related_name = '+'
+    )
+    seq = models.BigIntegerField()
+    kind = models.CharField(max_length = 10)
+    object_id = models.BigIntegerField()
+    op = models.CharField(
+        max_length = 6,
+        choices = [(UPSERT, 'upsert'), (DELETE, 'delete')]
+    )
+    created = models.DateTimeField(auto_now_add = True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields = ['user', 'seq'],
+                name = 'change_user_seq_uniq'
+            ),
+        ]
+        indexes = [
+            # Finds the changes a later one supersedes when compacting.
+            models.Index(
+                fields = ['user', 'kind', 'object_id'],
+                name = 'change_object_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.op} {self.kind} {self.object_id}'
+
+class ChangeSequence(models.Model):
+    """A user's last change `seq`, and the `seq` up to which compaction may
+    have dropped changes (older cursors can't be served)."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key = True,
+        on_delete = models.CASCADE,
+        db_constraint = False,
+        related_name = '+'
+    )
+    last_seq = models.BigIntegerField(default = 0)
+    horizon = models.BigIntegerField(default = 0)
+
+    def __str__(self):
+        return f'changes of user {self.user_id}'
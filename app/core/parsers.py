@@ -0,0 +1,54 @@
+"""
+JSON parsing backed by orjson when it is installed, and MessagePack / CBOR
+parsing, see core.renderers.
+"""
+from rest_framework import parsers  # type: ignore
+from rest_framework.exceptions import ParseError  # type: ignore
+
+from core.renderers import (
+    CBORRenderer,
+    FastJSONRenderer,
+    MessagePackRenderer,
+    cbor2,
+    msgpack,
+    orjson,
+)
+
+
+class FastJSONParser(parsers.JSONParser):
+    """JSONParser using orjson for UTF-8 bodies."""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+
+        if orjson is None or encoding.lower().replace('_', '-') != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(parsers.BaseParser):
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read())
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
+
+
+class CBORParser(parsers.BaseParser):
+    media_type = 'application/cbor'
+    renderer_class = CBORRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return cbor2.loads(stream.read())
+        except (ValueError, TypeError, cbor2.CBORDecodeError) as exc:
+            raise ParseError('CBOR parse error - %s' % str(exc))
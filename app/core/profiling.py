@@ -0,0 +1,168 @@
+"""
+On-demand profiling of single requests for staff users.
+
+A request is profiled when it carries an `X-Profile` header or a
+`profile` query parameter, the caller is staff, it passes the
+PROFILING_SAMPLE_RATE coin flip and the per-process rate limit has room.
+Two profilers are available:
+
+* `cprofile` (default): deterministic, stored as marshalled pstats data
+  that `python -m pstats`, snakeviz and friends open directly.
+* `sample`: a background thread samples the request thread's stack every
+  PROFILING_SAMPLE_INTERVAL seconds; stored as collapsed stacks for
+  flamegraph.pl or speedscope. Far lower overhead on deep call trees.
+"""
+import cProfile
+import collections
+import io
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+from rest_framework import exceptions  # type: ignore
+
+from core.authentication import TokenAuthentication
+
+HEADER = 'HTTP_X_PROFILE'
+QUERY_PARAM = 'profile'
+SUMMARY_LINES = 40
+
+
+class RateLimiter:
+    """Allow at most `limit` events in any `period` second window."""
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self._events = collections.deque()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._events and self._events[0] <= now - self.period:
+                self._events.popleft()
+            if len(self._events) >= self.limit:
+                return False
+            self._events.append(now)
+            return True
+
+
+class CProfiler:
+    kind = 'cprofile'
+    extension = 'prof'
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+
+    def dump(self):
+        return marshal.dumps(pstats.Stats(self.profiler).stats)
+
+    def summary(self):
+        out = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(SUMMARY_LINES)
+        return out.getvalue()
+
+
+class SamplingProfiler:
+    kind = 'sample'
+    extension = 'folded'
+
+    def __init__(self, interval=None):
+        self.interval = interval or settings.PROFILING_SAMPLE_INTERVAL
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._run, name='request-profiler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+            )
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def dump(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        ).encode()
+
+    def summary(self):
+        """Sample counts of the functions the request was executing."""
+        leaves = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values())
+        lines = [f'{total} samples every {self.interval * 1000:g}ms']
+        lines.extend(
+            f'{count:>6} {count / total:6.1%}  {name}'
+            for name, count in leaves.most_common(SUMMARY_LINES)
+        )
+        return '\n'.join(lines) + '\n'
+
+
+PROFILERS = {
+    CProfiler.kind: CProfiler,
+    SamplingProfiler.kind: SamplingProfiler,
+}
+
+
+def requested_kind(request):
+    """The profiler a request asks for, or None. Any value that isn't a
+    profiler name selects the default, so `?profile=1` works."""
+    value = request.META.get(HEADER) or request.GET.get(QUERY_PARAM)
+    if not value:
+        return None
+    return value if value in PROFILERS else CProfiler.kind
+
+
+def staff_user(request):
+    """The staff user behind a session or API token, or None. DRF only
+    authenticates inside the view, so tokens are checked here."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = TokenAuthentication().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            result = None
+        user = result[0] if result else None
+    if user is not None and user.is_active and user.is_staff:
+        return user
+    return None
+
+
+def sampled():
+    return random.random() < settings.PROFILING_SAMPLE_RATE
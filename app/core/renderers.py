@@ -0,0 +1,101 @@
+"""
+JSON rendering backed by orjson when it is installed, and binary
+MessagePack / CBOR rendering for service-to-service callers.
+
+JSON output is byte-for-byte what DRF's stdlib renderer produces for the
+default (compact, unicode) settings; anything orjson can't encode
+natively, like `Decimal`, datetimes and lazy strings, goes through DRF's
+own encoder so the formatting rules stay identical.
+
+The binary renderers produce the same values as JSON, except that a
+`Decimal` (which serializers only hand over with COERCE_DECIMAL_TO_STRING
+off) is never turned into a float: MessagePack, which has no decimal
+type, gets its exact string; CBOR gets a decimal fraction (tag 4), and
+also keeps datetimes, dates and UUIDs as its own tagged types. They are
+enabled in settings only when msgpack / cbor2 are installed.
+"""
+from decimal import Decimal
+
+from rest_framework import renderers  # type: ignore
+from rest_framework.utils import encoders  # type: ignore
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover
+    cbor2 = None
+
+ORJSON_OPTIONS = 0
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | \
+        orjson.OPT_NON_STR_KEYS
+
+_default = encoders.JSONEncoder().default
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer using orjson, falling back to the stdlib encoder when
+    orjson is missing or the output needs indenting / ASCII escaping."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+
+        # Escape U+2028 / U+2029 like the stdlib renderer does.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028') \
+                .replace(b'\xe2\x80\xa9', b'\\u2029')
+
+        return ret
+
+
+def _binary_default(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    return _default(obj)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_binary_default)
+
+
+def _cbor_default(encoder, obj):
+    encoder.encode(_default(obj))
+
+
+class CBORRenderer(renderers.BaseRenderer):
+    media_type = 'application/cbor'
+    format = 'cbor'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return cbor2.dumps(data, default=_cbor_default)
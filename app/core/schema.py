@@ -0,0 +1,105 @@
+"""
+Pre-rendered OpenAPI schema.
+
+Generating the schema walks every view and serializer, so it is done once
+by `manage.py generate_schema` (at image build time) and the rendered
+documents, with their precompressed variants, are read back from
+SCHEMA_DIR and kept in memory.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from drf_spectacular.renderers import (  # type: ignore
+    OpenApiJsonRenderer,
+    OpenApiYamlRenderer,
+)
+from drf_spectacular.settings import spectacular_settings  # type: ignore
+
+from core import compression, metrics
+
+FORMATS = {
+    'yaml': ('schema.yml', OpenApiYamlRenderer),
+    'json': ('schema.json', OpenApiJsonRenderer),
+}
+
+# (format, encoding) -> (body, etag)
+_documents = {}
+
+
+def generate_schema():
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+def render_schema(schema, fmt):
+    filename, renderer_class = FORMATS[fmt]
+    return renderer_class().render(schema, renderer_context={})
+
+
+def schema_path(fmt, encoding=None):
+    path = os.path.join(settings.SCHEMA_DIR, FORMATS[fmt][0])
+    if encoding is not None:
+        path += compression.SUFFIXES[encoding]
+    return path
+
+
+def write_schema(schema=None):
+    """Render the schema in every format, plus its compressed variants,
+    into SCHEMA_DIR."""
+    if schema is None:
+        schema = generate_schema()
+
+    os.makedirs(settings.SCHEMA_DIR, exist_ok=True)
+    paths = []
+    for fmt in FORMATS:
+        path = schema_path(fmt)
+        body = render_schema(schema, fmt)
+        with open(path, 'wb') as f:
+            f.write(body)
+        paths.append(path)
+        paths.extend(compression.write_variants(path, body))
+
+    clear_cache()
+    return paths
+
+
+def get_document(fmt, encoding=None):
+    """Return `(body, etag)` for the schema in the given format, or for its
+    precompressed variant when `encoding` is given.
+
+    Only DEBUG falls back to generating the schema on the fly, and that
+    result isn't cached so edits to views show up on reload. A missing
+    variant raises FileNotFoundError.
+    """
+    key = (fmt, encoding)
+    metrics.cache_lookup('schema', key in _documents)
+    if key in _documents:
+        return _documents[key]
+
+    try:
+        with open(schema_path(fmt, encoding), 'rb') as f:
+            body = f.read()
+    except FileNotFoundError:
+        if encoding is not None:
+            raise
+        if not settings.DEBUG:
+            raise ImproperlyConfigured(
+                'OpenAPI schema not found in SCHEMA_DIR, '
+                'run `manage.py generate_schema`.'
+            )
+        body = render_schema(generate_schema(), fmt)
+        return body, _etag(body)
+
+    _documents[key] = (body, _etag(body))
+    return _documents[key]
+
+
+def clear_cache():
+    _documents.clear()
+
+
+def _etag(body):
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
@@ -0,0 +1,30 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import StaticFilesStorage
+
+from core import compression
+
+
+class CompressedStaticFilesStorage(StaticFilesStorage):
+    """Static files storage that writes `.gz` / `.br` variants next to
+    compressible files during `collectstatic`, so the front server can
+    serve them directly (nginx `gzip_static` / `brotli_static`)."""
+    compress_extensions = (
+        '.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml'
+    )
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+
+        for name in paths:
+            if not name.endswith(self.compress_extensions):
+                continue
+
+            path = self.path(name)
+            if os.path.getsize(path) < settings.COMPRESS_MIN_SIZE:
+                continue
+
+            compression.write_variants(path)
+            yield name, name, True
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the suite with admission control off, as the benchmarks do.
+    Every test client request comes from 127.0.0.1, so anonymous and
+    force-authenticated requests would share one client's limits across
+    tests; core.tests.test_admission turns it back on."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.ADMISSION_ENABLED = False
@@ -1,8 +1,15 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.urls import reverse
 from django.test import Client
 
+from core import estimates
+from core.admin import RecipeAdmin
+from core.models import Ingredient, Recipe, Tag
+
 
 class AdminSiteTests(TestCase):
     def setUp(self):
@@ -37,4 +44,139 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
 
-        self.assertEqual(res.status_code, 200)
\ No newline at end of file
+        self.assertEqual(res.status_code, 200)
+
+
+class ScalableAdminTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+        )
+        self.client.force_login(self.admin_user)
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.recipes = [
+            Recipe.objects.create(
+                user=self.user, title=f'recipe {i}', time_minutes=5, price=1
+            )
+            for i in range(5)
+        ]
+
+    def titles(self, res):
+        self.assertEqual(res.status_code, 200)
+        return [str(recipe) for recipe in res.context['cl'].result_list]
+
+    def test_recipe_changelist_paged_by_keyset(self):
+        url = reverse('admin:core_recipe_changelist')
+
+        with patch.object(RecipeAdmin, 'list_per_page', 2):
+            first = self.client.get(url)
+            second = self.client.get(
+                url + first.context['cl'].next_page_url()
+            )
+            last = self.client.get(url, {'after': self.recipes[1].id})
+
+        self.assertEqual(self.titles(first), ['recipe 4', 'recipe 3'])
+        self.assertEqual(self.titles(second), ['recipe 2', 'recipe 1'])
+        self.assertEqual(self.titles(last), ['recipe 0'])
+        self.assertIsNone(last.context['cl'].next_page_url())
+        self.assertContains(first, 'about 5 recipes')
+
+    def test_indexed_search(self):
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        Recipe.objects.create(
+            user=other, title='soup', time_minutes=5, price=1
+        )
+        url = reverse('admin:core_recipe_changelist')
+
+        self.assertEqual(self.titles(self.client.get(url, {'q': 'SO'})), [
+            'soup'
+        ])
+        self.assertEqual(
+            self.titles(self.client.get(url, {'q': 'other@EXAMPLE.com'})),
+            ['soup']
+        )
+        self.assertEqual(
+            self.titles(self.client.get(url, {'q': self.recipes[2].id})),
+            ['recipe 2']
+        )
+        self.assertEqual(
+            len(self.titles(self.client.get(
+                url, {'user__id__exact': self.user.id}
+            ))),
+            5
+        )
+
+    def test_change_form_renders_only_linked_tags(self):
+        recipe = self.recipes[0]
+        recipe.tags.add(Tag.objects.create(user=self.user, name='linked'))
+        Tag.objects.create(user=self.user, name='unlinked')
+
+        res = self.client.get(
+            reverse('admin:core_recipe_change', args=[recipe.id])
+        )
+
+        self.assertNotContains(res, 'unlinked')
+        # The lookup popup only lists the owner's tags.
+        self.assertContains(
+            res, f'{reverse("admin:core_tag_changelist")}'
+            f'?user__id__exact={self.user.id}'
+        )
+
+    def test_tags_limited_to_recipe_owner(self):
+        recipe = self.recipes[0]
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        own = Tag.objects.create(user=self.user, name='own')
+        foreign = Tag.objects.create(user=other, name='foreign')
+        ingredient = Ingredient.objects.create(user=self.user, name='salt')
+        url = reverse('admin:core_recipe_change', args=[recipe.id])
+        data = {
+            'user': self.user.id, 'title': recipe.title,
+            'time_minutes': 5, 'price': '1.00', 'ingredients': ingredient.id,
+        }
+
+        res = self.client.post(url, {**data, 'tags': f'{own.id},{foreign.id}'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('tags', res.context['adminform'].form.errors)
+        self.assertFalse(recipe.tags.exists())
+
+        res = self.client.post(url, {**data, 'tags': str(own.id)})
+
+        self.assertNotIn('tags', res.context['adminform'].form.errors)
+
+
+class EstimatedCountTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        Tag.objects.bulk_create(
+            Tag(user=self.user, name=f'tag {i}') for i in range(50)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_tag')
+
+    @override_settings(ESTIMATED_COUNT_EXACT_BELOW=0)
+    def test_estimates(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(estimates.estimated_count(Tag.objects.all()), 50)
+        filtered = Tag.objects.filter(name__startswith='tag 1')
+        with self.assertNumQueries(1):
+            self.assertGreater(estimates.estimated_count(filtered), 0)
+
+    def test_small_counts_exact(self):
+        filtered = Tag.objects.filter(name__startswith='tag 1')
+
+        self.assertEqual(estimates.estimated_count(filtered), 11)
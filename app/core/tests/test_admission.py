@@ -0,0 +1,195 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import (
+    Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+)
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token  # type: ignore
+
+from core import admission
+from recipe import stats
+
+RECIPE_URL = reverse('recipe:recipe-list')
+STATS_URL = reverse('recipe:stats')
+
+LIMITS = {
+    'ADMISSION_ENABLED': True,
+    'ADMISSION_MAX_CONCURRENT': 10,
+    'ADMISSION_SHARES': {'light': 0.9, 'heavy': 0.5},
+    'ADMISSION_MAX_CONCURRENT_PER_CLIENT': 2,
+    'ADMISSION_HEAVY_RATE': 0.5,
+    'ADMISSION_HEAVY_BURST': 2,
+}
+
+
+@override_settings(**LIMITS)
+class LimiterTests(SimpleTestCase):
+    def setUp(self):
+        self.limiter = admission.Limiter()
+
+    def assertRejected(self, client, priority, status, reason):
+        with self.assertRaises(admission.Rejected) as raised:
+            self.limiter.admit(client, priority)
+        self.assertEqual(raised.exception.status, status)
+        self.assertEqual(raised.exception.reason, reason)
+        return raised.exception
+
+    def test_heavy_shed_before_light(self):
+        for i in range(5):
+            self.limiter.admit(f'client {i}', admission.LIGHT)
+
+        self.assertRejected('other', admission.HEAVY, 503, 'overloaded')
+        for i in range(4):
+            self.limiter.admit(None, admission.LIGHT)
+        self.assertRejected('other', admission.LIGHT, 503, 'overloaded')
+        self.limiter.admit(None, admission.CRITICAL)
+
+        self.limiter.release(None, admission.CRITICAL)
+        self.limiter.release('client 0', admission.LIGHT)
+        self.limiter.admit('other', admission.LIGHT)
+
+    def test_per_client_concurrency(self):
+        self.limiter.admit('a', admission.LIGHT)
+        self.limiter.admit('a', admission.LIGHT)
+
+        self.assertRejected('a', admission.LIGHT, 429, 'concurrency')
+        self.limiter.admit('b', admission.LIGHT)
+        self.limiter.release('a', admission.LIGHT)
+        self.limiter.admit('a', admission.LIGHT)
+
+    def test_heavy_token_bucket(self):
+        for _ in range(2):
+            self.limiter.admit('a', admission.HEAVY)
+            self.limiter.release('a', admission.HEAVY)
+
+        rejected = self.assertRejected('a', admission.HEAVY, 429, 'rate')
+        self.assertEqual(rejected.retry_after, 2)
+        self.limiter.admit('a', admission.LIGHT)
+        self.limiter.admit('b', admission.HEAVY)
+
+        with patch('core.admission.time.monotonic', return_value=(
+            self.limiter.buckets['a'].updated + 2
+        )):
+            self.limiter.admit('a', admission.HEAVY)
+
+    def test_refilled_buckets_dropped(self):
+        self.limiter.admit('a', admission.HEAVY)
+        self.limiter.release('a', admission.HEAVY)
+        later = self.limiter.buckets['a'].updated + 4
+
+        with patch('core.admission.time.monotonic', return_value=later):
+            self.limiter.admit('b', admission.HEAVY)
+
+        self.assertEqual(list(self.limiter.buckets), ['b'])
+
+
+@override_settings(**LIMITS)
+class AdmissionMiddlewareTests(TestCase):
+    def setUp(self):
+        admission.limiter.reset()
+        self.addCleanup(admission.limiter.reset)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_heavy_requests_throttled(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get(RECIPE_URL).status_code, 200)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, 429)
+        self.assertEqual(res['Retry-After'], '2')
+        self.assertEqual(res.json()['detail'], 'Request was throttled.')
+        self.assertEqual(self.client.get(STATS_URL).status_code, 200)
+        self.assertEqual(admission.limiter.in_flight, 0)
+
+    def test_overload_spares_critical_views(self):
+        for _ in range(9):
+            admission.limiter.admit(None, admission.LIGHT)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(self.client.get(reverse('healthz')).status_code, 200)
+
+    def test_made_up_tokens_share_the_address_bucket(self):
+        statuses = [
+            Client(HTTP_AUTHORIZATION=f'Token made-up-{i}')
+            .get(RECIPE_URL).status_code
+            for i in range(3)
+        ]
+
+        self.assertEqual(statuses, [401, 401, 429])
+        self.assertEqual(list(admission.limiter.buckets), ['addr:127.0.0.1'])
+
+    def test_clients_keyed_on_user(self):
+        self.client.get(RECIPE_URL)
+
+        self.assertEqual(
+            list(admission.limiter.buckets), [f'user:{self.user.id}']
+        )
+
+    @override_settings(ADMISSION_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(RECIPE_URL).status_code, 200)
+
+
+@override_settings(**LIMITS)
+class ConcurrentAdmissionTests(TransactionTestCase):
+    """Requests served on parallel threads, as by the WSGI server, hold
+    their slots at the same time."""
+
+    def setUp(self):
+        admission.limiter.reset()
+        self.addCleanup(admission.limiter.reset)
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.token = Token.objects.create(user=user).key
+
+    def get(self, statuses):
+        try:
+            client = Client(HTTP_AUTHORIZATION=f'Token {self.token}')
+            statuses.append(client.get(STATS_URL).status_code)
+        finally:
+            connection.close()
+
+    def test_per_client_limit_binds(self):
+        entered = threading.Semaphore(0)
+        release = threading.Event()
+        summary = stats.summary
+
+        def slow_summary(*args, **kwargs):
+            entered.release()
+            release.wait(10)
+            return summary(*args, **kwargs)
+
+        statuses = []
+        with patch.object(stats, 'summary', slow_summary):
+            threads = [
+                threading.Thread(target=self.get, args=(statuses,))
+                for _ in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for _ in threads:
+                self.assertTrue(entered.acquire(timeout=10))
+
+            self.get(statuses)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(statuses, [429, 200, 200])
+        self.assertEqual(admission.limiter.in_flight, 0)
@@ -1,26 +1,155 @@
+import io
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as psycopg2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, F
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
 
+from core import health
+from core.models import Recipe, RecipeSignature, Tag, Ingredient
+from recipe import similarity
 
-@patch('core.management.commands.wait_for_db.Command.check')
+
+@patch('core.management.commands.wait_for_db.Command.probe')
 class CommandTests(SimpleTestCase):
-    def test_wait_for_db_ready(self, patched_check):
-        patched_check.return_value = True
+    def test_wait_for_db_ready(self, patched_probe):
+        patched_probe.return_value = None
 
         call_command('wait_for_db')
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_probe.assert_called_once_with('default')
 
     @patch('time.sleep')
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
-        patched_check.side_effect = [psycopg2Error] * 2 + \
-            [OperationalError] * 3 + [True]
+    def test_wait_for_db_delay(self, patched_sleep, patched_probe):
+        patched_probe.side_effect = [psycopg2Error] * 2 + \
+            [OperationalError] * 3 + [None]
 
         call_command('wait_for_db')
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        self.assertEqual(patched_probe.call_count, 6)
+        self.assertEqual(patched_sleep.call_count, 5)
+        patched_probe.assert_called_with('default')
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff_is_capped(self, patched_sleep, patched_probe):
+        patched_probe.side_effect = [OperationalError] * 10 + [None]
+
+        call_command('wait_for_db', base_delay=0.5, max_delay=2)
+
+        for args, kwargs in patched_sleep.call_args_list:
+            self.assertLessEqual(args[0], 2)
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_probe):
+        patched_probe.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0)
+
+    @patch('core.health.pending_migrations')
+    def test_wait_for_db_pending_migrations(self, patched_pending,
+                                            patched_probe):
+        patched_pending.return_value = ['core.9999_new']
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', check_migrations=True)
+
+
+class BackoffTests(SimpleTestCase):
+    def test_backoff_grows_and_caps(self):
+        delays = health.backoff_delays(base=1, cap=4)
+
+        with patch('random.uniform', side_effect=lambda lo, hi: hi):
+            ceilings = [next(delays) for _ in range(5)]
+
+        self.assertEqual(ceilings, [1, 2, 4, 4, 4])
+
+
+class SeedDataTests(TestCase):
+    def seed(self, **options):
+        options = dict(
+            users=5, recipes=200, tags_per_user=6, ingredients_per_user=8,
+            seed=1, stdout=io.StringIO(), **options
+        )
+        call_command('seed_data', **options)
+
+    def test_seed_data_counts(self):
+        self.seed()
+
+        self.assertEqual(get_user_model().objects.count(), 5)
+        self.assertEqual(Recipe.objects.count(), 200)
+        self.assertEqual(Tag.objects.count(), 30)
+        self.assertEqual(Ingredient.objects.count(), 40)
+        self.assertTrue(Recipe.tags.through.objects.exists())
+
+    def test_seed_data_links_stay_within_user(self):
+        self.seed()
+
+        self.assertFalse(
+            Recipe.tags.through.objects.exclude(
+                tag__user=F('recipe__user')
+            ).exists()
+        )
+        self.assertFalse(
+            Recipe.ingredients.through.objects.exclude(
+                ingredient__user=F('recipe__user')
+            ).exists()
+        )
+
+    def test_seed_data_recipe_counts_are_skewed(self):
+        self.seed()
+
+        counts = list(
+            Recipe.objects.values('user').annotate(n=Count('id'))
+            .order_by('user').values_list('n', flat=True)
+        )
+
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertGreater(counts[0], counts[-1] * 2)
+
+    def test_seed_data_writes_signatures(self):
+        self.seed()
+
+        stored = {
+            row.recipe_id: (row.signature, row.buckets)
+            for row in RecipeSignature.objects.all()
+        }
+        computed = similarity.compute(list(stored))
+        self.assertTrue(stored)
+        self.assertEqual(
+            stored, {pk: (values, buckets) for pk, values, buckets in computed}
+        )
+
+    def test_seed_data_skip_signatures(self):
+        self.seed(skip_signatures=True)
+
+        self.assertFalse(RecipeSignature.objects.exists())
+
+    def test_seed_data_is_deterministic(self):
+        self.seed()
+        first = list(Recipe.objects.order_by('id').values_list(
+            'title', 'price', 'time_minutes'
+        ))
+        Recipe.objects.all().delete()
+        get_user_model().objects.all().delete()
+
+        self.seed()
+        second = list(Recipe.objects.order_by('id').values_list(
+            'title', 'price', 'time_minutes'
+        ))
+
+        self.assertEqual(first, second)
+
+    def test_seeded_users_can_log_in_and_create(self):
+        self.seed(password='seedpass123')
+        user = get_user_model().objects.order_by('id').first()
+
+        self.assertTrue(user.check_password('seedpass123'))
+        recipe = Recipe.objects.create(
+            user=user, title='after seeding', time_minutes=5, price=1
+        )
+        self.assertGreater(recipe.id, 200)
@@ -0,0 +1,165 @@
+import gzip
+import os
+import tempfile
+from unittest.mock import patch
+
+import brotli
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import compression
+from core.middleware import CompressionMiddleware
+from core.storage import CompressedStaticFilesStorage
+
+BODY = b'{"title": "sample title"}' * 200
+
+
+class AcceptedEncodingTests(SimpleTestCase):
+    def test_gzip(self):
+        self.assertEqual(compression.accepted_encoding('gzip'), 'gzip')
+
+    def test_none_accepted(self):
+        self.assertIsNone(compression.accepted_encoding(''))
+        self.assertIsNone(compression.accepted_encoding('gzip;q=0'))
+        self.assertIsNone(compression.accepted_encoding('deflate'))
+
+    def test_wildcard(self):
+        self.assertIn(compression.accepted_encoding('*'), ('br', 'gzip'))
+
+    def test_brotli_preferred(self):
+        self.assertEqual(
+            compression.accepted_encoding('gzip, deflate, br'),
+            'br'
+        )
+        self.assertEqual(
+            compression.accepted_encoding('gzip, br;q=0'),
+            'gzip'
+        )
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get_response(self, response, accept='gzip', **extra):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept, **extra)
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(request)
+
+    def test_compresses_json(self):
+        res = self.get_response(
+            HttpResponse(BODY, content_type='application/json')
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), BODY)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_small_body_untouched(self):
+        res = self.get_response(
+            HttpResponse(b'{}', content_type='application/json')
+        )
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, b'{}')
+
+    def test_other_content_type_untouched(self):
+        res = self.get_response(HttpResponse(BODY, content_type='image/png'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_html_untouched(self):
+        res = self.get_response(HttpResponse(BODY, content_type='text/html'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_csrf_token_responses_untouched(self):
+        res = self.get_response(
+            HttpResponse(BODY, content_type='application/json'),
+            CSRF_COOKIE_USED=True
+        )
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, BODY)
+
+    def test_not_accepted_untouched(self):
+        res = self.get_response(
+            HttpResponse(BODY, content_type='application/json'),
+            accept=''
+        )
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, BODY)
+
+    def test_compresses_brotli(self):
+        res = self.get_response(
+            HttpResponse(BODY, content_type='application/json'),
+            accept='br'
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(res.content), BODY)
+
+    def test_streaming_compressed_incrementally(self):
+        chunks = [BODY[:1000], BODY[1000:]]
+        res = self.get_response(
+            StreamingHttpResponse(iter(chunks), content_type='text/plain')
+        )
+
+        parts = list(res.streaming_content)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(gzip.decompress(b''.join(parts)), BODY)
+
+    def test_etag_responses_compressed_once(self):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip')
+
+        def view(request):
+            response = HttpResponse(BODY, content_type='application/json')
+            response['ETag'] = '"abc"'
+            return response
+
+        middleware = CompressionMiddleware(view)
+        with patch(
+            'core.compression.compress', wraps=compression.compress
+        ) as patched_compress:
+            first = middleware(request)
+            second = middleware(request)
+
+        patched_compress.assert_called_once()
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['ETag'], 'W/"abc"')
+
+
+class VariantCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = compression.VariantCache(max_bytes=10)
+        cache.set('a', b'12345')
+        cache.set('b', b'12345')
+        cache.get('a')
+        cache.set('c', b'12345')
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.size, 10)
+
+
+class CompressedStaticFilesStorageTests(SimpleTestCase):
+    def test_post_process_writes_variants(self):
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                override_settings(STATIC_ROOT=tmpdir):
+            with open(os.path.join(tmpdir, 'app.css'), 'wb') as f:
+                f.write(b'body { color: red; }\n' * 100)
+            with open(os.path.join(tmpdir, 'logo.png'), 'wb') as f:
+                f.write(b'\x89PNG' * 1000)
+            storage = CompressedStaticFilesStorage()
+
+            processed = list(storage.post_process(
+                {'app.css': None, 'logo.png': None}
+            ))
+
+            self.assertEqual(processed, [('app.css', 'app.css', True)])
+            self.assertTrue(os.path.exists(storage.path('app.css.gz')))
+            self.assertFalse(os.path.exists(storage.path('logo.png.gz')))
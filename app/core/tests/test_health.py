@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import TestCase
+from django.urls import reverse
+
+from core import views
+
+HEALTHZ_URL = reverse('healthz')
+READYZ_URL = reverse('readyz')
+
+
+class HealthEndpointTests(TestCase):
+    def setUp(self):
+        views._readiness_cache['report'] = None
+
+    def test_healthz(self):
+        res = self.client.get(HEALTHZ_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
+
+    def test_readyz_ready(self):
+        res = self.client.get(READYZ_URL)
+        data = res.json()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['ready'])
+        self.assertTrue(data['checks']['database']['ok'])
+        self.assertEqual(data['checks']['migrations']['pending'], [])
+        self.assertIn('ms', data['checks']['database'])
+
+    @patch('core.health.check_database')
+    def test_readyz_database_down(self, patched_check):
+        patched_check.side_effect = OperationalError('down')
+
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertFalse(res.json()['ready'])
+
+    @patch('core.health.check_database')
+    def test_readyz_hides_database_error(self, patched_check):
+        patched_check.side_effect = OperationalError(
+            'could not connect to server at "db.internal", user "app"'
+        )
+
+        with self.assertLogs('core.health', 'ERROR'):
+            res = self.client.get(READYZ_URL)
+
+        self.assertNotIn('db.internal', res.content.decode())
+        self.assertEqual(
+            res.json()['checks']['database']['error'],
+            'database unavailable'
+        )
+
+    @patch('core.health.pending_migrations')
+    def test_readyz_pending_migrations(self, patched_pending):
+        patched_pending.return_value = ['core.9999_new']
+
+        res = self.client.get(READYZ_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(
+            res.json()['checks']['migrations']['pending'],
+            ['core.9999_new']
+        )
+
+    @patch('core.health.run_checks')
+    def test_readyz_is_cached(self, patched_run):
+        patched_run.return_value = {'ready': True, 'checks': {}}
+
+        self.client.get(READYZ_URL)
+        res = self.client.get(READYZ_URL)
+
+        patched_run.assert_called_once()
+        self.assertTrue(res.json()['cached'])
@@ -0,0 +1,138 @@
+import io
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core import memory
+
+RECIPE_URL = reverse('recipe:recipe-list')
+MEMORY_URL = reverse('debug-memory')
+
+
+class TracingMixin:
+    def setUp(self):
+        super().setUp()
+        memory.start()
+        self.addCleanup(memory.stop)
+
+
+class MemoryTests(TracingMixin, SimpleTestCase):
+    def test_diff_reports_growth_since_previous_call(self):
+        self.assertEqual(memory.diff(), [])
+
+        held = [bytes(1024) for _ in range(2000)]
+        growth = memory.diff()
+
+        self.assertTrue(held)
+        self.assertIn('test_memory.py', growth[0]['site'])
+        self.assertGreater(growth[0]['size_diff_kib'], 1900)
+
+    def test_report(self):
+        report = memory.report(limit=5)
+
+        self.assertTrue(report['tracing'])
+        self.assertLessEqual(len(report['top']), 5)
+        self.assertNotIn('diff', report)
+
+
+class MemoryWatermarkTests(TracingMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create_user(
+            'staff@example.com',
+            'testpass123',
+            is_staff=True
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_peak_recorded_per_view(self):
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+
+        peaks = memory.peaks()
+        self.assertEqual(peaks['RecipeViewSet.list']['requests'], 2)
+        self.assertGreater(peaks['RecipeViewSet.list']['max_kib'], 0)
+
+    @override_settings(MEMORY_WATERMARK_VIEWS=['TagViewSet.list'])
+    def test_only_selected_views_recorded(self):
+        self.client.get(RECIPE_URL)
+
+        self.assertNotIn('RecipeViewSet.list', memory.peaks())
+
+    @override_settings(MEMORY_WATERMARK_KIB=0)
+    def test_watermark_logged(self):
+        with self.assertLogs('core.memory', 'WARNING') as logs:
+            self.client.get(RECIPE_URL)
+
+        self.assertIn('RecipeViewSet.list', logs.output[0])
+
+    def test_memory_endpoint(self):
+        self.client.get(MEMORY_URL)
+        held = [bytes(1024) for _ in range(2000)]
+
+        res = self.client.get(MEMORY_URL, {'diff': '1', 'limit': 3})
+
+        self.assertTrue(held)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.data['tracing'])
+        self.assertEqual(len(res.data['top']), 3)
+        self.assertIn('diff', res.data)
+
+    def test_memory_endpoint_start_stop(self):
+        res = self.client.post(MEMORY_URL, {'action': 'stop'})
+
+        self.assertFalse(res.data['tracing'])
+        self.assertFalse(tracemalloc.is_tracing())
+
+        res = self.client.post(MEMORY_URL, {'action': 'start'})
+
+        self.assertTrue(res.data['tracing'])
+
+    def test_memory_endpoint_invalid_frames(self):
+        for frames in ('abc', 0, memory.MAX_FRAMES + 1):
+            res = self.client.post(
+                MEMORY_URL, {'action': 'start', 'frames': frames}
+            )
+
+            self.assertEqual(res.status_code, 400)
+            self.assertIn('frames', res.data)
+
+    def test_memory_endpoint_staff_only(self):
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(MEMORY_URL)
+
+        self.assertEqual(res.status_code, 403)
+
+
+class MemoryReportCommandTests(TestCase):
+    def test_memory_report(self):
+        get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123'
+        )
+        out = io.StringIO()
+
+        call_command(
+            'memory_report', '--url', RECIPE_URL, user='test@example.com',
+            repeat=2, host='testserver', stdout=out
+        )
+
+        output = out.getvalue()
+        self.assertIn(f'{RECIPE_URL}: max', output)
+        self.assertIn('top allocation sites:', output)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertFalse(Token.objects.exists())
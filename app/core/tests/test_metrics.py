@@ -0,0 +1,176 @@
+import os
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from prometheus_client import REGISTRY  # type: ignore
+from rest_framework.authtoken.models import Token  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core import metrics
+
+RECIPE_URL = reverse('recipe:recipe-list')
+METRICS_URL = reverse('metrics')
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class ViewNameTests(SimpleTestCase):
+    def test_viewset_action(self):
+        view = resolve(RECIPE_URL).func
+
+        self.assertEqual(metrics.view_name(view, 'GET'), 'RecipeViewSet.list')
+        self.assertEqual(
+            metrics.view_name(view, 'POST'), 'RecipeViewSet.create'
+        )
+
+    def test_api_view(self):
+        view = resolve(reverse('user:token')).func
+
+        self.assertEqual(metrics.view_name(view, 'POST'), 'CreateTokenView')
+
+    def test_function_view(self):
+        view = resolve(reverse('readyz')).func
+
+        self.assertEqual(metrics.view_name(view, 'GET'), 'readyz')
+
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123'
+        )
+        token = Token.objects.create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_request_recorded_by_view(self):
+        labels = {'view': 'RecipeViewSet.list', 'method': 'GET'}
+        requests = sample('http_requests_total', status='200', **labels)
+        latency = sample('http_request_duration_seconds_count', **labels)
+        queries = sample(
+            'http_request_db_queries_sum', view='RecipeViewSet.list'
+        )
+
+        self.client.get(RECIPE_URL)
+
+        self.assertEqual(
+            sample('http_requests_total', status='200', **labels),
+            requests + 1
+        )
+        self.assertEqual(
+            sample('http_request_duration_seconds_count', **labels),
+            latency + 1
+        )
+        self.assertEqual(
+            sample('http_request_db_queries_sum', view='RecipeViewSet.list'),
+            queries + 4
+        )
+        self.assertEqual(sample('http_requests_in_flight'), 0)
+
+    def test_unmatched_request(self):
+        before = sample(
+            'http_requests_total',
+            view=metrics.UNMATCHED, method='GET', status='404'
+        )
+
+        self.client.get('/no/such/page/')
+
+        self.assertEqual(
+            sample(
+                'http_requests_total',
+                view=metrics.UNMATCHED, method='GET', status='404'
+            ),
+            before + 1
+        )
+
+    def test_unknown_method_collapsed(self):
+        before = sample(
+            'http_requests_total',
+            view='RecipeViewSet', method=metrics.OTHER_METHOD, status='405'
+        )
+
+        self.client.generic('BREW', RECIPE_URL)
+
+        self.assertEqual(
+            sample(
+                'http_requests_total',
+                view='RecipeViewSet', method=metrics.OTHER_METHOD,
+                status='405'
+            ),
+            before + 1
+        )
+        self.assertIsNone(
+            REGISTRY.get_sample_value(
+                'http_requests_total',
+                {'view': 'RecipeViewSet', 'method': 'BREW', 'status': '405'}
+            )
+        )
+
+    def test_metrics_endpoint(self):
+        self.client.get(RECIPE_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            b'http_requests_total{method="GET",status="200",'
+            b'view="RecipeViewSet.list"}',
+            res.content
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        client = Client()
+        self.assertEqual(client.get(METRICS_URL).status_code, 401)
+        res = client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
+        res = client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secre')
+        self.assertEqual(res.status_code, 401)
+
+    def test_metrics_restricted_to_allowed_networks(self):
+        client = Client()
+
+        res = client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(res.status_code, 403)
+        with override_settings(METRICS_ALLOWED_NETWORKS=['203.0.113.0/24']):
+            res = client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+            self.assertEqual(res.status_code, 200)
+        with override_settings(DEBUG=True):
+            res = client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+            self.assertEqual(res.status_code, 200)
+
+
+class MultiProcessTests(SimpleTestCase):
+    def test_worker_processes_aggregated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory)
+            for _ in range(2):
+                subprocess.run(
+                    [
+                        sys.executable, '-c',
+                        'from core import metrics; '
+                        'metrics.REQUESTS.labels("V.list", "GET", "200")'
+                        '.inc()',
+                    ],
+                    cwd=settings.BASE_DIR, env=env, check=True
+                )
+
+            with patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory):
+                body, content_type = metrics.render()
+
+        self.assertIn(
+            b'http_requests_total{method="GET",status="200",view="V.list"} '
+            b'2.0',
+            body
+        )
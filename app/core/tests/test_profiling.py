@@ -0,0 +1,143 @@
+import marshal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core import profiling
+from core.models import Profile
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def api_client(user):
+    client = APIClient()
+    token = Token.objects.create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_limit_and_window(self):
+        limiter = profiling.RateLimiter(limit=2, period=60)
+
+        with patch('time.monotonic', return_value=100):
+            self.assertEqual(
+                [limiter.allow() for _ in range(3)], [True, True, False]
+            )
+        with patch('time.monotonic', return_value=161):
+            self.assertTrue(limiter.allow())
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user(
+            'staff@example.com',
+            'testpass123',
+            is_staff=True
+        )
+        self.client = api_client(self.staff)
+
+    def test_staff_request_profiled_with_cprofile(self):
+        res = self.client.get(RECIPE_URL, HTTP_X_PROFILE='1')
+
+        profile = Profile.objects.get(id=res['X-Profile-Id'])
+        self.assertEqual(profile.kind, 'cprofile')
+        self.assertEqual(profile.user, self.staff)
+        self.assertEqual(profile.path, RECIPE_URL)
+        self.assertEqual(profile.status_code, 200)
+        self.assertGreater(profile.queries, 0)
+        self.assertIn('cumulative', profile.summary)
+        self.assertTrue(marshal.loads(bytes(profile.data)))
+
+    def test_sampling_profiler_writes_collapsed_stacks(self):
+        res = self.client.get(RECIPE_URL, {'profile': 'sample'})
+
+        profile = Profile.objects.get(id=res['X-Profile-Id'])
+        self.assertEqual(profile.kind, 'sample')
+        for line in bytes(profile.data).decode().splitlines():
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(int(count) > 0)
+
+    def test_not_requested_not_profiled(self):
+        res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertFalse(Profile.objects.exists())
+
+    def test_non_staff_not_profiled(self):
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        res = api_client(user).get(RECIPE_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertFalse(Profile.objects.exists())
+
+    @override_settings(PROFILING_MAX_PER_MINUTE=2)
+    def test_rate_limited(self):
+        for _ in range(4):
+            self.client.get(RECIPE_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(Profile.objects.count(), 2)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_sample_rate(self):
+        self.client.get(RECIPE_URL, HTTP_X_PROFILE='1')
+
+        self.assertFalse(Profile.objects.exists())
+
+    @override_settings(PROFILING_KEEP=2)
+    def test_old_profiles_pruned(self):
+        ids = [
+            self.client.get(RECIPE_URL, HTTP_X_PROFILE='1')['X-Profile-Id']
+            for _ in range(3)
+        ]
+
+        self.assertEqual(
+            sorted(Profile.objects.values_list('id', flat=True)),
+            sorted(int(pk) for pk in ids[1:])
+        )
+
+
+class ProfileAdminTests(TestCase):
+    def setUp(self):
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+        )
+        self.client.force_login(self.admin_user)
+        self.client.get(RECIPE_URL, HTTP_X_PROFILE='1')
+        self.profile = Profile.objects.get()
+
+    def test_profiles_listed(self):
+        res = self.client.get(reverse('admin:core_profile_changelist'))
+
+        self.assertContains(res, RECIPE_URL)
+        self.assertContains(
+            res, reverse('admin:core_profile_download', args=[self.profile.id])
+        )
+
+    def test_profile_detail_shows_summary(self):
+        res = self.client.get(
+            reverse('admin:core_profile_change', args=[self.profile.id])
+        )
+
+        self.assertContains(res, 'cumulative')
+
+    def test_profile_download(self):
+        res = self.client.get(
+            reverse('admin:core_profile_download', args=[self.profile.id])
+        )
+
+        self.assertEqual(
+            res['Content-Disposition'],
+            f'attachment; filename="profile-{self.profile.id}.prof"'
+        )
+        self.assertEqual(res.content, bytes(self.profile.data))
@@ -0,0 +1,179 @@
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ParseError  # type: ignore
+from rest_framework.renderers import JSONRenderer  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+import cbor2
+import msgpack
+
+from core.models import Recipe
+from core.parsers import CBORParser, FastJSONParser, MessagePackParser
+from core.renderers import CBORRenderer, FastJSONRenderer, MessagePackRenderer
+
+
+def sample_payload():
+    return [
+        {
+            'id': 1,
+            'title': 'pongal \u2028 \u2029 café',
+            'price': Decimal('5.25'),
+            'created': datetime.datetime(
+                2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc
+            ),
+            'day': datetime.date(2024, 5, 1),
+            'uid': uuid.UUID('12345678123456781234567812345678'),
+            'label': gettext_lazy('sample'),
+            'tags': [{'id': 2, 'name': 'thai'}],
+        }
+    ]
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def test_matches_stdlib_renderer(self):
+        data = sample_payload()
+
+        self.assertEqual(
+            FastJSONRenderer().render(data),
+            JSONRenderer().render(data)
+        )
+
+    def test_none_renders_empty(self):
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_indent_uses_stdlib(self):
+        data = sample_payload()
+        media_type = 'application/json; indent=4'
+
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type)
+        )
+
+    @patch('core.renderers.orjson', None)
+    def test_fallback_without_orjson(self):
+        data = sample_payload()
+
+        self.assertEqual(
+            FastJSONRenderer().render(data),
+            JSONRenderer().render(data)
+        )
+
+
+class FastJSONParserTests(SimpleTestCase):
+    def test_parse(self):
+        stream = io.BytesIO('{"name": "café", "n": [1, 2]}'.encode())
+
+        data = FastJSONParser().parse(stream)
+
+        self.assertEqual(data, {'name': 'café', 'n': [1, 2]})
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"name": '))
+
+    def test_parse_other_encoding(self):
+        stream = io.BytesIO('{"name": "café"}'.encode('latin-1'))
+
+        data = FastJSONParser().parse(
+            stream,
+            parser_context={'encoding': 'latin-1'}
+        )
+
+        self.assertEqual(data, {'name': 'café'})
+
+
+class BinaryRendererTests(SimpleTestCase):
+    def test_messagepack_matches_json_but_keeps_decimals(self):
+        data = sample_payload()
+        expected = json.loads(JSONRenderer().render(data))
+        expected[0]['price'] = '5.25'
+
+        body = MessagePackRenderer().render(data)
+
+        self.assertEqual(MessagePackParser().parse(io.BytesIO(body)), expected)
+
+    def test_cbor_keeps_decimals_and_datetimes(self):
+        data = sample_payload()
+
+        parsed = CBORParser().parse(io.BytesIO(CBORRenderer().render(data)))
+
+        self.assertEqual(parsed[0]['price'], Decimal('5.25'))
+        self.assertEqual(parsed[0]['created'], data[0]['created'])
+        self.assertEqual(parsed[0]['label'], 'sample')
+
+    def test_none_renders_empty(self):
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+        self.assertEqual(CBORRenderer().render(None), b'')
+
+    def test_parse_errors(self):
+        for parser, body in [
+            (MessagePackParser(), msgpack.packb([1, 2])[:-1]),
+            (MessagePackParser(), b'\xc1'),
+            (CBORParser(), cbor2.dumps({'a': 1})[:-1]),
+        ]:
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
+
+
+class BinaryContentNegotiationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.client = APIClient()
+
+    def test_token_and_recipe_round_trip(self):
+        res = self.client.post(
+            reverse('user:token'),
+            msgpack.packb(
+                {'email': 'user@example.com', 'password': 'testpass123'}
+            ),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        token = msgpack.unpackb(res.content)['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+        res = self.client.post(
+            reverse('recipe:recipe-list'),
+            cbor2.dumps({
+                'title': 'Soup', 'time_minutes': 20, 'price': Decimal('4.50'),
+                'tags': [{'name': 'dinner'}],
+            }),
+            content_type='application/cbor',
+            HTTP_ACCEPT='application/cbor',
+        )
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(
+            Recipe.objects.get().price, Decimal('4.50')
+        )
+
+        res = self.client.get(
+            reverse('recipe:recipe-list'), HTTP_ACCEPT='application/msgpack'
+        )
+        self.assertEqual(res.status_code, 200)
+        [recipe] = msgpack.unpackb(res.content)
+        self.assertEqual(recipe['price'], '4.50')
+        self.assertEqual(recipe['tags'][0]['name'], 'dinner')
+
+    def test_json_stays_default(self):
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(reverse('recipe:recipe-list'), HTTP_ACCEPT='*/*')
+
+        self.assertEqual(res['Content-Type'], 'application/json')
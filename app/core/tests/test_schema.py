@@ -0,0 +1,95 @@
+import gzip
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import schema
+
+SCHEMA_URL = reverse('api-schema')
+
+
+class SchemaTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        override = override_settings(SCHEMA_DIR=self.tmpdir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        schema.clear_cache()
+        self.addCleanup(schema.clear_cache)
+
+    def test_generate_schema_writes_files(self):
+        call_command('generate_schema', stdout=open(os.devnull, 'w'))
+
+        self.assertTrue(os.path.exists(schema.schema_path('yaml')))
+        self.assertTrue(os.path.exists(schema.schema_path('json')))
+
+    def test_schema_served_from_file(self):
+        schema.write_schema()
+
+        with patch('core.schema.generate_schema') as patched_generate:
+            res = self.client.get(SCHEMA_URL)
+            patched_generate.assert_not_called()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'application/vnd.oai.openapi')
+        self.assertIn('max-age', res['Cache-Control'])
+        self.assertIn('/api/recipe/recipes/', res.content.decode())
+
+    def test_schema_json_format(self):
+        schema.write_schema()
+
+        res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(
+            res['Content-Type'],
+            'application/vnd.oai.openapi+json'
+        )
+        self.assertIn('paths', res.json())
+
+    def test_schema_precompressed_variant(self):
+        schema.write_schema()
+
+        with patch('core.compression.compress') as patched_compress:
+            res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+            patched_compress.assert_not_called()
+
+        body, etag = schema.get_document('yaml')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), body)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_schema_not_modified(self):
+        schema.write_schema()
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+    def test_schema_kept_in_memory(self):
+        schema.write_schema()
+        schema.get_document('yaml')
+        os.remove(schema.schema_path('yaml'))
+
+        body, etag = schema.get_document('yaml')
+
+        self.assertTrue(body)
+
+    @override_settings(DEBUG=False)
+    def test_missing_schema_fails_outside_debug(self):
+        with self.assertRaises(ImproperlyConfigured):
+            schema.get_document('yaml')
+
+    @override_settings(DEBUG=True)
+    def test_missing_schema_generated_in_debug(self):
+        body, etag = schema.get_document('yaml')
+
+        self.assertIn(b'openapi', body)
+        self.assertFalse(os.path.exists(schema.schema_path('yaml')))
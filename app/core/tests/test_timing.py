@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core import timing
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class NormalizeSqlTests(SimpleTestCase):
+    def test_literals_replaced(self):
+        sql = (
+            "SELECT * FROM core_recipe WHERE user_id = 12 "
+            "AND title = 'it''s  good' AND price > 5.25"
+        )
+
+        self.assertEqual(
+            timing.normalize_sql(sql),
+            'SELECT * FROM core_recipe WHERE user_id = ? '
+            'AND title = ? AND price > ?'
+        )
+
+    def test_in_lists_collapsed(self):
+        self.assertEqual(
+            timing.normalize_sql('SELECT 1 FROM t WHERE id IN (1, 2,  3)'),
+            'SELECT ? FROM t WHERE id IN (?)'
+        )
+        self.assertEqual(
+            timing.normalize_sql('SELECT a FROM t WHERE id IN (%s, %s)'),
+            'SELECT a FROM t WHERE id IN (?)'
+        )
+
+
+class RequestTimingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        res = self.client.get(RECIPE_URL)
+
+        metrics = {
+            part.split(';')[0].strip(): part
+            for part in res['Server-Timing'].split(',')
+        }
+        self.assertEqual(
+            list(metrics),
+            ['auth', 'db', 'view', 'render', 'total']
+        )
+        self.assertIn('desc="4 queries"', metrics['db'])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        res = self.client.get(RECIPE_URL)
+
+        self.assertFalse(res.has_header('Server-Timing'))
+        anonymous = APIClient().get(RECIPE_URL)
+        self.assertFalse(anonymous.has_header('Server-Timing'))
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_sent_to_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertTrue(res.has_header('Server-Timing'))
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_query_logged_with_call_site(self):
+        with self.assertLogs('core.timing', 'WARNING') as logs:
+            self.client.get(RECIPE_URL)
+
+        slow = [line for line in logs.output if 'slow query' in line]
+        self.assertTrue(
+            any('recipe/listing.py' in line for line in slow)
+        )
+        self.assertTrue(any('user_id" = ?' in line for line in slow))
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_logged(self):
+        with self.assertLogs('core.timing', 'WARNING') as logs:
+            self.client.get(RECIPE_URL)
+
+        self.assertIn('slow request GET /api/recipe/recipes/', logs.output[0])
+
+    def test_phase_outside_request_is_noop(self):
+        with timing.phase('auth'):
+            pass
+
+        self.assertIsNone(timing.current())
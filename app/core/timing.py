@@ -0,0 +1,143 @@
+"""
+Per-request phase timing and slow-query detection.
+
+The active RequestTimer lives in a context variable so that code deep in
+a request (the DB execute wrapper, authentication) can record into it
+without threading it through call signatures.
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import time
+import traceback
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('core.timing')
+
+_current = contextvars.ContextVar('request_timer', default=None)
+
+_PARAM = re.compile(r'%s')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def normalize_sql(sql):
+    """Strip literals from SQL so the same statement shape groups
+    together, e.g. `... WHERE id IN (1, 2, 3)` -> `... WHERE id IN (?)`."""
+    sql = _PARAM.sub('?', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(?)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def call_site():
+    """`file:line in function` of the innermost project frame on the
+    stack, skipping installed packages and this module."""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        filename = frame.filename
+        if not filename.startswith(base_dir) or \
+                'site-packages' in filename or \
+                filename.startswith(_THIS_DIR + os.sep + 'timing'):
+            continue
+        return (
+            f'{os.path.relpath(filename, base_dir)}:{frame.lineno} '
+            f'in {frame.name}'
+        )
+    return 'unknown'
+
+
+def current():
+    """The RequestTimer for the request being served, or None."""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Add the time spent in the block to phase `name` of the current
+    request, if there is one."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start)
+
+
+class RequestTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.queries = 0
+        self.view_start = None
+        self.view_end = None
+        self.render_end = None
+        self.end = None
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def activate(self):
+        token = _current.set(self)
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.execute_wrapper)
+                    )
+                yield self
+        finally:
+            _current.reset(token)
+            self.end = time.perf_counter()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.add('db', elapsed)
+            if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+                logger.warning(
+                    'slow query %.1fms at %s: %s',
+                    elapsed * 1000, call_site(), normalize_sql(sql)
+                )
+
+    def durations(self):
+        """Phase durations in ms, in Server-Timing order."""
+        end = self.end or time.perf_counter()
+        durations = {}
+        if 'auth' in self.phases:
+            durations['auth'] = self.phases['auth'] * 1000
+        durations['db'] = self.phases.get('db', 0.0) * 1000
+        if self.view_start is not None:
+            view_end = self.view_end or end
+            durations['view'] = (view_end - self.view_start) * 1000
+            if self.view_end is not None and self.render_end is not None:
+                durations['render'] = (self.render_end - self.view_end) * 1000
+        durations['total'] = (end - self.start) * 1000
+        return durations
+
+    def server_timing(self):
+        parts = []
+        for name, ms in self.durations().items():
+            part = f'{name};dur={ms:.1f}'
+            if name == 'db':
+                part += f';desc="{self.queries} queries"'
+            parts.append(part)
+        return ', '.join(parts)
@@ -0,0 +1,171 @@
+import hmac
+import ipaddress
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from drf_spectacular.utils import extend_schema  # type: ignore
+from rest_framework import authentication, permissions  # type: ignore
+from rest_framework.decorators import (  # type: ignore
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
+from rest_framework.response import Response  # type: ignore
+
+from core import compression, health, memory, metrics, schema
+from core.authentication import TokenAuthentication
+
+_readiness_cache = {'expires': 0.0, 'report': None}
+
+
+@never_cache
+@require_safe
+def healthz(request):
+    """Liveness: the process is up and serving requests."""
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_safe
+def readyz(request):
+    """Readiness: the database answers and every migration is applied.
+
+    The report is cached in-process for HEALTH_CHECK_CACHE_SECONDS so
+    aggressive orchestrator polling doesn't turn into database load.
+    """
+    now = time.monotonic()
+    cached = _readiness_cache['report'] is not None and \
+        now < _readiness_cache['expires']
+
+    metrics.cache_lookup('readiness', cached)
+    if not cached:
+        _readiness_cache['report'] = health.run_checks()
+        _readiness_cache['expires'] = now + getattr(
+            settings, 'HEALTH_CHECK_CACHE_SECONDS', 2
+        )
+
+    report = dict(_readiness_cache['report'], cached=cached)
+    status = 200 if report['ready'] else 503
+
+    return JsonResponse(report, status=status)
+
+
+@require_safe
+def api_schema(request):
+    """Serve the pre-rendered OpenAPI schema with an ETag and long caching.
+
+    YAML by default, JSON for `?format=json` or a JSON `Accept` header.
+    """
+    if request.GET.get('format') == 'json' or \
+            'json' in request.META.get('HTTP_ACCEPT', ''):
+        fmt = 'json'
+    else:
+        fmt = 'yaml'
+
+    encoding = compression.accepted_encoding(
+        request.META.get('HTTP_ACCEPT_ENCODING', '')
+    )
+    try:
+        body, etag = schema.get_document(fmt, encoding)
+    except FileNotFoundError:
+        encoding = None
+        body, etag = schema.get_document(fmt)
+    content_type = schema.FORMATS[fmt][1].media_type
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type=content_type)
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Vary'] = 'Accept, Accept-Encoding'
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=settings.SCHEMA_CACHE_SECONDS
+    )
+
+    return response
+
+
+def _allowed_network(request):
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network.strip(), strict=False)
+        for network in settings.METRICS_ALLOWED_NETWORKS
+        if network.strip()
+    )
+
+
+@never_cache
+@require_safe
+def metrics_view(request):
+    """Prometheus metrics for every worker process, see core.metrics.
+
+    When METRICS_TOKEN is set, scrapers must send it as a bearer token.
+    Otherwise only clients in METRICS_ALLOWED_NETWORKS are served, or
+    anyone when DEBUG is on.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        sent = request.META.get('HTTP_AUTHORIZATION', '')
+        if not hmac.compare_digest(sent.encode(), f'Bearer {token}'.encode()):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG and not _allowed_network(request):
+        return HttpResponse(status=403)
+
+    body, content_type = metrics.render()
+    return HttpResponse(body, content_type=content_type)
+
+
+@extend_schema(exclude=True)
+@api_view(['GET', 'POST'])
+@authentication_classes([
+    TokenAuthentication,
+    authentication.SessionAuthentication,
+])
+@permission_classes([permissions.IsAdminUser])
+def memory_view(request):
+    """Memory diagnostics for the worker process serving the request.
+
+    GET reports RSS, traced memory, the top allocation sites and per-view
+    request peaks; `?diff=1` adds the sites that grew since the previous
+    diff and `?limit=` sets the number of sites. POST `{"action": "start"}`
+    or `{"action": "stop"}` switches tracemalloc on or off, `frames`
+    setting how deep allocation tracebacks go.
+    """
+    if request.method == 'POST':
+        action = request.data.get('action')
+        if action == 'start':
+            try:
+                frames = int(request.data.get('frames', 1))
+            except (TypeError, ValueError):
+                frames = 0
+            if not 1 <= frames <= memory.MAX_FRAMES:
+                return Response({'frames': [
+                    f'Must be an integer from 1 to {memory.MAX_FRAMES}.'
+                ]}, status=400)
+            memory.start(frames)
+        elif action == 'stop':
+            memory.stop()
+        else:
+            return Response(
+                {'action': ['Must be "start" or "stop".']}, status=400
+            )
+
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 20)), 200))
+    except ValueError:
+        limit = 20
+    return Response(memory.report(
+        limit=limit,
+        include_diff=request.query_params.get('diff') == '1',
+    ))
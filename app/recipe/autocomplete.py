@@ -0,0 +1,124 @@
+"""
+Tag and ingredient name autocomplete.
+
+Prefix matches come first, most used first, from an index on
+(user_id, UPPER(name) text_pattern_ops) that serves `name__istartswith`.
+Once the query is AUTOCOMPLETE_FUZZY_MIN_LENGTH characters long, the
+remaining slots are filled with fuzzy matches: trigram similarity through
+pg_trgm and its GIN index where the extension is installed, substring
+matches otherwise.
+
+Results are cached per process and user for AUTOCOMPLETE_CACHE_SECONDS,
+since typing and backspacing repeats the same queries. Tag/ingredient
+writes in this process invalidate the user's entries at once; other
+processes see them once their entries expire.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Q
+
+FIELDS = ['id', 'name']
+
+_trigram_available = None
+
+
+def trigram_available():
+    """Whether pg_trgm is installed in the database; checked once."""
+    global _trigram_available
+    if _trigram_available is None:
+        if connection.vendor != 'postgresql':
+            _trigram_available = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+                )
+                _trigram_available = cursor.fetchone() is not None
+    return _trigram_available
+
+
+class ResultCache:
+    """Size bounded LRU of autocomplete results with per-entry expiry.
+
+    Keys embed the user's generation, so `invalidate(user_id)` makes all
+    of that user's entries unreachable without scanning for them.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def key(self, user_id, *parts):
+        return (user_id, self._generations.get(user_id, 0)) + parts
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generations.clear()
+
+
+cache = ResultCache(settings.AUTOCOMPLETE_CACHE_MAX_ENTRIES)
+
+
+def search(queryset, user_id, q, limit):
+    """Up to `limit` {'id', 'name'} dicts from `queryset` (one user's tags
+    or ingredients) matching `q`, prefix matches first."""
+    q = ' '.join(q.split())
+    if not q or limit < 1:
+        return []
+
+    key = cache.key(user_id, queryset.model._meta.label, q.lower(), limit)
+    results = cache.get(key)
+    if results is not None:
+        return results
+
+    results = list(
+        queryset.filter(name__istartswith=q)
+        .order_by('-usage_count', 'name')
+        .values(*FIELDS)[:limit]
+    )
+    if len(results) < limit and \
+            len(q) >= settings.AUTOCOMPLETE_FUZZY_MIN_LENGTH:
+        fuzzy = queryset.exclude(name__istartswith=q)
+        if trigram_available():
+            fuzzy = fuzzy.annotate(similarity=TrigramSimilarity('name', q)) \
+                .filter(
+                    Q(name__trigram_similar=q) | Q(name__icontains=q)
+                ).order_by('-similarity', '-usage_count', 'name')
+        else:
+            fuzzy = fuzzy.filter(name__icontains=q) \
+                .order_by('-usage_count', 'name')
+        results.extend(fuzzy.values(*FIELDS)[:limit - len(results)])
+
+    cache.set(key, results, settings.AUTOCOMPLETE_CACHE_SECONDS)
+    return results
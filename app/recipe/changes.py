@@ -0,0 +1,211 @@
+"""
+Change log for syncing clients.
+
+Every write to a recipe, tag or ingredient (and to a recipe's tag and
+ingredient links, logged as a write to the recipe) adds a
+core.models.Change row from recipe.signals, in the transaction making the
+write. Each user's changes are numbered by `seq` from their
+core.models.ChangeSequence row, which the numbering statement locks until
+commit, so a user's changes commit in `seq` order and a `seq` cursor never
+skips a change that commits later. recipe.signals takes that lock with
+`lock()` before a write touches anything else (the row, its links or the
+user's recipe.stats row), so concurrent writes of one user queue on it
+rather than taking their locks in different orders and deadlocking. The
+numbering statement also NOTIFYs
+CHANGES_NOTIFY_CHANNEL with '<user id>:<cursor>', which Postgres delivers
+when the transaction commits (see recipe.stream).
+
+`fetch()` returns what changed after a cursor: one entry per object, in
+the order of its latest change, either an upsert carrying the object as
+it is now or a tombstone. Renaming a tag or ingredient logs only that
+object, not every recipe listing it; clients update the nested names.
+
+`compact()` (`manage.py compact_changes`) deletes changes superseded by a
+later change to the same object, which never changes what `fetch()`
+returns, and tombstones older than CHANGES_TOMBSTONE_DAYS, which raises
+the user's horizon: cursors below it get CursorExpired and the client has
+to download everything again.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from core.models import Change, ChangeSequence, Ingredient, Recipe, Tag
+from recipe import listing
+
+MODELS = {'recipe': Recipe, 'tag': Tag, 'ingredient': Ingredient}
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def kind(model):
+    return model._meta.model_name
+
+
+def lock(user_id):
+    """Lock the user's sequence row until the transaction ends, creating
+    it if need be."""
+    table = ChangeSequence._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            INSERT INTO {table} (user_id, last_seq, horizon)
+            VALUES (%s, 0, 0)
+            ON CONFLICT (user_id) DO UPDATE SET last_seq = {table}.last_seq
+        ''', [user_id])
+
+
+def _numbers(user_id, count):
+    """Reserve `count` sequence numbers for the user; returns the first.
+    Also notifies listeners of the new cursor, on commit."""
+    table = ChangeSequence._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            WITH numbered AS (
+                INSERT INTO {table} (user_id, last_seq, horizon)
+                VALUES (%s, %s, 0)
+                ON CONFLICT (user_id) DO UPDATE
+                    SET last_seq = {table}.last_seq + EXCLUDED.last_seq
+                RETURNING user_id, last_seq
+            )
+            SELECT last_seq, pg_notify(%s, user_id || ':' || last_seq)
+            FROM numbered
+        ''', [user_id, count, settings.CHANGES_NOTIFY_CHANNEL])
+        return cursor.fetchone()[0] - count + 1
+
+
+def record(user_id, kind, object_ids, op):
+    object_ids = list(object_ids)
+    if not object_ids:
+        return
+    with transaction.atomic():
+        first = _numbers(user_id, len(object_ids))
+        Change.objects.bulk_create([
+            Change(
+                user_id=user_id, seq=first + i, kind=kind, object_id=pk, op=op
+            )
+            for i, pk in enumerate(object_ids)
+        ])
+
+
+def recipes_changed(recipe_ids, user_id=None):
+    """Log upserts of recipes whose links changed."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    if user_id is not None:
+        record(user_id, 'recipe', recipe_ids, Change.UPSERT)
+        return
+
+    by_user = defaultdict(list)
+    for owner, pk in Recipe.objects.filter(pk__in=recipe_ids) \
+            .order_by('id').values_list('user_id', 'id'):
+        by_user[owner].append(pk)
+    for owner, pks in by_user.items():
+        record(owner, 'recipe', pks, Change.UPSERT)
+
+
+def current_cursor(user):
+    return ChangeSequence.objects.filter(user=user) \
+        .values_list('last_seq', flat=True).first() or 0
+
+
+def _objects(user, kind, ids, recipe_fields):
+    if kind == 'recipe':
+        rows = listing.recipe_list(
+            Recipe.objects.filter(user=user, id__in=ids), recipe_fields
+        )
+    else:
+        rows = MODELS[kind].objects.filter(user=user, id__in=ids) \
+            .values('id', 'name')
+    return {row['id']: row for row in rows}
+
+
+def fetch(user, since, limit, recipe_fields):
+    """The user's changes after cursor `since`, reading at most `limit` log
+    entries. Recipes are represented with RecipeSerializer `recipe_fields`.
+    Upserted objects that are gone by now are reported as deleted."""
+    rows = list(
+        Change.objects.filter(user=user, seq__gt=since).order_by('seq')
+        .values_list('seq', 'kind', 'object_id', 'op')[:limit]
+    )
+    # Read after the rows: compaction deleting some of them has raised the
+    # horizon by the time they are missing.
+    horizon = ChangeSequence.objects.filter(user=user) \
+        .values_list('horizon', flat=True).first() or 0
+    if since < horizon:
+        raise CursorExpired()
+
+    latest = {}
+    for _, kind, pk, op in rows:
+        latest.pop((kind, pk), None)
+        latest[kind, pk] = op
+
+    upserted = defaultdict(list)
+    for (kind, pk), op in latest.items():
+        if op == Change.UPSERT:
+            upserted[kind].append(pk)
+    objects = {
+        kind: _objects(user, kind, ids, recipe_fields)
+        for kind, ids in upserted.items()
+    }
+
+    changes = []
+    for (kind, pk), op in latest.items():
+        data = objects.get(kind, {}).get(pk)
+        changes.append({
+            'kind': kind,
+            'id': pk,
+            'op': Change.DELETE if data is None else Change.UPSERT,
+            'data': data,
+        })
+
+    return {
+        'cursor': rows[-1][0] if rows else since,
+        'more': len(rows) == limit,
+        'changes': changes,
+    }
+
+
+def compact(tombstone_days=None):
+    """Delete superseded changes, tombstones older than `tombstone_days`
+    and changes of deleted users; returns how many of each."""
+    if tombstone_days is None:
+        tombstone_days = settings.CHANGES_TOMBSTONE_DAYS
+
+    superseded, _ = Change.objects.filter(Exists(
+        Change.objects.filter(
+            user_id=OuterRef('user_id'),
+            kind=OuterRef('kind'),
+            object_id=OuterRef('object_id'),
+            seq__gt=OuterRef('seq'),
+        )
+    )).delete()
+
+    old = Change.objects.filter(
+        op=Change.DELETE,
+        created__lt=timezone.now() - timedelta(days=tombstone_days)
+    )
+    with transaction.atomic():
+        horizons = old.values('user_id').annotate(seq=Max('seq')) \
+            .values_list('user_id', 'seq')
+        for user_id, seq in horizons:
+            ChangeSequence.objects.filter(user_id=user_id, horizon__lt=seq) \
+                .update(horizon=seq)
+        tombstones, _ = old.delete()
+
+    users = get_user_model().objects.filter(pk=OuterRef('user_id'))
+    orphans, _ = Change.objects.filter(~Exists(users)).delete()
+    ChangeSequence.objects.filter(~Exists(users)).delete()
+
+    return {
+        'superseded': superseded,
+        'tombstones': tombstones,
+        'orphans': orphans,
+    }
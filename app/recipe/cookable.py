@@ -0,0 +1,164 @@
+"""
+"Cook with what I have": rank a user's recipes by how many of their
+ingredients the user already has.
+
+Each user's recipe/ingredient links are held in memory as an inverted
+index (ingredient id -> positions of the recipes using it), plus each
+recipe's ingredient count. Ranking a set of owned ingredients then only
+touches their posting lists: NumPy `bincount` over the concatenated
+postings gives every recipe's hits in one vectorised pass, and without
+NumPy a Counter does the same in Python.
+
+Indexes are built on first use, kept per process for up to
+COOKABLE_CACHE_USERS users (least recently used first out), and tagged
+with the user's RecipeStats.ingredients_version. recipe.stats replaces
+that version whenever one of the user's recipe/ingredient links changes
+(and only then: titles, prices and tags don't affect the index), so every
+ranking checks it with one primary key lookup and rebuilds a stale index.
+"""
+import heapq
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from itertools import chain
+
+from django.conf import settings
+
+from recipe import stats
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+class Index:
+    """Inverted ingredient index over one user's recipes."""
+
+    def __init__(self, links):
+        positions = {}
+        postings = defaultdict(list)
+        for recipe_id, ingredient_id in links:
+            position = positions.setdefault(recipe_id, len(positions))
+            postings[ingredient_id].append(position)
+
+        self.recipe_ids = list(positions)
+        self.totals = [0] * len(self.recipe_ids)
+        for posting in postings.values():
+            for position in posting:
+                self.totals[position] += 1
+        self.postings = dict(postings)
+
+        if numpy is not None:
+            self.recipe_ids = numpy.array(self.recipe_ids, dtype=numpy.int64)
+            self.totals = numpy.array(self.totals, dtype=numpy.int32)
+            self.postings = {
+                ingredient_id: numpy.array(posting, dtype=numpy.int32)
+                for ingredient_id, posting in self.postings.items()
+            }
+
+    @classmethod
+    def build(cls, user_id):
+        through, target = stats.through('ingredients')
+        return cls(
+            through.objects.filter(recipe__user_id=user_id)
+            .order_by().values_list('recipe_id', target)
+            .iterator(chunk_size=10000)
+        )
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def rank(self, ingredient_ids, limit):
+        """Up to `limit` (recipe id, have, total) tuples for recipes using
+        at least one of `ingredient_ids`: highest coverage first, then
+        fewest missing ingredients, then newest."""
+        postings = [
+            self.postings[pk] for pk in set(ingredient_ids)
+            if pk in self.postings
+        ]
+        if not postings or limit < 1:
+            return []
+        if numpy is None:
+            return self._rank_python(postings, limit)
+
+        hits = numpy.bincount(
+            numpy.concatenate(postings), minlength=len(self)
+        )
+        candidates = numpy.flatnonzero(hits)
+        have = hits[candidates]
+        totals = self.totals[candidates]
+        ids = self.recipe_ids[candidates]
+        order = numpy.lexsort((-ids, totals - have, -(have / totals)))
+        return [
+            (int(ids[i]), int(have[i]), int(totals[i]))
+            for i in order[:limit]
+        ]
+
+    def _rank_python(self, postings, limit):
+        hits = Counter(chain.from_iterable(postings))
+        best = heapq.nsmallest(limit, hits.items(), key=lambda item: (
+            -item[1] / self.totals[item[0]],
+            self.totals[item[0]] - item[1],
+            -self.recipe_ids[item[0]],
+        ))
+        return [
+            (int(self.recipe_ids[i]), have, int(self.totals[i]))
+            for i, have in best
+        ]
+
+
+class IndexCache:
+    """Per-process LRU of user id -> (ingredients version, Index)."""
+
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        # Read the version before the links: a change landing in between
+        # leaves a newer index under the older version, rebuilt next time.
+        version = stats.ingredients_version(user_id)
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._data.move_to_end(user_id)
+                return entry[1]
+
+        index = Index.build(user_id)
+        with self._lock:
+            self._data[user_id] = (version, index)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_users:
+                self._data.popitem(last=False)
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+cache = IndexCache(settings.COOKABLE_CACHE_USERS)
+
+
+def rank(user, ingredient_ids, limit):
+    """The cookable endpoint payload: {'id', 'title', 'coverage', 'have',
+    'missing'} dicts for the user's best matching recipes."""
+    ranked = cache.get(user.id).rank(ingredient_ids, limit)
+    titles = dict(
+        user.recipe_set.filter(id__in=[pk for pk, _, _ in ranked])
+        .values_list('id', 'title')
+    ) if ranked else {}
+
+    return [
+        {
+            'id': pk,
+            'title': titles[pk],
+            'coverage': round(have / total, 4),
+            'have': have,
+            'missing': total - have,
+        }
+        for pk, have, total in ranked
+        # Deleted since the version check.
+        if pk in titles
+    ]
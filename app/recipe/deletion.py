@@ -0,0 +1,124 @@
+"""
+Bulk deletion of recipes and users.
+
+Django deletes a queryset, and everything a user owns when the user is
+deleted, by sending pre_delete/post_delete for every row, and the
+recipe.signals receivers then cost several queries per recipe: locking
+the change sequence, reading its links, updating the stats row and usage
+counts and logging a tombstone. `delete_recipes()` and `delete_users()`
+do that work once for the whole set instead, aggregated per user and
+target, and have the per-object receivers skip (`skipped()`) the owners
+they cover while Django deletes the rows. core.models routes recipe and
+user deletes through them.
+"""
+import contextlib
+import contextvars
+
+from django.db import transaction
+
+from core.models import Change
+from recipe import changes, similarity, stats
+
+_skipped = contextvars.ContextVar('deletion_skipped', default=frozenset())
+
+
+def skipped(user_id):
+    """Whether a bulk delete is accounting for the user's objects, so the
+    per-object delete receivers should leave them alone."""
+    return user_id in _skipped.get()
+
+
+@contextlib.contextmanager
+def _skipping(user_ids):
+    token = _skipped.set(_skipped.get() | frozenset(user_ids))
+    try:
+        yield
+    finally:
+        _skipped.reset(token)
+
+
+def _links(**filters):
+    """{relation: [(recipe owner id, target id)]} of the links matching
+    `filters`."""
+    links = {}
+    for relation in stats.RELATIONS:
+        through, target = stats.through(relation)
+        links[relation] = list(
+            through.objects.filter(**filters)
+            .values_list('recipe__user_id', target)
+        )
+    return links
+
+
+def delete_recipes(recipes, delete):
+    """Delete the `recipes` queryset with `delete()` (its QuerySet.delete),
+    updating stats, usage counts and the change log in one pass."""
+    with transaction.atomic():
+        user_ids = sorted(
+            recipes.order_by().values_list('user_id', flat=True).distinct()
+        )
+        # Locked first and in id order, as every write of these users
+        # does, so the recipes read below stay the ones deleted.
+        for user_id in user_ids:
+            changes.lock(user_id)
+        rows = list(
+            recipes.order_by('id')
+            .values_list('id', 'user_id', 'price', 'time_minutes')
+        )
+        links = _links(recipe_id__in=[pk for pk, *_ in rows])
+
+        with _skipping(user_ids):
+            result = delete()
+
+        stats.recipes_deleted([values for _, *values in rows], links)
+        for user_id in user_ids:
+            changes.record(
+                user_id, 'recipe',
+                [pk for pk, owner, *_ in rows if owner == user_id],
+                Change.DELETE
+            )
+        return result
+
+
+def delete_users(user_ids, delete):
+    """Delete the users `user_ids` with `delete()` without per-object work
+    for what they own, which goes with them (stats row and change log
+    included). Only links to other users' objects are accounted for."""
+    with transaction.atomic():
+        # Other users' tags and ingredients lose these users' recipes...
+        lost_targets = {}
+        # ...and other users' recipes lose these users' tags and
+        # ingredients.
+        changed = {}
+        for relation, model in stats.RELATIONS.items():
+            through, target = stats.through(relation)
+            owned = model.objects.filter(user_id__in=user_ids).values('id')
+            lost_targets[relation] = list(
+                through.objects.filter(recipe__user_id__in=user_ids)
+                .exclude(**{f'{target}__in': owned})
+                .values_list(target, flat=True)
+            )
+            changed[relation] = list(
+                through.objects.filter(**{f'{target}__in': owned})
+                .exclude(recipe__user_id__in=user_ids)
+                .values_list('recipe__user_id', 'recipe_id')
+            )
+        owners = sorted({
+            owner for pairs in changed.values() for owner, _ in pairs
+        })
+        recipe_ids = sorted({
+            pk for pairs in changed.values() for _, pk in pairs
+        })
+        for user_id in owners:
+            changes.lock(user_id)
+
+        with _skipping(user_ids):
+            result = delete()
+
+        for relation, target_ids in lost_targets.items():
+            stats.usage_changed(relation, target_ids, -1)
+        for relation, pairs in changed.items():
+            stats.links_changed(relation, pairs)
+        similarity.update(recipe_ids)
+        changes.recipes_changed(recipe_ids)
+        return result
@@ -0,0 +1,119 @@
+"""
+Lean read path for recipe lists.
+
+Builds the same structure as `RecipeSerializer(many=True).data` straight
+from `values()` rows: one query for the recipes and one per relation on
+the through tables, instead of model instances and nested serializers.
+
+The side-loaded shape (`sideloaded_items()`) has id lists for relations and
+each linked tag and ingredient once in a separate `included` section,
+instead of repeating them in every recipe that links them.
+"""
+from collections import defaultdict
+
+from rest_framework import serializers  # type: ignore
+
+from core.models import Recipe
+
+RELATIONS = ['tags', 'ingredients']
+
+# Fields whose to_representation() is a no-op on values() output.
+_PASSTHROUGH = (serializers.IntegerField, serializers.CharField)
+
+
+def related_names(queryset, relation):
+    """Map recipe id -> list of `{'id', 'name'}` dicts for a M2M relation,
+    ordered by id like RecipeSerializer's relations."""
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    target = field.m2m_reverse_field_name()
+
+    rows = through.objects.filter(
+        recipe_id__in=queryset.values('id')
+    ).order_by(f'{target}_id').values_list(
+        'recipe_id', f'{target}__id', f'{target}__name'
+    )
+
+    related = defaultdict(list)
+    for recipe_id, pk, name in rows:
+        related[recipe_id].append({'id': pk, 'name': name})
+
+    return related
+
+
+def related_ids(queryset, relation):
+    """Map recipe id -> list of linked ids for a M2M relation, ordered by
+    id, and the linked `{'id', 'name'}` dicts by id."""
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    target = field.m2m_reverse_field_name()
+
+    rows = through.objects.filter(
+        recipe_id__in=queryset.values('id')
+    ).order_by(f'{target}_id').values_list('recipe_id', f'{target}_id')
+
+    related = defaultdict(list)
+    for recipe_id, pk in rows:
+        related[recipe_id].append(pk)
+
+    included = list(
+        field.related_model.objects.filter(
+            id__any=sorted({pk for pks in related.values() for pk in pks})
+        ).order_by('id').values('id', 'name')
+    )
+
+    return related, included
+
+
+def _items(queryset, fields, related):
+    columns = [name for name in fields if name not in RELATIONS]
+    converters = {
+        name: field.to_representation
+        for name, field in fields.items()
+        if name in columns and not isinstance(field, _PASSTHROUGH)
+    }
+
+    items = []
+    for row in queryset.values('id', *columns):
+        item = {}
+        for name in fields:
+            if name in related:
+                item[name] = related[name].get(row['id'], [])
+            elif name in converters and row[name] is not None:
+                item[name] = converters[name](row[name])
+            else:
+                item[name] = row[name]
+        items.append((row['id'], item))
+
+    return items
+
+
+def recipe_items(queryset, fields):
+    """`(id, representation)` pairs of `queryset` for the given
+    RecipeSerializer `fields`, without instantiating models.
+
+    Only the selected columns are fetched and relations that aren't in
+    `fields` aren't queried at all.
+    """
+    return _items(queryset, fields, {
+        name: related_names(queryset, name)
+        for name in RELATIONS if name in fields
+    })
+
+
+def recipe_list(queryset, fields):
+    """The list representation of `queryset` for the given
+    RecipeSerializer `fields`, see `recipe_items()`."""
+    return [item for _, item in recipe_items(queryset, fields)]
+
+
+def sideloaded_items(queryset, fields):
+    """Like `recipe_items()` with id lists for relations; also returns the
+    `included` section, the linked objects of each relation in `fields`."""
+    related = {}
+    included = {}
+    for name in RELATIONS:
+        if name in fields:
+            related[name], included[name] = related_ids(queryset, name)
+
+    return _items(queryset, fields, related), included
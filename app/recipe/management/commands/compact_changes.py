@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipe import changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Compact the change log behind the changes endpoint: drop changes '
+        'superseded by later ones and expired tombstones. Run daily.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tombstone-days', type=int,
+            default=settings.CHANGES_TOMBSTONE_DAYS,
+            help='keep tombstones this many days (clients offline longer '
+                 'have to download everything again)'
+        )
+
+    def handle(self, *args, **options):
+        counts = changes.compact(options['tombstone_days'])
+        self.stdout.write(self.style.SUCCESS(
+            'deleted {superseded} superseded changes, {tombstones} '
+            'tombstones, {orphans} changes of deleted users'.format(**counts)
+        ))
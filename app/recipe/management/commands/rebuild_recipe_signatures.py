@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from recipe import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the MinHash signatures behind similar recipe lookups, '
+        'e.g. after bulk loads that bypass model signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='emails',
+                            help='only this user, repeatable')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['emails']:
+            user_ids = list(
+                get_user_model().objects.filter(email__in=options['emails'])
+                .values_list('id', flat=True)
+            )
+
+        count = similarity.rebuild(user_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f'rebuilt {count} recipe signatures')
+        )
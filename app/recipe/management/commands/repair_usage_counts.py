@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipe import stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute Tag and Ingredient usage counts from the recipe link '
+        'tables, e.g. after bulk loads that bypass model signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--relation', action='append', dest='relations',
+                            choices=sorted(stats.RELATIONS),
+                            help='only this relation, repeatable')
+
+    def handle(self, *args, **options):
+        count = stats.recount_usage(options['relations'])
+        self.stdout.write(self.style.SUCCESS(f'recounted {count} rows'))
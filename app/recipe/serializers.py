@@ -1,30 +1,90 @@
+from django.db import models, transaction
+
 from rest_framework import serializers  # type: ignore
+from rest_framework.permissions import SAFE_METHODS  # type: ignore
 
 from core.models import Recipe, Tag, Ingredient
 
 
-class TagSerializer(serializers.ModelSerializer):
+def _split_param(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def sparse_field_names(query_params, names):
+    """Return the `names` selected by the `fields` / `omit` query
+    parameters, keeping their declared order."""
+    requested = _split_param(query_params.get('fields'))
+    omitted = _split_param(query_params.get('omit'))
+
+    return [
+        name for name in names
+        if (not requested or name in requested) and name not in omitted
+    ]
+
+
+class SparseFieldsMixin:
+    """Let read requests trim top-level fields with `?fields=a,b` and
+    `?omit=c`. Nested serializers are left whole."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return fields
+
+        for name in set(fields) - set(
+            sparse_field_names(request.query_params, fields)
+        ):
+            fields.pop(name)
+
+        return fields
+
+
+class TagSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ['id', 'name']
         read_only_fields = ['id']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ['id', 'name']
         read_only_fields = ['id']
 
-class RecipeSerializer(serializers.ModelSerializer):
-    tags = TagSerializer(many=True, required=False)
-    ingredients = IngredientSerializer(many=True, required=False)
+
+class RelatedListSerializer(serializers.ListSerializer):
+    """A recipe's tags or ingredients ordered by id, as recipe.listing
+    returns them. Sorted here so prefetched relations are reused."""
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        return super().to_representation(
+            sorted(data, key=lambda item: item.pk)
+        )
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    tags = RelatedListSerializer(child=TagSerializer(), required=False)
+    ingredients = RelatedListSerializer(
+        child=IngredientSerializer(), required=False
+    )
 
     class Meta:
         model = Recipe
         fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients']
         read_only_fields = ['id']
 
+    @transaction.atomic
     def create(self, validated_data):
         # print(validated_data)
         tags = validated_data.pop('tags', [])
@@ -33,22 +93,18 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         auth_user = self.context['request'].user
 
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag
-            )
-            recipe.tags.add(tag_obj)
-
-        for ing in ings:
-            ing_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ing
-            )
-            recipe.ingredients.add(ing_obj)
+        recipe.tags.add(*[
+            Tag.objects.get_or_create(user=auth_user, **tag)[0]
+            for tag in tags
+        ])
+        recipe.ingredients.add(*[
+            Ingredient.objects.get_or_create(user=auth_user, **ing)[0]
+            for ing in ings
+        ])
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         # print(instance)
         # print(validated_data)
@@ -62,19 +118,14 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         recipe = super().update(instance, validated_data)
 
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag
-            )
-            recipe.tags.add(tag_obj)
-
-        for ingredient in ingredients:
-            ing_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient
-            )
-            recipe.ingredients.add(ing_obj)
+        recipe.tags.add(*[
+            Tag.objects.get_or_create(user=auth_user, **tag)[0]
+            for tag in tags
+        ])
+        recipe.ingredients.add(*[
+            Ingredient.objects.get_or_create(user=auth_user, **ingredient)[0]
+            for ingredient in ingredients
+        ])
 
         return recipe
 
@@ -82,3 +133,54 @@ class RecipeSerializer(serializers.ModelSerializer):
 class RecipeDetailSerializer(RecipeSerializer):
     class Meta(RecipeSerializer.Meta):
         fields = RecipeSerializer.Meta.fields + ['description']
+
+
+class TimeBucketSerializer(serializers.Serializer):
+    max_minutes = serializers.IntegerField(allow_null=True)
+    count = serializers.IntegerField()
+
+
+class CountedNameSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    recipes = serializers.IntegerField()
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    """Read-only view of recipe.stats.summary()."""
+    recipe_count = serializers.IntegerField()
+    average_price = serializers.DecimalField(
+        max_digits=14, decimal_places=2, allow_null=True
+    )
+    average_time_minutes = serializers.FloatField(allow_null=True)
+    time_minutes_distribution = TimeBucketSerializer(many=True)
+    top_tags = CountedNameSerializer(many=True)
+    top_ingredients = CountedNameSerializer(many=True)
+
+
+class ShoppingListSerializer(serializers.Serializer):
+    """Read-only view of recipe.shopping.shopping_list()."""
+    recipe_count = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=14, decimal_places=2)
+    time_minutes = serializers.IntegerField()
+    ingredients = CountedNameSerializer(many=True)
+
+
+class ChangeSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=['recipe', 'tag', 'ingredient'])
+    id = serializers.IntegerField()
+    op = serializers.ChoiceField(choices=['upsert', 'delete'])
+    # The object as the detail/list endpoints return it; null if deleted.
+    data = serializers.JSONField(allow_null=True)
+
+
+class ChangesSerializer(serializers.Serializer):
+    """Read-only view of recipe.changes.fetch()."""
+    cursor = serializers.IntegerField()
+    more = serializers.BooleanField()
+    changes = ChangeSerializer(many=True)
+
+
+class StreamTicketSerializer(serializers.Serializer):
+    ticket = serializers.CharField()
+    expires_in = serializers.IntegerField()
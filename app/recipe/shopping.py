@@ -0,0 +1,63 @@
+"""
+Shopping lists: the ingredients of a set of recipes, merged.
+
+One statement selects the user's recipes among the requested ids once (so
+other users' recipes are never read) and returns both the per-ingredient
+recipe counts and a totals row, instead of a detail request per recipe.
+"""
+from decimal import Decimal
+
+from django.db import connection
+
+from core.models import Ingredient, Recipe
+from recipe import stats
+
+
+def _sql():
+    through, target = stats.through('ingredients')
+    return f'''
+        WITH picked AS (
+            SELECT id, price, time_minutes FROM {Recipe._meta.db_table}
+            WHERE user_id = %s AND id = ANY(%s)
+        )
+        SELECT link.{target}, ingredient.name, COUNT(*),
+               NULL::numeric, NULL::bigint, NULL::bigint[]
+        FROM picked
+        JOIN {through._meta.db_table} link ON link.recipe_id = picked.id
+        JOIN {Ingredient._meta.db_table} ingredient
+            ON ingredient.id = link.{target}
+        GROUP BY link.{target}, ingredient.name
+        UNION ALL
+        SELECT NULL, NULL, COUNT(*), SUM(price), SUM(time_minutes),
+               ARRAY_AGG(id)
+        FROM picked
+    '''
+
+
+def shopping_list(user, recipe_ids):
+    """The shopping list endpoint payload for the user's recipes among
+    `recipe_ids`; ids that aren't the user's recipes are in 'missing'."""
+    recipe_ids = sorted(set(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(), [user.id, recipe_ids])
+        rows = cursor.fetchall()
+
+    ingredients = []
+    found = []
+    data = {}
+    for pk, name, count, price, time_minutes, ids in rows:
+        if pk is None:
+            found = ids or []
+            data = {
+                'recipe_count': count,
+                'price': price or Decimal('0.00'),
+                'time_minutes': time_minutes or 0,
+            }
+        else:
+            ingredients.append({'id': pk, 'name': name, 'recipes': count})
+    ingredients.sort(key=lambda item: (-item['recipes'], item['name']))
+
+    found = set(found)
+    data['missing'] = [pk for pk in recipe_ids if pk not in found]
+    data['ingredients'] = ingredients
+    return data
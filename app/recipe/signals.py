@@ -0,0 +1,254 @@
+"""Keep recipe.stats, tag/ingredient usage counts and recipe.similarity
+signatures in step with recipe and link changes, and log every write in
+recipe.changes. Every such write first locks the owner's change sequence
+(`changes.lock()`), which orders the locks the receivers take. Delete
+receivers leave objects a recipe.deletion bulk delete accounts for
+alone."""
+import functools
+
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.models import Change, Recipe
+from recipe import autocomplete, changes, deletion, similarity, stats
+
+STATS_FIELDS = {'user', 'user_id', 'price', 'time_minutes'}
+
+
+def _values(recipe):
+    return recipe.price, recipe.time_minutes
+
+
+def per_object(receiver_):
+    """Skip `receiver_` for objects of users a bulk delete covers."""
+    @functools.wraps(receiver_)
+    def wrapper(sender, instance, **kwargs):
+        if not deletion.skipped(instance.user_id):
+            receiver_(sender, instance, **kwargs)
+    return wrapper
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_values(sender, instance, update_fields=None, **kwargs):
+    instance._stats_old = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not STATS_FIELDS & set(update_fields):
+        return
+    instance._stats_old = Recipe.objects.filter(pk=instance.pk) \
+        .values_list('user_id', 'price', 'time_minutes').first()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.recipe_changed(instance.user_id, new=_values(instance))
+        return
+
+    old = getattr(instance, '_stats_old', None)
+    if old is None:
+        return
+    old_user_id, *old_values = old
+    if old_user_id != instance.user_id:
+        stats.recipe_changed(old_user_id, old=tuple(old_values))
+        stats.recipe_changed(instance.user_id, new=_values(instance))
+    elif tuple(old_values) != _values(instance):
+        stats.recipe_changed(
+            instance.user_id, old=tuple(old_values), new=_values(instance)
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+@per_object
+def remember_recipe_links(sender, instance, **kwargs):
+    # Link rows are cascade deleted without m2m_changed.
+    instance._stats_links = {}
+    for relation in stats.RELATIONS:
+        through, target = stats.through(relation)
+        instance._stats_links[relation] = list(
+            through.objects.filter(recipe_id=instance.pk)
+            .values_list('recipe__user_id', target)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+@per_object
+def recipe_deleted(sender, instance, **kwargs):
+    stats.recipes_deleted(
+        [(instance.user_id, *_values(instance))],
+        getattr(instance, '_stats_links', {})
+    )
+
+
+def _remember_target_links(relation):
+    def receiver_(sender, instance, **kwargs):
+        through, target = stats.through(relation)
+        instance._stats_links = list(
+            through.objects.filter(**{target: instance.pk})
+            .values_list('recipe__user_id', target)
+        )
+    return receiver_
+
+
+def _target_deleted(relation):
+    def receiver_(sender, instance, **kwargs):
+        stats.links_changed(relation, getattr(instance, '_stats_links', []))
+    return receiver_
+
+
+def _links_changed(relation):
+    through, target = stats.through(relation)
+
+    def receiver_(sender, instance, action, reverse, pk_set, **kwargs):
+        if action in ('pre_remove', 'pre_clear'):
+            links = through.objects.filter(
+                **{target if reverse else 'recipe_id': instance.pk}
+            )
+            if pk_set is not None:
+                links = links.filter(
+                    **{f"{'recipe_id' if reverse else target}__in": pk_set}
+                )
+            instance._stats_pairs = list(
+                links.values_list('recipe__user_id', target)
+            )
+        elif action in ('post_remove', 'post_clear'):
+            pairs = getattr(instance, '_stats_pairs', [])
+            stats.links_changed(relation, pairs)
+            stats.usage_changed(relation, [pk for _, pk in pairs], -1)
+        elif action == 'post_add' and pk_set:
+            if reverse:
+                pairs = [
+                    (user_id, instance.pk) for user_id in
+                    Recipe.objects.filter(pk__in=pk_set)
+                    .values_list('user_id', flat=True)
+                ]
+            else:
+                pairs = [(instance.user_id, pk) for pk in pk_set]
+            stats.links_changed(relation, pairs)
+            stats.usage_changed(relation, [pk for _, pk in pairs], 1)
+
+    return receiver_
+
+
+def _link_receivers(relation):
+    """m2m_changed, pre_delete and post_delete receivers recomputing the
+    signatures of the recipes whose links change and logging the change."""
+    through, target = stats.through(relation)
+
+    def linked_recipes(instance):
+        return list(
+            through.objects.filter(**{target: instance.pk})
+            .values_list('recipe_id', flat=True)
+        )
+
+    def recipes_changed(recipe_ids, user_id=None):
+        similarity.update(recipe_ids)
+        changes.recipes_changed(recipe_ids, user_id)
+
+    def links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'pre_clear' and reverse:
+            instance._linked_recipes = linked_recipes(instance)
+        elif action == 'post_clear':
+            if reverse:
+                recipes_changed(getattr(instance, '_linked_recipes', []))
+            else:
+                recipes_changed([instance.pk], instance.user_id)
+        elif action in ('post_add', 'post_remove') and pk_set:
+            if reverse:
+                recipes_changed(pk_set)
+            else:
+                recipes_changed([instance.pk], instance.user_id)
+
+    def remember(sender, instance, **kwargs):
+        instance._linked_recipes = linked_recipes(instance)
+
+    def deleted(sender, instance, **kwargs):
+        recipes_changed(getattr(instance, '_linked_recipes', []))
+
+    return links_changed, remember, deleted
+
+
+def lock_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changes.lock(instance.user_id)
+
+
+def lock_deleted(sender, instance, **kwargs):
+    changes.lock(instance.user_id)
+
+
+def lock_links(sender, instance, action, **kwargs):
+    # Either side of a link belongs to the recipe's owner.
+    if action.startswith('pre_'):
+        changes.lock(instance.user_id)
+
+
+def log_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_stats_old', None)
+    if old is not None and old[0] != instance.user_id:
+        # Moved to another user: gone for the previous owner.
+        changes.record(
+            old[0], changes.kind(sender), [instance.pk], Change.DELETE
+        )
+    changes.record(
+        instance.user_id, changes.kind(sender), [instance.pk], Change.UPSERT
+    )
+
+
+def log_deleted(sender, instance, **kwargs):
+    changes.record(
+        instance.user_id, changes.kind(sender), [instance.pk], Change.DELETE
+    )
+
+
+def invalidate_autocomplete(sender, instance, **kwargs):
+    autocomplete.cache.invalidate(instance.user_id)
+
+
+# pre_* signals are sent before the write, so the lock is taken before the
+# row, its links and anything the post_* receivers below touch.
+for model in changes.MODELS.values():
+    pre_save.connect(lock_saved, sender=model)
+    pre_delete.connect(per_object(lock_deleted), sender=model, weak=False)
+for relation in stats.RELATIONS:
+    m2m_changed.connect(lock_links, sender=stats.through(relation)[0])
+
+for relation, model in stats.RELATIONS.items():
+    # Closures would be garbage collected with the default weak references.
+    pre_delete.connect(
+        per_object(_remember_target_links(relation)),
+        sender=model,
+        weak=False
+    )
+    post_delete.connect(
+        per_object(_target_deleted(relation)), sender=model, weak=False
+    )
+    m2m_changed.connect(
+        _links_changed(relation),
+        sender=stats.through(relation)[0],
+        weak=False
+    )
+
+    links_changed, remember, deleted = _link_receivers(relation)
+    m2m_changed.connect(
+        links_changed, sender=stats.through(relation)[0], weak=False
+    )
+    pre_delete.connect(per_object(remember), sender=model, weak=False)
+    post_delete.connect(per_object(deleted), sender=model, weak=False)
+
+    post_save.connect(invalidate_autocomplete, sender=model)
+    post_delete.connect(invalidate_autocomplete, sender=model)
+
+for model in changes.MODELS.values():
+    post_save.connect(log_saved, sender=model)
+    post_delete.connect(per_object(log_deleted), sender=model, weak=False)
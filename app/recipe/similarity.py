@@ -0,0 +1,236 @@
+"""
+Similar recipes by tag and ingredient overlap.
+
+Each recipe's set of tags and ingredients is summarised by a MinHash
+signature of PERMUTATIONS values: the share of positions two signatures
+agree on estimates the Jaccard similarity of the two sets. The signature
+is cut into BANDS bands of ROWS values and each band hashed to a bucket
+(locality sensitive hashing), stored with the signature in
+core.models.RecipeSignature under a GIN index. Recipes sharing at least one
+bucket are the candidates, so a lookup only scores recipes likely to be
+similar (above roughly (1 / BANDS) ** (1 / ROWS) = 0.5) instead of the
+whole collection.
+
+Signatures are computed with NumPy when it is installed: every hash of
+every feature of a batch of recipes in a few array operations, exact
+modulo the Mersenne prime in 64-bit integers, so they match the pure
+Python fallback bit for bit.
+
+Signatures follow link changes through recipe.signals. Writes that skip
+model signals must be followed by `rebuild()`, which
+`manage.py rebuild_recipe_signatures` runs; so must any change to the
+constants below.
+"""
+import hashlib
+import random
+import struct
+from itertools import chain
+
+from django.db import connection, transaction
+
+from core.models import Recipe, RecipeSignature
+from recipe import stats
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+
+# Hash functions (a * x + b) mod PRIME, from a fixed seed so signatures
+# are comparable across processes and deployments.
+PRIME = (1 << 61) - 1
+_random = random.Random(20240512)
+_HASHES = [
+    (_random.randrange(1, PRIME), _random.randrange(PRIME))
+    for _ in range(PERMUTATIONS)
+]
+_SIGNATURE = struct.Struct(f'>{PERMUTATIONS}Q')
+_BANDS = [struct.pack('>H', band) for band in range(BANDS)]
+
+if numpy is not None:
+    _PRIME = numpy.uint64(PRIME)
+    _LOW = numpy.uint64((1 << 32) - 1)
+    _A_HIGH = numpy.array([a >> 32 for a, _ in _HASHES], dtype=numpy.uint64)
+    _A_LOW = numpy.array([a & (1 << 32) - 1 for a, _ in _HASHES],
+                         dtype=numpy.uint64)
+    _B = numpy.array([b for _, b in _HASHES], dtype=numpy.uint64)
+
+
+def features(recipe_ids):
+    """Map recipe id -> set of feature numbers: each tag and ingredient id,
+    tagged with its relation so a tag and an ingredient never collide."""
+    quote = connection.ops.quote_name
+    queries = []
+    for kind, relation in enumerate(stats.RELATIONS):
+        through, target = stats.through(relation)
+        queries.append(
+            f'SELECT recipe_id, {quote(target)} * {len(stats.RELATIONS)}'
+            f' + {kind} FROM {quote(through._meta.db_table)}'
+            f' WHERE recipe_id = ANY(%s)'
+        )
+    # One round trip and no model layer: this runs over every recipe when
+    # rebuilding.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            ' UNION ALL '.join(queries), [list(recipe_ids)] * len(queries)
+        )
+        result = {}
+        for recipe_id, feature in cursor.fetchall():
+            result.setdefault(recipe_id, set()).add(feature)
+    return result
+
+
+def _fold(values):
+    """A number below 2 ** 61 + 8 congruent to `values` (uint64, updated
+    in place) modulo PRIME: 2 ** 61 is 1 modulo PRIME."""
+    high = values >> numpy.uint64(61)
+    values &= _PRIME
+    values += high
+    return values
+
+
+def _hash(features):
+    """(a * x + b) % PRIME of every feature x (a column) and hash (a row),
+    from 32-bit halves so no product overflows 64 bits."""
+    features = _fold(features.copy())
+    high = features >> numpy.uint64(32)
+    low = features & _LOW
+
+    result = _fold(low * _A_LOW)
+    result += _B
+    # The middle terms times 2 ** 32: rotate the 61-bit residue.
+    middle = _fold(high * _A_LOW + low * _A_HIGH)
+    result += middle >> numpy.uint64(29)
+    middle &= numpy.uint64((1 << 29) - 1)
+    middle <<= numpy.uint64(32)
+    result += middle
+    if high.any():
+        # 2 ** 64 is 8 modulo PRIME.
+        result += _fold(high * _A_HIGH * numpy.uint64(8))
+    _fold(result)
+    result[result >= _PRIME] -= _PRIME
+    return result
+
+
+def signatures(feature_sets):
+    """Map each key of `feature_sets` (key -> non-empty set of feature
+    numbers) to the MinHash signature of its set."""
+    if numpy is None or not feature_sets:
+        return {
+            key: [
+                min((a * x + b) % PRIME for x in feature_set)
+                for a, b in _HASHES
+            ]
+            for key, feature_set in feature_sets.items()
+        }
+
+    sizes = [len(feature_set) for feature_set in feature_sets.values()]
+    features = numpy.fromiter(
+        chain.from_iterable(feature_sets.values()),
+        dtype=numpy.uint64, count=sum(sizes)
+    )
+    starts = numpy.cumsum([0] + sizes[:-1])
+    minima = numpy.minimum.reduceat(_hash(features[:, None]), starts, axis=0)
+    return dict(zip(feature_sets, minima.tolist()))
+
+
+def signature(feature_set):
+    return signatures({None: feature_set})[None]
+
+
+def buckets(values):
+    packed = _SIGNATURE.pack(*values)
+    width = ROWS * 8
+    return [
+        int.from_bytes(hashlib.blake2b(
+            prefix + packed[band * width:(band + 1) * width], digest_size=8
+        ).digest(), 'big', signed=True)
+        for band, prefix in enumerate(_BANDS)
+    ]
+
+
+def estimate(values, other):
+    """Estimated Jaccard similarity of the sets behind two signatures."""
+    return sum(a == b for a, b in zip(values, other)) / PERMUTATIONS
+
+
+def compute(recipe_ids):
+    """(recipe id, signature, buckets) of each of `recipe_ids` that has
+    tags or ingredients."""
+    return [
+        (recipe_id, values, buckets(values))
+        for recipe_id, values in signatures(features(recipe_ids)).items()
+    ]
+
+
+def update(recipe_ids):
+    """Recompute the signatures of `recipe_ids`; recipes without tags or
+    ingredients (or that no longer exist) are left without one."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return 0
+    rows = [
+        RecipeSignature(
+            recipe_id=recipe_id, signature=values, buckets=recipe_buckets
+        )
+        for recipe_id, values, recipe_buckets in compute(recipe_ids)
+    ]
+
+    with transaction.atomic():
+        RecipeSignature.objects.filter(recipe_id__in=recipe_ids).delete()
+        RecipeSignature.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild(user_ids=None, chunk_size=1000):
+    """Recompute the signatures of every recipe of `user_ids` (of every
+    user by default). Returns the number of signatures written."""
+    recipes = Recipe.objects.order_by('id')
+    if user_ids is not None:
+        recipes = recipes.filter(user_id__in=user_ids)
+    recipe_ids = list(recipes.values_list('id', flat=True))
+
+    written = 0
+    for start in range(0, len(recipe_ids), chunk_size):
+        written += update(recipe_ids[start:start + chunk_size])
+    return written
+
+
+def similar(recipe, limit):
+    """Up to `limit` {'id', 'title', 'similarity'} dicts for the recipes
+    of the same user most similar to `recipe`, best first."""
+    own = RecipeSignature.objects.filter(recipe=recipe) \
+        .values_list('signature', 'buckets').first()
+    if own is None:
+        update([recipe.pk])
+        own = RecipeSignature.objects.filter(recipe=recipe) \
+            .values_list('signature', 'buckets').first()
+        if own is None:
+            return []
+    values, own_buckets = own
+
+    # Filtering by user here would let the planner walk all of the user's
+    # recipes instead of the bucket index; ownership is checked on the
+    # titles query below (feature ids are per user, so other users'
+    # recipes only collide by hash accident).
+    candidates = RecipeSignature.objects.filter(buckets__overlap=own_buckets) \
+        .exclude(recipe_id=recipe.pk).values_list('recipe_id', 'signature')
+    scored = sorted(
+        ((estimate(values, other), pk) for pk, other in candidates),
+        key=lambda item: (-item[0], -item[1])
+    )[:limit]
+    titles = dict(
+        Recipe.objects.filter(
+            user_id=recipe.user_id, id__in=[pk for _, pk in scored]
+        ).values_list('id', 'title')
+    ) if scored else {}
+
+    return [
+        {'id': pk, 'title': titles[pk], 'similarity': score}
+        for score, pk in scored
+        if pk in titles
+    ]
@@ -0,0 +1,247 @@
+"""
+Per-user recipe statistics, maintained incrementally.
+
+Every recipe save/delete applies a delta to the user's
+core.models.RecipeStats row (see recipe.signals, and recipe.deletion for
+bulk deletes), in the same transaction as the change and under a row
+lock, so reading the stats costs the same however many recipes the user
+has. Writes that skip model signals (bulk_create, COPY, raw SQL) must be
+followed by `rebuild()`, which `manage.py rebuild_recipe_stats` runs.
+
+A user without a stats row gets one built from their recipes the first
+time it is needed.
+
+Tag.usage_count and Ingredient.usage_count are kept the same way, with
+`F()` increments, and recomputed in bulk by `recount_usage()`
+(`manage.py repair_usage_counts`). They double as the per-tag and
+per-ingredient counts behind the top tags and ingredients, read through
+the (user, -usage_count, name) indexes, so a link change updates one row
+per target rather than a per-user map of every target.
+"""
+import bisect
+import contextlib
+import uuid
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import (
+    Count, F, IntegerField, OuterRef, Q, Subquery, Sum
+)
+from django.db.models.functions import Coalesce
+
+from core.models import Recipe, RecipeStats, Tag, Ingredient
+
+# Upper bounds (inclusive) of the time_minutes buckets; the last bucket is
+# everything above the last bound.
+TIME_BUCKETS = [15, 30, 60, 120]
+
+# recipe relation -> target model
+RELATIONS = {
+    'tags': Tag,
+    'ingredients': Ingredient,
+}
+
+
+def time_bucket(minutes):
+    return bisect.bisect_left(TIME_BUCKETS, minutes)
+
+
+def through(relation):
+    """The through model of a recipe relation and its target id column."""
+    field = Recipe._meta.get_field(relation)
+    return field.remote_field.through, f'{field.m2m_reverse_field_name()}_id'
+
+
+def rebuild(user_ids=None):
+    """Recompute the stats of `user_ids` (every user by default) from
+    their recipes. Returns the number of stats rows written."""
+    users = get_user_model().objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    recipes = Recipe.objects.filter(user__in=users)
+
+    buckets = []
+    lower = None
+    for upper in TIME_BUCKETS + [None]:
+        condition = Q()
+        if lower is not None:
+            condition &= Q(time_minutes__gt=lower)
+        if upper is not None:
+            condition &= Q(time_minutes__lte=upper)
+        buckets.append(Count('id', filter=condition))
+        lower = upper
+
+    rows = {}
+    totals = recipes.values('user_id').order_by().annotate(
+        count=Count('id'),
+        price=Sum('price'),
+        time=Sum('time_minutes'),
+        **{f'bucket{i}': bucket for i, bucket in enumerate(buckets)}
+    )
+    for total in totals:
+        rows[total['user_id']] = RecipeStats(
+            user_id=total['user_id'],
+            recipe_count=total['count'],
+            price_total=total['price'] or 0,
+            time_minutes_total=total['time'] or 0,
+            time_minutes_histogram=[
+                total[f'bucket{i}'] for i in range(len(buckets))
+            ],
+        )
+
+    with transaction.atomic():
+        if user_ids is None:
+            RecipeStats.objects.all().delete()
+        else:
+            RecipeStats.objects.filter(user_id__in=user_ids).delete()
+        RecipeStats.objects.bulk_create(rows.values(), batch_size=1000)
+
+    return len(rows)
+
+
+@contextlib.contextmanager
+def locked(user_id, create=True):
+    """Yield the user's stats row locked for update and save it after the
+    block. Without a row, one is rebuilt from the database (which already
+    reflects the change being recorded) and the block is skipped; with
+    `create=False` nothing happens at all."""
+    with transaction.atomic():
+        stats = RecipeStats.objects.select_for_update() \
+            .filter(user_id=user_id).first()
+        if stats is None:
+            if create:
+                rebuild([user_id])
+            yield None
+            return
+
+        yield stats
+        stats.save()
+
+
+def _apply_recipe(stats, price, time_minutes, sign):
+    histogram = stats.time_minutes_histogram
+    histogram.extend([0] * (len(TIME_BUCKETS) + 1 - len(histogram)))
+    stats.recipe_count += sign
+    stats.price_total += sign * Decimal(str(price))
+    stats.time_minutes_total += sign * time_minutes
+    histogram[time_bucket(time_minutes)] += sign
+
+
+def recipe_changed(user_id, old=None, new=None, create=True):
+    """Move a recipe's (price, time_minutes) from `old` to `new`; either
+    is None for a created or deleted recipe."""
+    with locked(user_id, create) as stats:
+        if stats is None:
+            return
+        if old is not None:
+            _apply_recipe(stats, *old, sign=-1)
+        if new is not None:
+            _apply_recipe(stats, *new, sign=1)
+
+
+def recipes_deleted(recipes, links):
+    """Take deleted `recipes`, (user id, price, time_minutes) tuples, out
+    of their owners' stats and the {relation: [(user id, target id)]}
+    `links` they had out of the usage counts."""
+    by_user = defaultdict(list)
+    for user_id, *values in recipes:
+        by_user[user_id].append(values)
+
+    for user_id, deleted in by_user.items():
+        # A missing row is rebuilt, without these recipes, when needed.
+        with locked(user_id, create=False) as stats:
+            if stats is None:
+                continue
+            for values in deleted:
+                _apply_recipe(stats, *values, sign=-1)
+
+    for relation, pairs in links.items():
+        links_changed(relation, pairs)
+        usage_changed(relation, [pk for _, pk in pairs], -1)
+
+
+def links_changed(relation, pairs):
+    """Note that (user id, target id) links of `relation` were added or
+    removed: ingredient links invalidate the users' cookable indexes."""
+    user_ids = {user_id for user_id, _ in pairs}
+    if relation == 'ingredients' and user_ids:
+        RecipeStats.objects.filter(user_id__in=user_ids) \
+            .update(ingredients_version=uuid.uuid4())
+
+
+def usage_changed(relation, target_ids, sign):
+    """Add `sign` to the usage count of each target, once per occurrence
+    in `target_ids`."""
+    model = RELATIONS[relation]
+    by_delta = defaultdict(list)
+    for target_id, n in Counter(target_ids).items():
+        by_delta[sign * n].append(target_id)
+
+    for delta, ids in by_delta.items():
+        model.objects.filter(id__in=ids).update(
+            usage_count=F('usage_count') + delta
+        )
+
+
+def recount_usage(relations=None):
+    """Recompute usage counts from the link tables in one UPDATE per
+    relation. Returns the number of rows updated."""
+    updated = 0
+    for relation in relations or RELATIONS:
+        model = RELATIONS[relation]
+        through_model, target = through(relation)
+        links = through_model.objects.filter(**{target: OuterRef('pk')}) \
+            .order_by().values(target).annotate(n=Count('id')).values('n')
+        updated += model.objects.update(usage_count=Coalesce(
+            Subquery(links, output_field=IntegerField()), 0
+        ))
+    return updated
+
+
+def ingredients_version(user_id):
+    """The user's current ingredient links version, building the stats row
+    if needed."""
+    current = RecipeStats.objects.filter(user_id=user_id) \
+        .values_list('ingredients_version', flat=True).first()
+    if current is None:
+        rebuild([user_id])
+        current = RecipeStats.objects.filter(user_id=user_id) \
+            .values_list('ingredients_version', flat=True).first()
+    return current
+
+
+def summary(user, top=5):
+    """The stats endpoint payload for `user`."""
+    stats = RecipeStats.objects.filter(user=user).first()
+    if stats is None:
+        rebuild([user.id])
+        stats = RecipeStats.objects.filter(user=user).first() or \
+            RecipeStats(user=user)
+
+    count = stats.recipe_count
+    histogram = list(stats.time_minutes_histogram)
+    histogram.extend([0] * (len(TIME_BUCKETS) + 1 - len(histogram)))
+
+    data = {
+        'recipe_count': count,
+        'average_price': stats.price_total / count if count else None,
+        'average_time_minutes': (
+            round(stats.time_minutes_total / count, 1) if count else None
+        ),
+        'time_minutes_distribution': [
+            {'max_minutes': upper, 'count': n}
+            for upper, n in zip(TIME_BUCKETS + [None], histogram)
+        ],
+    }
+    for relation, model in RELATIONS.items():
+        ranked = model.objects.filter(user=user, usage_count__gt=0) \
+            .order_by('-usage_count', 'name') \
+            .values_list('id', 'name', 'usage_count')[:top]
+        data[f'top_{relation}'] = [
+            {'id': pk, 'name': name, 'recipes': n}
+            for pk, name, n in ranked
+        ]
+
+    return data
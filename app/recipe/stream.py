@@ -0,0 +1,333 @@
+"""
+Server-sent events stream of recipe.changes notifications.
+
+GET CHANGES_STREAM_PATH is answered by app.asgi outside Django's request
+handling (and so outside its middleware), under an ASGI server such as
+`uvicorn app.asgi:application` that serves nothing else: Django 3.2 runs
+the sync views of ASGI requests one at a time on a shared thread, so the
+API stays on the threaded WSGI server and a proxy routes the stream path
+to the ASGI one. It is authenticated by `Authorization:
+Token <key>`, or for EventSource, which can't set headers, by
+`?ticket=<ticket>` from POST changes/stream/ticket/: a signed user id valid
+for CHANGES_STREAM_TICKET_MAX_AGE seconds, so the URLs that end up in
+proxy and access logs never carry an API token. The stream sends a
+`change` event whose id and data are the user's latest change cursor
+whenever a write to their recipes, tags or ingredients commits, and on
+connect unless `Last-Event-ID` (or `?since=`) is already that cursor;
+clients then read the changes endpoint from their own cursor instead of
+polling it. Events are coalesced, so a slow client only gets
+the latest cursor.
+
+recipe.changes NOTIFYs CHANGES_NOTIFY_CHANNEL as part of every logged
+write. Each process has one `Hub`, which LISTENs on its own database
+connection, read from the event loop whenever its socket is readable, and
+wakes the streams of the user named by each notification. A stream is a
+coroutine waiting on an asyncio.Event, so an idle one costs some memory
+and no thread; one ticker wakes them all for keep-alives. Should the
+listening connection drop, the hub reconnects and sends every stream its
+user's current cursor, covering notifications sent in between.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import close_old_connections, connections
+
+from rest_framework.exceptions import AuthenticationFailed  # type: ignore
+
+from core import metrics
+from core.authentication import TokenAuthentication
+from core.models import ChangeSequence
+from recipe import changes
+
+logger = logging.getLogger(__name__)
+
+TICKET_SALT = 'recipe.stream.ticket'
+
+HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    # Stops nginx from buffering the stream.
+    (b'x-accel-buffering', b'no'),
+]
+
+
+class Subscriber:
+    """One stream's latest known cursor of its user. `changed` is also
+    set by the hub's keep-alive ticks and when the client disconnects."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.cursor = None
+        self.closed = False
+        self.changed = asyncio.Event()
+
+    def notify(self, cursor):
+        if self.cursor is None or cursor > self.cursor:
+            self.cursor = cursor
+            self.changed.set()
+
+    def close(self):
+        self.closed = True
+        self.changed.set()
+
+
+class Hub:
+    """The process's listener and the streams it wakes."""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.count = 0
+        self._tasks = []
+
+    def subscribe(self, user_id):
+        if not self._tasks or any(task.done() for task in self._tasks):
+            for task in self._tasks:
+                task.cancel()
+            loop = asyncio.get_running_loop()
+            self._tasks = [
+                loop.create_task(self._listen()),
+                loop.create_task(self._tick()),
+            ]
+        subscriber = Subscriber(user_id)
+        self.subscribers[user_id].add(subscriber)
+        self.count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        streams = self.subscribers[subscriber.user_id]
+        streams.discard(subscriber)
+        if not streams:
+            del self.subscribers[subscriber.user_id]
+        self.count -= 1
+
+    def publish(self, user_id, cursor):
+        for subscriber in self.subscribers.get(user_id, ()):
+            subscriber.notify(cursor)
+
+    async def _tick(self):
+        """Wake every stream each CHANGES_STREAM_HEARTBEAT seconds; those
+        without news send a keep-alive comment."""
+        while True:
+            await asyncio.sleep(settings.CHANGES_STREAM_HEARTBEAT)
+            for streams in list(self.subscribers.values()):
+                for subscriber in streams:
+                    subscriber.changed.set()
+
+    def _connect(self):
+        params = connections['default'].get_connection_params()
+        # Notice a dead server within a minute or so even while idle.
+        params.setdefault('keepalives_idle', 30)
+        params.setdefault('keepalives_interval', 10)
+        params.setdefault('keepalives_count', 3)
+        conn = psycopg2.connect(**params)
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL('LISTEN {}').format(
+                sql.Identifier(settings.CHANGES_NOTIFY_CHANNEL)
+            ))
+        return conn
+
+    def _read(self, conn):
+        conn.poll()
+        for notify in conn.notifies:
+            user_id, _, cursor = notify.payload.partition(':')
+            self.publish(int(user_id), int(cursor))
+        conn.notifies.clear()
+
+    async def _catch_up(self):
+        def cursors(user_ids):
+            try:
+                return list(
+                    ChangeSequence.objects.filter(user_id__in=user_ids)
+                    .values_list('user_id', 'last_seq')
+                )
+            finally:
+                close_old_connections()
+
+        rows = await sync_to_async(cursors, thread_sensitive=False)(
+            list(self.subscribers)
+        )
+        for user_id, cursor in rows:
+            self.publish(user_id, cursor)
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                conn = await loop.run_in_executor(None, self._connect)
+            except psycopg2.Error:
+                logger.exception('change listener could not connect')
+                await asyncio.sleep(settings.CHANGES_STREAM_RECONNECT)
+                continue
+
+            lost = loop.create_future()
+
+            def readable():
+                try:
+                    self._read(conn)
+                except psycopg2.Error as error:
+                    if not lost.done():
+                        lost.set_exception(error)
+
+            fileno = conn.fileno()
+            loop.add_reader(fileno, readable)
+            try:
+                await self._catch_up()
+                await lost
+            except psycopg2.Error:
+                logger.exception('change listener lost its connection')
+            finally:
+                loop.remove_reader(fileno)
+                conn.close()
+            await asyncio.sleep(settings.CHANGES_STREAM_RECONNECT)
+
+
+hub = Hub()
+
+
+def make_ticket(user):
+    """A ticket opening `user`'s stream until it expires."""
+    return signing.dumps(user.pk, salt=TICKET_SALT)
+
+
+def _credentials(scope):
+    """The (key, ticket) of the request, either of them empty, and its
+    last seen cursor."""
+    headers = dict(scope['headers'])
+    query = parse_qs(scope.get('query_string', b'').decode())
+    scheme, _, key = headers.get(b'authorization', b'').decode() \
+        .partition(' ')
+    if scheme.lower() != 'token':
+        key = ''
+    since = headers.get(b'last-event-id', b'').decode() or \
+        query.get('since', [''])[0]
+    try:
+        since = int(since)
+    except ValueError:
+        since = None
+    return key.strip(), query.get('ticket', [''])[0], since
+
+
+def _authenticate(key, ticket):
+    """The user of the token `key` or else of `ticket`, None if neither is
+    valid."""
+    try:
+        if key:
+            user, _ = TokenAuthentication().authenticate_credentials(key)
+            return user
+        user_id = signing.loads(
+            ticket,
+            salt=TICKET_SALT,
+            max_age=settings.CHANGES_STREAM_TICKET_MAX_AGE
+        )
+        return get_user_model().objects \
+            .filter(pk=user_id, is_active=True).first()
+    except (AuthenticationFailed, signing.BadSignature):
+        return None
+    finally:
+        close_old_connections()
+
+
+def _cursor(user):
+    try:
+        return changes.current_cursor(user)
+    finally:
+        close_old_connections()
+
+
+async def _respond(send, status, detail, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps({'detail': detail}).encode(),
+    })
+
+
+async def _disconnected(receive, subscriber):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+    subscriber.close()
+
+
+def _event(cursor):
+    return f'id: {cursor}\nevent: change\ndata: {cursor}\n\n'.encode()
+
+
+async def stream(scope, receive, send):
+    if scope['method'] != 'GET':
+        await _respond(send, 405, 'Method not allowed.', [(b'allow', b'GET')])
+        return
+    key, ticket, sent = _credentials(scope)
+    user = None
+    if key or ticket:
+        user = await sync_to_async(_authenticate, thread_sensitive=False)(
+            key, ticket
+        )
+    if user is None:
+        await _respond(send, 401, 'Invalid token or ticket.')
+        return
+    retry_after = [(b'retry-after', b'%d' % settings.ADMISSION_RETRY_AFTER)]
+    if hub.count >= settings.CHANGES_STREAM_MAX_CONNECTIONS:
+        await _respond(send, 503, 'Server busy, try again later.', retry_after)
+        return
+    if len(hub.subscribers.get(user.id, ())) >= \
+            settings.CHANGES_STREAM_MAX_PER_USER:
+        await _respond(send, 429, 'Too many open streams.', retry_after)
+        return
+
+    # Subscribed before reading the cursor, so a change committing in
+    # between is published to this stream rather than to nobody.
+    subscriber = hub.subscribe(user.id)
+    disconnected = asyncio.ensure_future(_disconnected(receive, subscriber))
+    metrics.CHANGE_STREAMS.inc()
+    try:
+        subscriber.notify(
+            await sync_to_async(_cursor, thread_sensitive=False)(user)
+        )
+        await send({
+            'type': 'http.response.start', 'status': 200, 'headers': HEADERS
+        })
+        while True:
+            await subscriber.changed.wait()
+            subscriber.changed.clear()
+            if subscriber.closed:
+                break
+
+            if sent is None or subscriber.cursor > sent:
+                sent = subscriber.cursor
+                body = _event(sent)
+            else:
+                body = b': keep-alive\n\n'
+            await send({
+                'type': 'http.response.body', 'body': body, 'more_body': True
+            })
+    finally:
+        metrics.CHANGE_STREAMS.dec()
+        disconnected.cancel()
+        hub.unsubscribe(subscriber)
+
+
+async def application(scope, receive, send):
+    """ASGI application answering the stream path and 404 to anything
+    else, which is for the WSGI server."""
+    if scope['type'] != 'http':
+        return
+    if scope['path'] != settings.CHANGES_STREAM_PATH:
+        await _respond(send, 404, 'Not found.')
+        return
+    await stream(scope, receive, send)
@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core.models import Ingredient, Tag
+from recipe import autocomplete
+
+TAGS_URL = reverse('recipe:tag-autocomplete')
+INGREDIENTS_URL = reverse('recipe:ingredient-autocomplete')
+
+
+class PublicAutocompleteApiTests(TestCase):
+    def test_auth_required(self):
+        res = APIClient().get(TAGS_URL, {'q': 'a'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateAutocompleteApiTests(TestCase):
+    def setUp(self):
+        autocomplete.cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def names(self, url=TAGS_URL, **params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in res.json()]
+
+    def test_prefix_matches_ranked_by_usage(self):
+        for name, usage in [('Vegan', 1), ('vegetarian', 5), ('veal', 0),
+                            ('spicy', 9)]:
+            Tag.objects.create(user=self.user, name=name, usage_count=usage)
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        Tag.objects.create(user=other, name='vegan')
+
+        self.assertEqual(
+            self.names(q='VE'), ['vegetarian', 'Vegan', 'veal']
+        )
+
+    def test_fuzzy_matches_follow_prefix_matches(self):
+        for name in ['nuts', 'nutmeg', 'coconut', 'peanuts', 'rice']:
+            Ingredient.objects.create(user=self.user, name=name)
+
+        names = self.names(INGREDIENTS_URL, q='nut')
+
+        self.assertEqual(names[:2], ['nutmeg', 'nuts'])
+        self.assertEqual(set(names[2:]), {'coconut', 'peanuts'})
+
+    def test_short_query_prefix_only(self):
+        Tag.objects.create(user=self.user, name='xa')
+        Tag.objects.create(user=self.user, name='ax')
+
+        self.assertEqual(self.names(q='a'), ['ax'])
+
+    def test_limit(self):
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'tag {i}')
+
+        self.assertEqual(len(self.names(q='tag', limit=2)), 2)
+        self.assertEqual(self.names(q=''), [])
+
+    def test_results_cached(self):
+        Tag.objects.create(user=self.user, name='vegan')
+        self.names(q='veg')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(q='veg'), ['vegan'])
+
+    def test_cache_invalidated_by_writes(self):
+        Tag.objects.create(user=self.user, name='vegan')
+        self.names(q='veg')
+
+        Tag.objects.create(user=self.user, name='veggie')
+
+        self.assertEqual(self.names(q='veg'), ['vegan', 'veggie'])
@@ -0,0 +1,188 @@
+import asyncio
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from app.asgi import application
+from core.models import Tag
+from recipe import stream
+
+TIMEOUT = 10
+
+
+class StreamClient:
+    """Drives one stream request through the ASGI application."""
+
+    def __init__(self, headers=(), query='', path=None):
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        self.task = asyncio.ensure_future(application({
+            'type': 'http',
+            'method': 'GET',
+            'path': path or settings.CHANGES_STREAM_PATH,
+            'headers': list(headers),
+            'query_string': query.encode(),
+        }, self.inbox.get, self.outbox.put))
+
+    async def message(self):
+        return await asyncio.wait_for(self.outbox.get(), TIMEOUT)
+
+    async def body(self):
+        return (await self.message())['body']
+
+    async def close(self):
+        await self.inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, TIMEOUT)
+
+
+def create_tag(user, name):
+    try:
+        Tag.objects.create(user=user, name=name)
+    finally:
+        connection.close()
+
+
+class ChangeStreamTests(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.token = Token.objects.create(user=self.user).key
+        self.ticket = stream.make_ticket(self.user)
+
+    def status(self, **kwargs):
+        async def run():
+            client = StreamClient(**kwargs)
+            start = await client.message()
+            if start['status'] == 200:
+                await client.close()
+            else:
+                await client.task
+            return start['status']
+
+        return asyncio.run(run())
+
+    def test_auth_required(self):
+        self.assertEqual(self.status(), 401)
+        self.assertEqual(self.status(query='ticket=wrong'), 401)
+        # API tokens in URLs end up in logs.
+        self.assertEqual(self.status(query=f'token={self.token}'), 401)
+
+    def test_only_stream_served(self):
+        # The API is served over WSGI; see app.asgi.
+        status = self.status(
+            path='/api/recipe/recipes/', query=f'ticket={self.ticket}'
+        )
+
+        self.assertEqual(status, 404)
+
+    def test_ticket(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.post(reverse('recipe:stream-ticket'))
+
+        self.assertEqual(
+            self.status(query=f"ticket={res.data['ticket']}"), 200
+        )
+        with override_settings(CHANGES_STREAM_TICKET_MAX_AGE=-1):
+            self.assertEqual(self.status(query=f'ticket={self.ticket}'), 401)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.status(query=f'ticket={self.ticket}'), 401)
+
+    def test_notified_on_commit(self):
+        async def run():
+            client = StreamClient(
+                headers=[(b'authorization', f'Token {self.token}'.encode())]
+            )
+            start = await client.message()
+            self.assertEqual(start['status'], 200)
+            self.assertEqual(
+                await client.body(), b'id: 0\nevent: change\ndata: 0\n\n'
+            )
+
+            await sync_to_async(create_tag)(self.user, 'dinner')
+            self.assertEqual(
+                await client.body(), b'id: 1\nevent: change\ndata: 1\n\n'
+            )
+            await client.close()
+
+        asyncio.run(run())
+        self.assertEqual(stream.hub.count, 0)
+
+    def test_subscribed_before_cursor_read(self):
+        subscribed = []
+
+        def cursor(user):
+            # A change committing now must reach the stream.
+            subscribed.append(user.id in stream.hub.subscribers)
+            return 0
+
+        async def run():
+            client = StreamClient(
+                headers=[(b'authorization', f'Token {self.token}'.encode())]
+            )
+            await client.message()
+            await client.body()
+            await client.close()
+
+        with patch.object(stream, '_cursor', cursor):
+            asyncio.run(run())
+        self.assertEqual(subscribed, [True])
+
+    @override_settings(CHANGES_STREAM_HEARTBEAT=0.1)
+    def test_resumed_at_last_event_id(self):
+        Tag.objects.create(user=self.user, name='dinner')
+
+        async def run():
+            client = StreamClient(
+                headers=[(b'last-event-id', b'1')],
+                query=f'ticket={stream.make_ticket(self.user)}'
+            )
+            await client.message()
+            body = await client.body()
+            await client.close()
+            return body
+
+        self.assertEqual(asyncio.run(run()), b': keep-alive\n\n')
+
+    @override_settings(CHANGES_STREAM_MAX_PER_USER=1)
+    def test_streams_per_user_limited(self):
+        async def run():
+            first = StreamClient(query=f'ticket={self.ticket}')
+            await first.message()
+            second = StreamClient(query=f'ticket={self.ticket}')
+            start = await second.message()
+            await first.close()
+            return start['status']
+
+        self.assertEqual(asyncio.run(run()), 429)
+
+
+class HubTests(SimpleTestCase):
+    def test_publish_coalesced_per_user(self):
+        async def run():
+            hub = stream.Hub()
+            mine, other = stream.Subscriber(1), stream.Subscriber(2)
+            hub.subscribers[1].add(mine)
+            hub.subscribers[2].add(other)
+
+            hub.publish(1, 3)
+            hub.publish(1, 5)
+            hub.publish(1, 4)
+
+            self.assertTrue(mine.changed.is_set())
+            self.assertEqual(mine.cursor, 5)
+            self.assertFalse(other.changed.is_set())
+
+        asyncio.run(run())
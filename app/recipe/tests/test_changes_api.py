@@ -0,0 +1,241 @@
+import io
+import threading
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core.models import Change, ChangeSequence, Ingredient, Recipe, Tag
+from recipe import changes
+
+CHANGES_URL = reverse('recipe:changes')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(name, pk):
+    return reverse(f'recipe:{name}-detail', args=[pk])
+
+
+class PublicChangesApiTests(TestCase):
+    def test_auth_required(self):
+        res = APIClient().get(CHANGES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateChangesApiTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def changes(self, since, **params):
+        res = self.client.get(CHANGES_URL, {'since': since, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.json()
+
+    def summary(self, since):
+        return [
+            (item['kind'], item['op'], (item['data'] or {}).get('name')
+             or (item['data'] or {}).get('title'))
+            for item in self.changes(since)['changes']
+        ]
+
+    def create_recipe(self):
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Soup',
+            'time_minutes': 20,
+            'price': '4.50',
+            'tags': [{'name': 'dinner'}],
+            'ingredients': [{'name': 'leek'}],
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return Recipe.objects.get(pk=res.data['id'])
+
+    def test_cursor_without_since(self):
+        self.assertEqual(self.client.get(CHANGES_URL).json()['cursor'], 0)
+        self.create_recipe()
+
+        res = self.client.get(CHANGES_URL).json()
+
+        self.assertEqual(res['changes'], [])
+        self.assertEqual(res['cursor'], self.changes(0)['cursor'])
+
+    def test_writes_logged_once_per_object(self):
+        recipe = self.create_recipe()
+
+        res = self.changes(0)
+
+        self.assertEqual(
+            [(item['kind'], item['op']) for item in res['changes']],
+            [('tag', 'upsert'), ('ingredient', 'upsert'),
+             ('recipe', 'upsert')]
+        )
+        data = res['changes'][-1]['data']
+        self.assertEqual(data['id'], recipe.id)
+        self.assertEqual(data['price'], '4.50')
+        self.assertEqual(data['tags'][0]['name'], 'dinner')
+        self.assertFalse(res['more'])
+        self.assertEqual(self.changes(res['cursor'])['changes'], [])
+
+    def test_tag_rename_and_delete(self):
+        recipe = self.create_recipe()
+        tag = recipe.tags.get()
+        cursor = self.changes(0)['cursor']
+
+        self.client.patch(detail_url('tag', tag.id), {'name': 'supper'})
+        self.assertEqual(self.summary(cursor), [('tag', 'upsert', 'supper')])
+
+        self.client.delete(detail_url('tag', tag.id))
+        res = self.changes(cursor)
+        self.assertEqual(
+            [(item['kind'], item['id'], item['op'])
+             for item in res['changes']],
+            [('recipe', recipe.id, 'upsert'), ('tag', tag.id, 'delete')]
+        )
+        self.assertEqual(res['changes'][0]['data']['tags'], [])
+
+    def test_recipe_deleted(self):
+        recipe = self.create_recipe()
+        cursor = self.changes(0)['cursor']
+
+        self.client.delete(detail_url('recipe', recipe.id))
+
+        self.assertEqual(self.summary(cursor), [('recipe', 'delete', None)])
+        # Created and deleted since: only the tombstone is left.
+        self.assertEqual(self.summary(0)[-1], ('recipe', 'delete', None))
+
+    def test_paged_with_limit(self):
+        for i in range(3):
+            Tag.objects.create(user=self.user, name=f'tag {i}')
+
+        first = self.changes(0, limit=2)
+        second = self.changes(first['cursor'], limit=2)
+
+        self.assertTrue(first['more'])
+        self.assertFalse(second['more'])
+        self.assertEqual(
+            [item['data']['name']
+             for item in first['changes'] + second['changes']],
+            ['tag 0', 'tag 1', 'tag 2']
+        )
+
+    def test_rolled_back_writes_not_logged(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Tag.objects.create(user=self.user, name='gone')
+            raise RuntimeError()
+
+        self.assertEqual(self.changes(0)['changes'], [])
+
+    def test_other_users_changes_excluded(self):
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        Tag.objects.create(user=other, name='theirs')
+
+        self.assertEqual(self.changes(0)['changes'], [])
+
+    def test_invalid_cursor(self):
+        res = self.client.get(CHANGES_URL, {'since': 'x'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_compaction(self):
+        recipe = self.create_recipe()
+        tag = recipe.tags.get()
+        self.client.patch(detail_url('tag', tag.id), {'name': 'supper'})
+        self.client.delete(detail_url('recipe', recipe.id))
+        before = self.summary(0)
+        cursor = self.changes(0)['cursor']
+
+        call_command('compact_changes', stdout=io.StringIO())
+
+        self.assertEqual(self.summary(0), before)
+        self.assertEqual(Change.objects.filter(user=self.user).count(), 3)
+
+        Change.objects.filter(op=Change.DELETE).update(
+            created=timezone.now() - timedelta(days=31)
+        )
+        counts = changes.compact()
+
+        self.assertEqual(counts['tombstones'], 1)
+        res = self.client.get(CHANGES_URL, {'since': 0})
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+        self.assertEqual(self.changes(cursor)['changes'], [])
+
+    def test_user_deletion(self):
+        self.create_recipe()
+
+        self.user.delete()
+        changes.compact()
+
+        self.assertFalse(Change.objects.exists())
+        self.assertFalse(ChangeSequence.objects.exists())
+
+
+class ConcurrentWriteTests(TransactionTestCase):
+    """Writes to one user's recipes lock their change sequence and stats
+    rows in the same order, so concurrent writes queue instead of
+    deadlocking."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.bare = Recipe.objects.create(
+            user=self.user, title='Bare', time_minutes=5, price='1.00'
+        )
+        self.linked = Recipe.objects.create(
+            user=self.user, title='Linked', time_minutes=5, price='1.00'
+        )
+        self.ingredient = Ingredient.objects.create(user=self.user, name='a')
+
+    def patch(self, recipe, tag, barrier, statuses):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            barrier.wait()
+            res = client.patch(
+                detail_url('recipe', recipe.id),
+                {'tags': [{'name': tag}], 'price': '2.00'},
+                format='json'
+            )
+            statuses.append(res.status_code)
+        except Exception as error:
+            statuses.append(error)
+        finally:
+            connection.close()
+
+    def test_concurrent_patches(self):
+        statuses = []
+        for i in range(20):
+            # Clearing the bare recipe's links logs a change before any
+            # stats update; clearing the linked one's updates stats first.
+            self.bare.tags.clear()
+            self.linked.ingredients.add(self.ingredient)
+            barrier = threading.Barrier(2)
+            threads = [
+                threading.Thread(
+                    target=self.patch,
+                    args=(recipe, f'tag {i}', barrier, statuses)
+                )
+                for recipe in (self.bare, self.linked)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(statuses, [status.HTTP_200_OK] * 40)
@@ -0,0 +1,142 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import cookable
+
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+
+
+def create_recipe(user, title, ingredients):
+    recipe = Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('5.00')
+    )
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class PublicCookableApiTests(TestCase):
+    def test_auth_required(self):
+        res = APIClient().get(COOKABLE_URL, {'ingredients': '1'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateCookableApiTests(TestCase):
+    def setUp(self):
+        cookable.cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice, self.egg, self.leek, self.salt = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('rice', 'egg', 'leek', 'salt')
+        ]
+
+    def cookable(self, *ingredients, **params):
+        res = self.client.get(COOKABLE_URL, {
+            'ingredients': ','.join(str(i.id) for i in ingredients),
+            **params
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [
+            (item['title'], item['coverage'], item['have'], item['missing'])
+            for item in res.json()
+        ]
+
+    def test_ranked_by_coverage_then_missing(self):
+        create_recipe(self.user, 'fried rice', [self.rice, self.egg])
+        create_recipe(self.user, 'soup', [self.leek, self.salt, self.egg])
+        create_recipe(self.user, 'plain rice', [self.rice])
+        create_recipe(self.user, 'omelette', [self.egg, self.salt])
+        create_recipe(self.user, 'leek pie', [self.leek])
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        create_recipe(other, 'other rice', [
+            Ingredient.objects.create(user=other, name='rice')
+        ])
+
+        expected = [
+            ('plain rice', 1.0, 1, 0),
+            ('fried rice', 1.0, 2, 0),
+            ('omelette', 0.5, 1, 1),
+            ('soup', 0.3333, 1, 2),
+        ]
+        self.assertEqual(self.cookable(self.rice, self.egg), expected)
+
+        cookable.cache.clear()
+        with mock.patch.object(cookable, 'numpy', None):
+            self.assertEqual(self.cookable(self.rice, self.egg), expected)
+
+    def test_limit_and_unknown_ingredients(self):
+        for i in range(5):
+            create_recipe(self.user, f'rice {i}', [self.rice])
+
+        self.assertEqual(
+            [title for title, *_ in self.cookable(self.rice, limit=2)],
+            ['rice 4', 'rice 3']
+        )
+        self.assertEqual(self.cookable(self.leek), [])
+        self.assertEqual(self.cookable(), [])
+
+    def test_invalid_ids_rejected(self):
+        res = self.client.get(COOKABLE_URL, {'ingredients': '1,x'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_reused_until_recipes_change(self):
+        recipe = create_recipe(self.user, 'fried rice', [self.rice, self.egg])
+        self.cookable(self.rice)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(
+                self.cookable(self.rice), [('fried rice', 0.5, 1, 1)]
+            )
+
+        recipe.ingredients.remove(self.egg)
+        self.assertEqual(self.cookable(self.rice), [('fried rice', 1.0, 1, 0)])
+
+        create_recipe(self.user, 'rice salad', [self.rice, self.leek])
+        self.assertEqual(len(self.cookable(self.rice)), 2)
+
+        recipe.delete()
+        self.assertEqual(
+            self.cookable(self.rice), [('rice salad', 0.5, 1, 1)]
+        )
+
+        self.leek.delete()
+        self.assertEqual(
+            self.cookable(self.rice), [('rice salad', 1.0, 1, 0)]
+        )
+
+    def test_index_kept_across_other_changes(self):
+        recipe = create_recipe(self.user, 'fried rice', [self.rice, self.egg])
+        self.cookable(self.rice)
+
+        with mock.patch.object(
+            cookable.Index, 'build', wraps=cookable.Index.build
+        ) as build:
+            recipe.price = Decimal('7.00')
+            recipe.title = 'egg fried rice'
+            recipe.save()
+            recipe.tags.add(Tag.objects.create(user=self.user, name='quick'))
+            self.assertEqual(
+                self.cookable(self.rice), [('egg fried rice', 0.5, 1, 1)]
+            )
+            self.assertEqual(build.call_count, 0)
+
+            recipe.ingredients.add(self.leek)
+            self.cookable(self.rice)
+            self.assertEqual(build.call_count, 1)
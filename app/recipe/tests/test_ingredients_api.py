@@ -5,7 +5,7 @@ from django.urls import reverse
 from rest_framework import status # type: ignore
 from rest_framework.test import APIClient # type: ignore
 
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
 
 from recipe.serializers import IngredientSerializer
 
@@ -90,3 +90,26 @@ class PublicIngredientAPiTest(TestCase):
         self.assertFalse(ingredients.exists())
 
 
+
+    def test_ingredients_omit_field(self):
+        ing = Ingredient.objects.create(user = self.user, name = 'salt')
+
+        res = self.client.get(INGREDIENTS_URL, {'omit': 'name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), [{'id': ing.id}])
+
+    def test_ingredients_ordered_by_popularity(self):
+        salt = Ingredient.objects.create(user = self.user, name = 'salt')
+        kale = Ingredient.objects.create(user = self.user, name = 'kale')
+        for i in range(2):
+            recipe = Recipe.objects.create(
+                user = self.user, title = f'r{i}', time_minutes = 5, price = 1
+            )
+            recipe.ingredients.add(kale)
+
+        res = self.client.get(INGREDIENTS_URL, {'ordering': 'popular'})
+
+        self.assertEqual(
+            [ing['id'] for ing in res.data], [kale.id, salt.id]
+        )
@@ -1,7 +1,9 @@
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status # type: ignore
@@ -9,6 +11,7 @@ from rest_framework.test import APIClient # type: ignore
 
 from core.models import Recipe, Tag, Ingredient
 
+from core.renderers import FastJSONRenderer
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPE_URL = reverse('recipe:recipe-list')
@@ -359,3 +362,207 @@ class PrivateRecipeApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.ingredients.count(), 0)
+
+    def test_list_output_identical_to_serializer(self):
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'otherpass12'
+        )
+        create_recipe(user = other_user)
+        tags = [
+            Tag.objects.create(user = self.user, name = name)
+            for name in ['vegan', 'thai', 'dessert']
+        ]
+        ings = [
+            Ingredient.objects.create(user = self.user, name = name)
+            for name in ['salt', 'lime']
+        ]
+        r1 = create_recipe(user = self.user, price = Decimal('0.50'))
+        r1.tags.add(*tags)
+        r1.ingredients.add(*ings)
+        r2 = create_recipe(user = self.user, title = 'caf\u00e9', link = '')
+        r2.tags.add(tags[1])
+        create_recipe(user = self.user, price = Decimal('100'))
+
+        res = self.client.get(RECIPE_URL)
+
+        recipes = Recipe.objects.filter(user = self.user).order_by('-id')
+        serializer = RecipeSerializer(recipes, many = True)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(
+            res.content,
+            FastJSONRenderer().render(serializer.data)
+        )
+
+    def test_list_query_count_is_constant(self):
+        for i in range(5):
+            recipe = create_recipe(user = self.user)
+            recipe.tags.add(Tag.objects.create(user = self.user, name = f't{i}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user = self.user, name = f'i{i}')
+            )
+
+        # authentication is forced, so: recipes, tags, ingredients
+        with self.assertNumQueries(3):
+            self.client.get(RECIPE_URL)
+
+    def test_relations_ordered_by_id(self):
+        thai = Tag.objects.create(user = self.user, name = 'thai')
+        vegan = Tag.objects.create(user = self.user, name = 'vegan')
+        recipe = create_recipe(user = self.user)
+        recipe.tags.add(vegan)
+        recipe.tags.add(thai)
+        expected = [
+            {'id': thai.id, 'name': 'thai'},
+            {'id': vegan.id, 'name': 'vegan'},
+        ]
+
+        listed = self.client.get(RECIPE_URL).data[0]['tags']
+        detail = self.client.get(detail_url(recipe.id)).data['tags']
+
+        self.assertEqual(listed, expected)
+        self.assertEqual(detail, expected)
+        self.assertEqual(RecipeSerializer(recipe).data['tags'], expected)
+
+    def test_list_sparse_fields(self):
+        recipe = create_recipe(user = self.user)
+        recipe.tags.add(Tag.objects.create(user = self.user, name = 'thai'))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), [{'id': recipe.id, 'title': recipe.title}])
+
+    def test_list_omit_relations_skips_queries(self):
+        create_recipe(user = self.user)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPE_URL, {'omit': 'tags,price'})
+
+        self.assertEqual(
+            list(res.data[0]),
+            ['id', 'title', 'time_minutes', 'link', 'ingredients']
+        )
+
+    def test_sparse_fields_keep_nested_objects_whole(self):
+        recipe = create_recipe(user = self.user)
+        tag = Tag.objects.create(user = self.user, name = 'thai')
+        recipe.tags.add(tag)
+
+        res = self.client.get(detail_url(recipe.id), {'fields': 'id,tags'})
+
+        self.assertEqual(
+            res.json(),
+            {'id': recipe.id, 'tags': [{'id': tag.id, 'name': 'thai'}]}
+        )
+
+    def test_detail_omit_defers_columns(self):
+        recipe = create_recipe(user = self.user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                detail_url(recipe.id),
+                {'omit': 'description,tags,ingredients'}
+            )
+
+        self.assertNotIn('description', res.data)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('description', ctx.captured_queries[0]['sql'])
+
+    def test_sparse_fields_ignored_on_write(self):
+        recipe = create_recipe(user = self.user)
+        payload = {'title': 'new title'}
+
+        url = detail_url(recipe.id) + '?fields=id'
+        res = self.client.patch(url, payload)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, payload['title'])
+        self.assertEqual(res.data['title'], payload['title'])
+
+    def test_multi_get_in_request_order(self):
+        first = create_recipe(user = self.user, title = 'first')
+        second = create_recipe(user = self.user, title = 'second')
+        second.tags.add(Tag.objects.create(user = self.user, name = 'thai'))
+        other = create_recipe(
+            user = get_user_model().objects.create_user(
+                'other@example.com',
+                'testpass123'
+            )
+        )
+        ids = [second.id, 0, first.id, other.id, second.id]
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPE_URL, {
+                'ids': ','.join(str(pk) for pk in ids)
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data['results']],
+            ['second', 'first']
+        )
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'thai')
+        self.assertEqual(res.data['missing'], [0, other.id])
+
+    def test_multi_get_sparse_fields(self):
+        recipe = create_recipe(user = self.user)
+
+        res = self.client.get(RECIPE_URL, {'ids': recipe.id, 'fields': 'title'})
+
+        self.assertEqual(res.json()['results'], [{'title': recipe.title}])
+
+    @override_settings(MULTI_GET_MAX_IDS = 2)
+    def test_multi_get_limited(self):
+        for ids in ['', '1,2,3', 'a']:
+            res = self.client.get(RECIPE_URL, {'ids': ids})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_sideloaded(self):
+        thai = Tag.objects.create(user = self.user, name = 'thai')
+        vegan = Tag.objects.create(user = self.user, name = 'vegan')
+        leek = Ingredient.objects.create(user = self.user, name = 'leek')
+        for i in range(3):
+            recipe = create_recipe(user = self.user, title = f'r{i}')
+            # Linked out of id order; relations are listed by id.
+            recipe.tags.add(vegan)
+            recipe.tags.add(thai)
+            recipe.ingredients.add(leek)
+        create_recipe(user = self.user, title = 'bare')
+
+        # recipes, then links and linked objects per relation
+        with self.assertNumQueries(5):
+            res = self.client.get(RECIPE_URL, {'sideload': '1'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()
+        self.assertEqual(
+            [(r['title'], r['tags'], r['ingredients']) for r in data['results']],
+            [('bare', [], []), ('r2', [thai.id, vegan.id], [leek.id]),
+             ('r1', [thai.id, vegan.id], [leek.id]),
+             ('r0', [thai.id, vegan.id], [leek.id])]
+        )
+        self.assertEqual(data['included'], {
+            'tags': [
+                {'id': thai.id, 'name': 'thai'},
+                {'id': vegan.id, 'name': 'vegan'},
+            ],
+            'ingredients': [{'id': leek.id, 'name': 'leek'}],
+        })
+
+    def test_sideloaded_multi_get_without_relations(self):
+        recipe = create_recipe(user = self.user)
+        recipe.tags.add(Tag.objects.create(user = self.user, name = 'thai'))
+
+        res = self.client.get(RECIPE_URL, {
+            'ids': recipe.id, 'sideload': 'true', 'fields': 'id,tags'
+        })
+
+        self.assertEqual(res.json(), {
+            'results': [{'id': recipe.id, 'tags': [recipe.tags.get().id]}],
+            'missing': [],
+            'included': {'tags': [{'id': recipe.tags.get().id, 'name': 'thai'}]},
+        })
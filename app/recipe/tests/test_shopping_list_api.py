@@ -0,0 +1,96 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core.models import Ingredient, Recipe
+
+SHOPPING_LIST_URL = reverse('recipe:shopping-list')
+
+
+def create_recipe(user, ingredients=(), **params):
+    defaults = {
+        'title': 'sample title',
+        'time_minutes': 20,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+def ids(*recipes):
+    return ','.join(str(recipe.id) for recipe in recipes)
+
+
+class PublicShoppingListApiTests(TestCase):
+    def test_auth_required(self):
+        res = APIClient().get(SHOPPING_LIST_URL, {'recipes': '1'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateShoppingListApiTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice, self.egg, self.leek = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('rice', 'egg', 'leek')
+        ]
+
+    def test_ingredients_merged_in_one_query(self):
+        fried = create_recipe(
+            self.user, [self.rice, self.egg],
+            price=Decimal('4.50'), time_minutes=15
+        )
+        omelette = create_recipe(
+            self.user, [self.egg], price=Decimal('2.25'), time_minutes=10
+        )
+        plain = create_recipe(self.user, time_minutes=5)
+        create_recipe(self.user, [self.leek])
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SHOPPING_LIST_URL, {
+                'recipes': ids(fried, omelette, plain, fried)
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 3)
+        self.assertEqual(res.data['price'], '11.75')
+        self.assertEqual(res.data['time_minutes'], 30)
+        self.assertEqual(
+            [(item['name'], item['recipes'])
+             for item in res.data['ingredients']],
+            [('egg', 2), ('rice', 1)]
+        )
+
+    def test_other_users_recipes_rejected(self):
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        own = create_recipe(self.user, [self.rice])
+        foreign = create_recipe(other)
+
+        res = self.client.get(SHOPPING_LIST_URL, {
+            'recipes': ids(own, foreign)
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(foreign.id), str(res.data['recipes']))
+
+    def test_invalid_requests_rejected(self):
+        for recipes in ['', 'x', ','.join(str(i) for i in range(1, 200))]:
+            res = self.client.get(SHOPPING_LIST_URL, {'recipes': recipes})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
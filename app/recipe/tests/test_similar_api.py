@@ -0,0 +1,150 @@
+import io
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core.models import Ingredient, Recipe, RecipeSignature, Tag
+from recipe import similarity
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def create_recipe(user, title, tags=(), ingredients=()):
+    recipe = Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('5.00')
+    )
+    recipe.tags.add(*tags)
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class SignatureTests(TestCase):
+    def test_estimate_tracks_jaccard(self):
+        a = similarity.signature(set(range(0, 100)))
+        b = similarity.signature(set(range(50, 150)))
+
+        self.assertEqual(similarity.estimate(a, a), 1.0)
+        # Exact Jaccard is 1/3; 64 permutations estimate it within ~0.06.
+        self.assertAlmostEqual(similarity.estimate(a, b), 1 / 3, delta=0.2)
+        self.assertEqual(len(similarity.buckets(a)), similarity.BANDS)
+
+    def test_numpy_signatures_match_python(self):
+        sets = {
+            'small': {0, 1, 2, 3},
+            'large': {2 ** 40 + 7, 2 ** 63, 2 ** 64 - 1, similarity.PRIME},
+            'one': {similarity.PRIME + 1},
+        }
+
+        with patch.object(similarity, 'numpy', None):
+            expected = similarity.signatures(sets)
+
+        self.assertEqual(similarity.signatures(sets), expected)
+
+
+class PublicSimilarApiTests(TestCase):
+    def test_auth_required(self):
+        res = APIClient().get(similar_url(1))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateSimilarApiTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'ingredient {i}')
+            for i in range(12)
+        ]
+        self.tag = Tag.objects.create(user=self.user, name='dinner')
+
+    def similar(self, recipe, **params):
+        res = self.client.get(similar_url(recipe.id), params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(item['title'], item['similarity']) for item in res.json()]
+
+    def test_similar_recipes_ranked(self):
+        i = self.ingredients
+        recipe = create_recipe(self.user, 'base', [self.tag], i[:5])
+        create_recipe(self.user, 'same', [self.tag], i[:5])
+        create_recipe(self.user, 'close', [self.tag], i[:6])
+        create_recipe(self.user, 'unrelated', [], i[6:])
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        create_recipe(other, 'other', ingredients=[
+            Ingredient.objects.create(user=other, name='x')
+        ])
+
+        results = self.similar(recipe)
+
+        self.assertEqual(results[0], ('same', 1.0))
+        self.assertEqual([title for title, _ in results], ['same', 'close'])
+        self.assertEqual(self.similar(recipe, limit=1), [('same', 1.0)])
+
+    def test_signature_follows_link_changes(self):
+        i = self.ingredients
+        recipe = create_recipe(self.user, 'base', ingredients=i[:4])
+        other = create_recipe(self.user, 'other', ingredients=i[6:10])
+        self.assertEqual(self.similar(recipe), [])
+
+        other.ingredients.set(i[:4])
+        self.assertEqual(self.similar(recipe), [('other', 1.0)])
+
+        # Jaccard 3/4 once only `other` uses i[0].
+        i[0].recipe_set.clear()
+        i[0].recipe_set.add(other)
+        [(_, score)] = self.similar(recipe)
+        self.assertLess(score, 1.0)
+
+        i[0].delete()
+        self.assertEqual(self.similar(recipe), [('other', 1.0)])
+
+        recipe.ingredients.clear()
+        self.assertFalse(
+            RecipeSignature.objects.filter(recipe=recipe).exists()
+        )
+        self.assertEqual(self.similar(recipe), [])
+
+    def test_missing_signature_computed(self):
+        recipe = create_recipe(self.user, 'base', ingredients=self.ingredients)
+        create_recipe(self.user, 'same', ingredients=self.ingredients)
+        RecipeSignature.objects.filter(recipe=recipe).delete()
+
+        self.assertEqual(self.similar(recipe), [('same', 1.0)])
+
+    def test_other_users_recipe_not_found(self):
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        recipe = create_recipe(other, 'other')
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebuild_command(self):
+        recipe = create_recipe(self.user, 'base', ingredients=self.ingredients)
+        create_recipe(self.user, 'same', ingredients=self.ingredients)
+        RecipeSignature.objects.all().delete()
+
+        call_command('rebuild_recipe_signatures', stdout=io.StringIO())
+
+        self.assertEqual(RecipeSignature.objects.count(), 2)
+        with self.assertNumQueries(4):
+            self.assertEqual(self.similar(recipe), [('same', 1.0)])
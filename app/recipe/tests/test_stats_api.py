@@ -0,0 +1,356 @@
+import io
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework import status  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+
+from core.models import Change, Recipe, RecipeStats, Tag, Ingredient
+from recipe import stats
+
+STATS_URL = reverse('recipe:stats')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'sample title',
+        'time_minutes': 20,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicStatsApiTests(TestCase):
+    def test_auth_required(self):
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsApiTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertStatsMatchRebuild(self):
+        incremental = stats.summary(self.user)
+        stats.rebuild([self.user.id])
+        stats.recount_usage()
+        self.assertEqual(incremental, stats.summary(self.user))
+
+    def test_empty_stats(self):
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['average_price'])
+        self.assertEqual(res.data['top_tags'], [])
+
+    def test_stats(self):
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        create_recipe(other, price=Decimal('99.00'))
+        self.client.post(RECIPE_URL, {
+            'title': 'soup', 'time_minutes': 10, 'price': '4.00',
+            'tags': [{'name': 'vegan'}, {'name': 'quick'}],
+            'ingredients': [{'name': 'leek'}],
+        }, format='json')
+        self.client.post(RECIPE_URL, {
+            'title': 'stew', 'time_minutes': 150, 'price': '7.50',
+            'tags': [{'name': 'vegan'}],
+        }, format='json')
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['average_price'], '5.75')
+        self.assertEqual(res.data['average_time_minutes'], 80.0)
+        self.assertEqual(
+            [b['count'] for b in res.data['time_minutes_distribution']],
+            [1, 0, 0, 0, 1]
+        )
+        self.assertEqual(
+            [(tag['name'], tag['recipes']) for tag in res.data['top_tags']],
+            [('vegan', 2), ('quick', 1)]
+        )
+        self.assertEqual(res.data['top_ingredients'][0]['name'], 'leek')
+
+    def test_stats_read_in_constant_queries(self):
+        tag = Tag.objects.create(user=self.user, name='dinner')
+        ingredient = Ingredient.objects.create(user=self.user, name='rice')
+        for i in range(20):
+            recipe = create_recipe(self.user, title=f'recipe {i}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        with self.assertNumQueries(3):
+            self.client.get(STATS_URL)
+
+    def test_update_and_delete_tracked(self):
+        recipe = create_recipe(self.user, time_minutes=10)
+        kept = create_recipe(self.user, price=Decimal('3.00'))
+        tag = Tag.objects.create(user=self.user, name='breakfast')
+        recipe.tags.add(tag)
+        kept.tags.add(tag)
+
+        self.client.patch(
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            {'price': '8.00', 'time_minutes': 45},
+            format='json'
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.price, Decimal('8.00'))
+        self.assertStatsMatchRebuild()
+
+        recipe.delete()
+        data = stats.summary(self.user)
+        self.assertEqual(data['recipe_count'], 1)
+        self.assertEqual(data['average_price'], Decimal('3.00'))
+        self.assertStatsMatchRebuild()
+
+    def test_link_changes_tracked(self):
+        recipe = create_recipe(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('a', 'b', 'c')
+        ]
+        ingredient = Ingredient.objects.create(user=self.user, name='salt')
+
+        recipe.tags.set(tags)
+        recipe.tags.remove(tags[0], tags[0])
+        tags[1].recipe_set.add(create_recipe(self.user))
+        recipe.ingredients.add(ingredient)
+        recipe.ingredients.clear()
+        tags[2].delete()
+
+        self.assertEqual(
+            [(tag['name'], tag['recipes'])
+             for tag in stats.summary(self.user)['top_tags']],
+            [('b', 2)]
+        )
+        self.assertStatsMatchRebuild()
+
+    def test_missing_stats_rebuilt_from_recipes(self):
+        create_recipe(self.user)
+        RecipeStats.objects.all().delete()
+
+        create_recipe(self.user)
+
+        self.assertEqual(stats.summary(self.user)['recipe_count'], 2)
+
+    def test_user_delete_cascades(self):
+        create_recipe(self.user).tags.add(
+            Tag.objects.create(user=self.user, name='x')
+        )
+
+        self.user.delete()
+
+        self.assertFalse(RecipeStats.objects.exists())
+
+    def test_rebuild_command(self):
+        create_recipe(self.user)
+        Recipe.objects.bulk_create([
+            Recipe(user=self.user, title='bulk', time_minutes=5, price=1)
+            for _ in range(3)
+        ])
+
+        self.assertEqual(stats.summary(self.user)['recipe_count'], 1)
+
+        call_command('rebuild_recipe_stats', stdout=io.StringIO())
+
+        self.assertEqual(stats.summary(self.user)['recipe_count'], 4)
+
+
+class BulkDeleteTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        self.tag = Tag.objects.create(user=self.user, name='dinner')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='rice'
+        )
+
+    def create_recipes(self, user, n):
+        recipes = []
+        for i in range(n):
+            recipe = create_recipe(user, title=f'recipe {i}', price=i + 1)
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+            recipes.append(recipe)
+        return recipes
+
+    def queries(self, delete):
+        with CaptureQueriesContext(connection) as queries:
+            delete()
+        return len(queries)
+
+    def test_recipes_deleted_in_one_pass(self):
+        self.create_recipes(self.user, 12)
+        stats.summary(self.user)
+
+        few = self.queries(
+            lambda: Recipe.objects.filter(price__lte=2).delete()
+        )
+        many = self.queries(
+            lambda: Recipe.objects.filter(price__gte=5).delete()
+        )
+
+        self.assertEqual(few, many)
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('price', flat=True)),
+            [Decimal('3.00'), Decimal('4.00')]
+        )
+        data = stats.summary(self.user)
+        self.assertEqual(data['recipe_count'], 2)
+        self.assertEqual(data['top_tags'][0]['recipes'], 2)
+        self.assertEqual(
+            Change.objects.filter(kind='recipe', op=Change.DELETE).count(),
+            10
+        )
+        incremental = stats.summary(self.user)
+        stats.rebuild([self.user.id])
+        stats.recount_usage()
+        self.assertEqual(incremental, stats.summary(self.user))
+
+    def test_user_deleted_in_one_pass(self):
+        self.create_recipes(self.user, 2)
+        few = self.queries(self.user.delete)
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.tag = Tag.objects.create(user=user, name='dinner')
+        self.ingredient = Ingredient.objects.create(user=user, name='rice')
+        self.create_recipes(user, 10)
+
+        many = self.queries(user.delete)
+
+        self.assertEqual(few, many)
+        self.assertFalse(Recipe.objects.exists())
+        get_user_model().objects.filter(pk=self.other.pk).delete()
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_user_deleted_with_links_to_other_users(self):
+        theirs = Tag.objects.create(user=self.other, name='theirs')
+        [mine] = self.create_recipes(self.user, 1)
+        mine.tags.add(theirs)
+        [recipe] = self.create_recipes(self.other, 1)
+
+        self.user.delete()
+
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.usage_count, 0)
+        self.assertEqual(list(recipe.tags.all()), [])
+        self.assertEqual(
+            list(Change.objects.filter(user=self.other, kind='recipe')
+                 .values_list('object_id', flat=True))[-1],
+            recipe.id
+        )
+
+
+class UsageCountTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def counts(self, model):
+        return dict(model.objects.values_list('name', 'usage_count'))
+
+    def test_counts_follow_serializer_writes(self):
+        res = self.client.post(RECIPE_URL, {
+            'title': 'soup', 'time_minutes': 10, 'price': '4.00',
+            'tags': [{'name': 'vegan'}, {'name': 'quick'}],
+            'ingredients': [{'name': 'leek'}],
+        }, format='json')
+        self.client.post(RECIPE_URL, {
+            'title': 'stew', 'time_minutes': 60, 'price': '6.00',
+            'tags': [{'name': 'vegan'}],
+        }, format='json')
+        self.assertEqual(self.counts(Tag), {'vegan': 2, 'quick': 1})
+
+        self.client.put(
+            reverse('recipe:recipe-detail', args=[res.data['id']]),
+            {
+                'title': 'soup', 'time_minutes': 10, 'price': '4.00',
+                'tags': [{'name': 'quick'}],
+            },
+            format='json'
+        )
+        self.assertEqual(self.counts(Tag), {'vegan': 1, 'quick': 1})
+        self.assertEqual(self.counts(Ingredient), {'leek': 0})
+
+        self.client.delete(
+            reverse('recipe:recipe-detail', args=[res.data['id']])
+        )
+        self.assertEqual(self.counts(Tag), {'vegan': 1, 'quick': 0})
+
+    def test_counts_follow_admin_edits(self):
+        admin_user = get_user_model().objects.create_superuser(
+            'admin@example.com', 'testpass123'
+        )
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('a', 'b')
+        ]
+        salt = Ingredient.objects.create(user=self.user, name='salt')
+        recipe = create_recipe(self.user)
+        recipe.tags.add(tags[0])
+        client = Client()
+        client.force_login(admin_user)
+        image = io.BytesIO()
+        Image.new('RGB', (1, 1)).save(image, 'PNG')
+
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            res = client.post(
+                reverse('admin:core_recipe_change', args=[recipe.id]),
+                {
+                    'user': self.user.id, 'title': recipe.title,
+                    'description': '', 'time_minutes': 20, 'price': '5.00',
+                    'link': '', 'tags': [tags[1].id],
+                    'ingredients': [salt.id],
+                    'image': SimpleUploadedFile(
+                        'x.png', image.getvalue(), 'image/png'
+                    ),
+                }
+            )
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(self.counts(Tag), {'a': 0, 'b': 1})
+        self.assertEqual(self.counts(Ingredient), {'salt': 1})
+
+    def test_repair_command(self):
+        tag = Tag.objects.create(user=self.user, name='a')
+        create_recipe(self.user).tags.add(tag)
+        Tag.objects.update(usage_count=7)
+
+        call_command('repair_usage_counts', stdout=io.StringIO())
+
+        self.assertEqual(self.counts(Tag), {'a': 1})
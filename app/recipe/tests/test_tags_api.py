@@ -5,7 +5,7 @@ from django.test import TestCase
 from rest_framework import status # type: ignore
 from rest_framework.test import APIClient # type: ignore
 
-from core.models import Tag
+from core.models import Recipe, Tag
 
 from recipe.serializers import TagSerializer
 
@@ -78,4 +78,53 @@ class PrivateApiTests(TestCase):
         tags = Tag.objects.filter(user = self.user)
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertFalse(tags.exists())
\ No newline at end of file
+        self.assertFalse(tags.exists())
+
+    def test_tags_sparse_fields(self):
+        tag = Tag.objects.create(user = self.user, name = 'thai')
+
+        res = self.client.get(TAGS_URL, {'fields': 'id'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), [{'id': tag.id}])
+
+    def test_tags_ordered_by_popularity(self):
+        tags = {
+            name: Tag.objects.create(user = self.user, name = name)
+            for name in ('rare', 'common', 'unused', 'also common')
+        }
+        for i, names in enumerate([['common', 'also common', 'rare'], ['common', 'also common']]):
+            recipe = Recipe.objects.create(
+                user = self.user, title = f'r{i}', time_minutes = 5, price = 1
+            )
+            recipe.tags.add(*[tags[name] for name in names])
+
+        res = self.client.get(TAGS_URL, {'ordering': 'popular'})
+
+        self.assertEqual(
+            [tag['name'] for tag in res.data],
+            ['also common', 'common', 'rare', 'unused']
+        )
+
+    def test_multi_get_tags(self):
+        tags = [
+            Tag.objects.create(user = self.user, name = name)
+            for name in ('thai', 'vegan')
+        ]
+        other = Tag.objects.create(
+            user = get_user_model().objects.create_user(
+                'other@example.com',
+                'testpass123'
+            ),
+            name = 'theirs'
+        )
+
+        res = self.client.get(
+            TAGS_URL, {'ids': f'{tags[1].id},{other.id},{tags[0].id}'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {
+            'results': [TagSerializer(tags[1]).data, TagSerializer(tags[0]).data],
+            'missing': [other.id],
+        })
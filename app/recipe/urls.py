@@ -12,5 +12,17 @@ router.register('ingredients', views.IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
+    path('stats/', views.RecipeStatsView.as_view(), name='stats'),
+    path(
+        'shopping-list/',
+        views.ShoppingListView.as_view(),
+        name='shopping-list'
+    ),
+    path('changes/', views.ChangesView.as_view(), name='changes'),
+    path(
+        'changes/stream/ticket/',
+        views.StreamTicketView.as_view(),
+        name='stream-ticket'
+    ),
     path('', include(router.urls))
 ]
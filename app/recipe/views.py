@@ -2,21 +2,160 @@ from django.shortcuts import render
 
 # Create your views here.
 
-from rest_framework import viewsets, mixins  # type: ignore
-from rest_framework.authentication import TokenAuthentication # type: ignore
+from django.conf import settings
+
+from rest_framework import generics, viewsets, mixins  # type: ignore
+from rest_framework.decorators import action  # type: ignore
+from rest_framework.exceptions import (  # type: ignore
+    APIException,
+    ValidationError,
+)
 from rest_framework.permissions import IsAuthenticated # type: ignore
+from rest_framework.response import Response # type: ignore
 
+from core.authentication import TokenAuthentication
 from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from recipe import (
+    autocomplete,
+    changes,
+    cookable,
+    listing,
+    serializers,
+    shopping,
+    similarity,
+    stats,
+    stream,
+)
+
+
+def limit_param(request, default, maximum):
+    """The `?limit=` query parameter clamped to 1..maximum."""
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def ids_param(request, name):
+    """A comma separated `?<name>=1,2,3` query parameter as a list of ids."""
+    try:
+        return [
+            int(pk) for pk in request.query_params.get(name, '').split(',')
+            if pk.strip()
+        ]
+    except ValueError:
+        raise ValidationError({name: 'Expected comma separated ids.'})
+
+
+def flag_param(request, name):
+    """Whether a `?<name>=1` / `true` / `yes` query parameter is set."""
+    return request.query_params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+class SparseFieldsViewMixin:
+    """Push `?fields=` / `?omit=` down into the query: unselected columns
+    are deferred and unselected relations aren't prefetched."""
+    relations = []
+
+    def sparse_queryset(self, queryset):
+        names = serializers.sparse_field_names(
+            self.request.query_params,
+            self.get_serializer_class().Meta.fields
+        )
+        columns = [name for name in names if name not in self.relations]
+        prefetch = [name for name in self.relations if name in names]
+
+        return queryset.only('id', *columns).prefetch_related(*prefetch)
+
+
+class OrderingViewMixin:
+    """`?ordering=popular` sorts by usage count, most used first, which
+    the (user, -usage_count, name) index serves; the default is `-name`."""
+    orderings = {
+        'popular': ['-usage_count', 'name'],
+    }
+    default_ordering = ['-name']
+
+    def ordered(self, queryset):
+        ordering = self.orderings.get(
+            self.request.query_params.get('ordering'), self.default_ordering
+        )
+        return queryset.order_by(*ordering)
+
+
+class AutocompleteViewMixin:
+    """`GET <list url>autocomplete/?q=<typed text>&limit=10`: names
+    matching `q`, see recipe.autocomplete."""
+
+    @action(detail=False, pagination_class=None)
+    def autocomplete(self, request):
+        limit = limit_param(request, 10, settings.AUTOCOMPLETE_MAX_LIMIT)
+
+        return Response(autocomplete.search(
+            self.queryset.filter(user=request.user),
+            request.user.id,
+            request.query_params.get('q', ''),
+            limit
+        ))
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class MultiGetViewMixin:
+    """`?ids=3,1,2` on the list endpoint: the user's objects with those
+    ids in request order, as `{'results': [...], 'missing': [...]}`, from
+    one `id = ANY(...)` query (plus one per listed relation). Takes up to
+    MULTI_GET_MAX_IDS ids; ids of other users' objects are missing."""
+
+    def list(self, request, *args, **kwargs):
+        if 'ids' not in request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        ids = list(dict.fromkeys(ids_param(request, 'ids')))
+        if not ids:
+            raise ValidationError({'ids': 'Expected at least one id.'})
+        if len(ids) > settings.MULTI_GET_MAX_IDS:
+            raise ValidationError(
+                {'ids': f'At most {settings.MULTI_GET_MAX_IDS} ids.'}
+            )
+
+        items, extra = self.multi_get(
+            self.get_queryset().order_by().filter(id__any=ids)
+        )
+        found = dict(items)
+        return Response({
+            'results': [found[pk] for pk in ids if pk in found],
+            'missing': [pk for pk in ids if pk not in found],
+            **extra,
+        })
+
+    def multi_get(self, queryset):
+        """`(id, representation)` pairs of the objects in `queryset`, and
+        any further top-level response sections."""
+        objects = list(queryset)
+        data = self.get_serializer(objects, many=True).data
+        return zip([obj.pk for obj in objects], data), {}
+
+
+class RecipeViewSet(
+    MultiGetViewMixin, SparseFieldsViewMixin, viewsets.ModelViewSet
+):
+    """`?sideload=1` on the list endpoint (also with `?ids=`) returns the
+    side-loaded shape: recipes with tag and ingredient id lists in
+    'results', and every tag and ingredient they link once in
+    `'included': {'tags': [...], 'ingredients': [...]}`."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    relations = listing.RELATIONS
 
     def get_queryset(self):
-        return self.queryset.filter(user = self.request.user).order_by('-id')
+        queryset = self.queryset.filter(user = self.request.user).order_by('-id')
+
+        if self.action == 'retrieve':
+            queryset = self.sparse_queryset(queryset)
+
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -24,23 +163,199 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None or 'ids' in request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.get_serializer().fields
+        if flag_param(request, 'sideload'):
+            items, included = listing.sideloaded_items(queryset, fields)
+            return Response({
+                'results': [item for _, item in items],
+                'included': included,
+            })
+
+        return Response(listing.recipe_list(queryset, fields))
+
+    def multi_get(self, queryset):
+        fields = self.get_serializer().fields
+        if flag_param(self.request, 'sideload'):
+            items, included = listing.sideloaded_items(queryset, fields)
+            return items, {'included': included}
+
+        return listing.recipe_items(queryset, fields), {}
+
     def perform_create(self, serializer):
         serializer.save(user = self.request.user)
 
-class TagViewSet(mixins.ListModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    @action(detail=False, pagination_class=None)
+    def cookable(self, request):
+        """`GET cookable/?ingredients=1,2,3&limit=20`: the user's recipes
+        using any of the given ingredients, best covered first, see
+        recipe.cookable."""
+        ingredient_ids = ids_param(request, 'ingredients')
+        limit = limit_param(request, 20, settings.COOKABLE_MAX_LIMIT)
+
+        return Response(cookable.rank(request.user, ingredient_ids, limit))
+
+    @action(detail=True, pagination_class=None)
+    def similar(self, request, pk=None):
+        """`GET <recipe url>similar/?limit=10`: the user's recipes sharing
+        the most tags and ingredients with this one, see
+        recipe.similarity."""
+        limit = limit_param(request, 10, settings.SIMILAR_MAX_LIMIT)
+
+        return Response(similarity.similar(self.get_object(), limit))
+
+class TagViewSet(
+    MultiGetViewMixin,
+    AutocompleteViewMixin,
+    OrderingViewMixin,
+    SparseFieldsViewMixin,
+    mixins.ListModelMixin,
+    mixins.UpdateModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(user = self.request.user).order_by('-name')
+        queryset = self.ordered(self.queryset.filter(user = self.request.user))
+
+        if self.action == 'list':
+            queryset = self.sparse_queryset(queryset)
 
-class IngredientViewSet(mixins.ListModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+        return queryset
+
+class IngredientViewSet(
+    MultiGetViewMixin,
+    AutocompleteViewMixin,
+    OrderingViewMixin,
+    SparseFieldsViewMixin,
+    mixins.ListModelMixin,
+    mixins.UpdateModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(user = self.request.user).order_by('-name')
+        queryset = self.ordered(self.queryset.filter(user = self.request.user))
+
+        if self.action == 'list':
+            queryset = self.sparse_queryset(queryset)
+
+        return queryset
+
+
+class RecipeStatsView(generics.RetrieveAPIView):
+    """Recipe count, averages, time distribution and most used tags and
+    ingredients of the authenticated user, read from recipe.stats.
+    `?top=` sets how many tags and ingredients are listed (default 5)."""
+    serializer_class = serializers.RecipeStatsSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        try:
+            top = int(self.request.query_params.get('top', 5))
+        except ValueError:
+            top = 5
+
+        return stats.summary(self.request.user, top=max(0, min(top, 50)))
+
+
+class ShoppingListView(generics.RetrieveAPIView):
+    """Merged ingredients of `?recipes=1,2,3` (the authenticated user's
+    recipes), with how many of the recipes use each one, and their total
+    price and time, see recipe.shopping."""
+    serializer_class = serializers.ShoppingListSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        recipe_ids = ids_param(self.request, 'recipes')
+        if not recipe_ids:
+            raise ValidationError({'recipes': 'Expected at least one id.'})
+        if len(set(recipe_ids)) > settings.SHOPPING_LIST_MAX_RECIPES:
+            raise ValidationError({'recipes': (
+                f'At most {settings.SHOPPING_LIST_MAX_RECIPES} recipes.'
+            )})
+
+        data = shopping.shopping_list(self.request.user, recipe_ids)
+        if data['missing']:
+            missing = ', '.join(str(pk) for pk in data['missing'])
+            raise ValidationError(
+                {'recipes': f'Unknown recipe ids: {missing}.'}
+            )
+
+        return data
+
+
+class CursorExpired(APIException):
+    status_code = 410
+    default_detail = 'Cursor expired, download everything again.'
+    default_code = 'cursor_expired'
+
+
+class ChangesView(generics.RetrieveAPIView):
+    """What changed in the authenticated user's recipes, tags and
+    ingredients after `?since=<cursor>`, see recipe.changes.
+
+    Without `since` only the current cursor is returned: clients take it
+    before downloading everything, then poll with it, replacing it with the
+    returned `cursor` after applying the changes and asking again at once
+    while `more` is true. `?limit=` caps the log entries read (default and
+    maximum CHANGES_MAX_LIMIT). An expired cursor gets 410."""
+    serializer_class = serializers.ChangesSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        user = self.request.user
+        since = self.request.query_params.get('since')
+        if since is None:
+            return {
+                'cursor': changes.current_cursor(user),
+                'more': False,
+                'changes': [],
+            }
+        try:
+            since = int(since)
+        except ValueError:
+            raise ValidationError({'since': 'Expected a cursor.'})
+
+        limit = limit_param(
+            self.request,
+            settings.CHANGES_MAX_LIMIT,
+            settings.CHANGES_MAX_LIMIT
+        )
+        fields = serializers.RecipeDetailSerializer().fields
+        try:
+            return changes.fetch(user, since, limit, fields)
+        except changes.CursorExpired:
+            raise CursorExpired()
+
+
+class StreamTicketView(generics.GenericAPIView):
+    """A short-lived ticket opening the authenticated user's change stream
+    (recipe.stream) as `?ticket=`, for EventSource clients, which can't
+    send the Authorization header. Each ticket works for
+    `expires_in` seconds, so reconnecting takes a new one."""
+    serializer_class = serializers.StreamTicketSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer({
+            'ticket': stream.make_ticket(request.user),
+            'expires_in': settings.CHANGES_STREAM_TICKET_MAX_AGE,
+        })
+        return Response(serializer.data)
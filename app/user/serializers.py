@@ -6,6 +6,8 @@ from django.contrib.auth import (
 from rest_framework import serializers
 from django.utils.translation import gettext as _
 
+from core import timing
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
@@ -36,11 +38,12 @@ class AuthTokenSerializer(serializers.Serializer):
         email = attrs.get('email')
         password = attrs.get('password')
 
-        user = authenticate(
-            request = self.context.get('request'),
-            username = email,
-            password = password
-        )
+        with timing.phase('auth'):
+            user = authenticate(
+                request = self.context.get('request'),
+                username = email,
+                password = password
+            )
 
         if not user:
             msg = _('Unable to authenticate with provided credentials.')